@@ -0,0 +1,138 @@
+"""Offline benchmark: per-pair vs batched baseline scoring.
+
+Builds a synthetic maturity model and chunk corpus, scores it with the original
+per-pair loop (reproduced below) and with ``score_categories``, checks that the
+outputs are identical, and prints the timings.
+
+``--path pruned`` forces the single-core ``score_cutoff`` scorer, which is what the
+Lambda runs: its dependency layer has no numpy, so ``cdist`` is never used there.
+
+    python benchmarks/bench_baseline.py --chunks 2000 --categories 19
+    python benchmarks/bench_baseline.py --path pruned
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOCAL_SQLITE", "1")  # importing the app must not need MySQL
+os.environ.setdefault("ADMIN_USER", "bench@example.com")
+os.environ.setdefault("ADMIN_PASS", "offline-benchmark")
+
+from rapidfuzz import fuzz
+
+from src.app.schemas.maturity import MaturityModel
+from src.app.services import current_state_baseline
+from src.app.services.current_state_baseline import score_categories
+
+WORDS = ("contract intake matter management spend billing outside counsel knowledge templates "
+         "clause library workflow automation metrics dashboard reporting esignature repository "
+         "vendor invoices budget accrual policy training the and of we use team legal").split()
+
+
+# --- the pre-batching implementation, kept here as the reference ---
+def _legacy_text(ch):
+    return (ch.get("text") or "")[:4000]
+
+def _legacy_source(ch):
+    src = ch.get("source") or {}
+    return {"file": src.get("file"), "locator": src.get("locator"), "excerpt": (ch.get("text") or "")[:240]}
+
+def _legacy_match_level(descriptor, chunks):
+    scores = [(fuzz.partial_ratio(descriptor.lower(), _legacy_text(ch).lower()), ch) for ch in chunks]
+    scores.sort(key=lambda x: x[0], reverse=True)
+    top = scores[:3]
+    best = top[0][0] if top else 0
+    return best, [{"score": s, "source": _legacy_source(ch)} for s, ch in top]
+
+def _legacy_filter(chunks, keywords):
+    if not keywords:
+        return chunks
+    kw = [k.lower() for k in keywords]
+    out = [ch for ch in chunks if any(k in _legacy_text(ch).lower() for k in kw)]
+    return out if out else chunks
+
+def _legacy_category(cat, chunks, threshold=55):
+    rel = _legacy_filter(chunks, [k for cr in cat.criteria for k in cr.keywords])
+    crit_results = []
+    for cr in cat.criteria:
+        crit_chunks = _legacy_filter(rel, cr.keywords)
+        candidates, evid_map = [], {}
+        for lvl, desc in cr.levels.items():
+            best, evid = _legacy_match_level(desc, crit_chunks)
+            candidates.append((lvl, best))
+            evid_map[lvl] = evid
+        candidates.sort(key=lambda x: x[1], reverse=True)
+        pred_level, pred_score = candidates[0]
+        crit_results.append({
+            "id": cr.id, "label": cr.label, "level": int(pred_level), "score": int(pred_score),
+            "per_level_scores": {int(l): int(s) for l, s in candidates},
+            "evidence": evid_map[pred_level],
+        })
+    levels = [c["level"] for c in crit_results]
+    if cat.rollup == "mean":
+        level = max(1, min(4, round(sum(levels) / len(levels))))
+    else:
+        level = max(1, min(4, int(statistics.median(levels))))
+    coverage = sum(1 for c in crit_results if c["score"] >= threshold) / max(1, len(crit_results))
+    confidence = min(1.0, sum(c["score"] for c in crit_results) / (100 * max(1, len(crit_results))))
+    return {"id": cat.id, "name": cat.name, "level": level, "coverage": round(coverage, 2),
+            "confidence": round(confidence, 2), "criteria": crit_results}
+
+
+def _model(n_categories, rng):
+    cats = []
+    for c in range(n_categories):
+        crits = [{
+            "id": f"c{c}r{r}", "label": f"Criterion {c}.{r}", "keywords": rng.sample(WORDS[:22], 2),
+            "levels": {l: " ".join(rng.sample(WORDS, 10)) for l in range(1, 5)},
+        } for r in range(5)]
+        cats.append({"id": f"cat{c}", "name": f"Category {c}", "criteria": crits})
+    return MaturityModel(categories=cats)
+
+
+def _chunks(n, rng):
+    out = []
+    for i in range(n):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(60, 600)))
+        out.append({"id": f"bench.pdf::p{i}::1", "text": text, "source": {"file": "bench.pdf", "locator": f"p{i}"}})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=1500)
+    ap.add_argument("--categories", type=int, default=8)
+    ap.add_argument("--path", choices=("auto", "pruned"), default="auto",
+                    help="pruned: score without numpy/cdist, as deployed")
+    args = ap.parse_args()
+    if args.path == "pruned":
+        current_state_baseline.np = None
+
+    rng = random.Random(7)
+    model = _model(args.categories, rng)
+    chunks = _chunks(args.chunks, rng)
+
+    t0 = time.perf_counter()
+    legacy = [_legacy_category(cat, chunks) for cat in model.categories]
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batched = score_categories(chunks, model)
+    t_batched = time.perf_counter() - t0
+
+    assert batched == legacy, "batched scoring diverged from the per-pair reference"
+    path = "cdist" if current_state_baseline._use_cdist() else "pruned"
+    print(f"chunks={args.chunks} categories={args.categories} path={path}")
+    print(f"per-pair: {t_legacy:8.2f}s")
+    print(f"batched:  {t_batched:8.2f}s")
+    print(f"speedup:  {t_legacy / t_batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark: verbose JSON vs compact wire format for extraction replies.
+
+Offline (default), both formats carry the same extraction items through
+``StandInAsyncClient``, with latency growing per output token (``--token-latency``,
+roughly gpt-4o-mini generation speed), and the decoded results are checked to be identical.
+
+    python benchmarks/bench_wire.py --chunks 10 --token-latency 0.012
+
+``--live`` sends real requests (cache disabled) for the text in ``--text-file`` and
+reports ``usage.completion_tokens`` and wall-clock time per call instead.
+
+    python benchmarks/bench_wire.py --live --text-file sample.txt --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOCAL_SQLITE", "1")  # importing the app must not need MySQL
+os.environ.setdefault("ADMIN_USER", "bench@example.com")
+os.environ.setdefault("ADMIN_PASS", "offline-benchmark")
+os.environ["LLM_CACHE_BACKEND"] = "none"  # measure real calls, not cache hits
+
+from src.app.services import llm
+from src.app.services.llm_standin import StandInAsyncClient
+
+WIRES = ("json", "compact")
+
+# a typical reply for a dense interview-notes chunk
+PAYLOAD = {
+    "pain_points": [
+        {"text": "Contract requests arrive by email with no intake form", "impact_hint": "high", "effort_hint": "low"},
+        {"text": "Outside counsel invoices are reviewed manually", "impact_hint": "med", "effort_hint": "med"},
+        {"text": "No central repository for executed agreements", "impact_hint": "high", "effort_hint": "med"},
+    ],
+    "current_tools": [
+        {"name": "SharePoint", "purpose": "document storage"},
+        {"name": "Excel", "purpose": "matter tracking"},
+    ],
+    "processes": [
+        {"process_name": "Contract review", "step": "Paralegal triages requests from the shared inbox"},
+        {"process_name": "Contract review", "step": "Attorney redlines and returns to the business"},
+    ],
+    "metrics": [
+        {"name": "NDA turnaround", "value": "5 days", "timeframe": "2023"},
+    ],
+    "opportunities": [
+        {"area": "Intake", "description": "Introduce a self-service intake form", "impact_hint": "high", "effort_hint": "low"},
+        {"area": "Spend", "description": "Adopt e-billing with automated guideline checks", "impact_hint": "med", "effort_hint": "med"},
+    ],
+}
+
+
+def _chunks(n, text=None):
+    text = text or "Contracts are requested by email and tracked in spreadsheets. " * 20
+    return [{
+        "id": f"bench.pdf::p{i}::1",
+        "text": text,
+        "tokens": max(1, len(text) // 4),
+        "source": {"file": "bench.pdf", "locator": f"p{i}"},
+    } for i in range(1, n + 1)]
+
+
+def offline(args):
+    chunks = _chunks(args.chunks)
+    rows, decoded = [], {}
+    for wire in WIRES:
+        client = StandInAsyncClient(latency=args.latency, payload=PAYLOAD, token_latency=args.token_latency)
+        t0 = time.perf_counter()
+        decoded[wire] = llm.extract_each(chunks, concurrency=1, aclient=client, pack_tokens=0, triage=False, wire=wire)
+        elapsed = time.perf_counter() - t0
+        rows.append((wire, client.output_tokens / client.calls, elapsed / client.calls))
+    assert decoded["json"] == decoded["compact"], "compact replies decode differently"
+    return rows
+
+
+def live(args):
+    with open(args.text_file, encoding="utf-8") as f:
+        chunk = _chunks(1, f.read())[0]
+    rows = []
+    for wire in WIRES:
+        tokens, seconds = [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            resp = llm.client.chat.completions.create(**llm._extract_request([chunk], wire))
+            seconds.append(time.perf_counter() - t0)
+            tokens.append(resp.usage.completion_tokens)
+        rows.append((wire, sum(tokens) / len(tokens), sum(seconds) / len(seconds)))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=10)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--token-latency", type=float, default=0.012)
+    ap.add_argument("--live", action="store_true")
+    ap.add_argument("--text-file")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    if args.live and not args.text_file:
+        ap.error("--live needs --text-file")
+
+    rows = live(args) if args.live else offline(args)
+    print(f"{'wire':>8} {'out tokens/call':>16} {'seconds/call':>13}")
+    for wire, tokens, seconds in rows:
+        print(f"{wire:>8} {tokens:>16.0f} {seconds:>13.2f}")
+    (_, t_json, s_json), (_, t_compact, s_compact) = rows
+    print(f"output tokens: {t_json / t_compact:.1f}x fewer, latency: {s_json / s_compact:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
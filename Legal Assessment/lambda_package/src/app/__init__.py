@@ -6,19 +6,31 @@ import boto3
 import logging
 import os
 import json
-import botocore
 import base64
+import itertools
+import tempfile
+import time
+import uuid
 from pydantic import BaseModel
 
 # Local service layer imports
-from .services.current_state_baseline import score_current_state_baseline
-from .services.llm import extract_from_chunks
+from .services.current_state_baseline import category_matcher, score_current_state
+from .services.dedup import NearDuplicates, dedup_report, select_clusters
+from .services.llm import extract_each, fan_out, merge_extractions
 from .services.dashboard import render_dashboard
-from .services.parsing import ingest_files
+from .services.parsing import chunk_digest, fetch_files, iter_chunks, read_chunks
+from .services.relevance import RelevanceRanker
 from .services.policy_adjudicator import apply_policy_to_current_state
+from .services.policy_indexer import build_policy_index
 from .services.recommendations import generate_recommendations
 from .services.synthesis import synthesize
-from .services.maturity import load_maturity_model
+from .services.maturity import load_compiled_model
+from .services.llm_cache import get_cache
+from .services.artifacts import get_store
+from .services.chunk_artifact import (CHUNKS_NAME, CONTENT_TYPE, INDEX_NAME, LEGACY_NAME, chunks_key,
+                                      load_chunks, publish, write_chunk_file)
+from .services.manifest import JobManifest, sha256_bytes, track
+from .services.parse_cache import file_digest, get_parse_cache
 from sqlalchemy import text
 from .models.user import User, db
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user, UserMixin
@@ -29,48 +41,227 @@ login_manager = LoginManager()
 
 
 
-BUCKET_NAME = os.getenv("BUCKET_NAME")
-s3 = boto3.client('s3', config=botocore.config.Config(s3={'addressing_style':'path'}))
 lambda_client = boto3.client(
     'lambda',
     region_name='us-west-2'
 )
 logger = logging.getLogger(__name__)
-
-def process(data):
-    with app.app_context():
-        files = data.get('files', [])
-        company = data.get('company')
-        saved_files = []
-        for file in files:
-            filename = file['filename']
-            local_path = f'/tmp/{file['filename']}'
-            s3.download_file(BUCKET_NAME, file['key'], local_path)
-            
-
-
-            saved_files.append({"filename": filename, "path": local_path})
-
-            logger.info(
-                "[UPLOAD] saved %s -> %s", filename, local_path
-            )
-
-        """Chunk the uploaded files for a given ``job_id``.
-
-        The underlying ``ingest_files`` service should write an artifacts file
-        (e.g., JSON of chunks) and return its path.
-        """
+# Extraction checkpoints: representatives per batch, Lambda time kept in reserve for the final
+# writes (plus the slowest batch so far), and continuations allowed after failed batches
+EXTRACT_BATCH = int(os.getenv("EXTRACT_BATCH", "16"))
+CHECKPOINT_RESERVE_MS = int(os.getenv("CHECKPOINT_RESERVE_MS", "90000"))
+EXTRACT_MAX_ATTEMPTS = int(os.getenv("EXTRACT_MAX_ATTEMPTS", "3"))
+
+def _manifest_for(data):
+    """The manifest of the job this worker event belongs to (None for events without a job)."""
+    job = data.get('resume') or data.get('job')
+    return JobManifest.load(get_store(), data.get('company'), job) if job else None
+
+def _put_artifact(run, name, key, body, content_type="application/json", writer=None, **extra):
+    """Write a job artifact (through ``writer``, e.g. a store batch) and record its key and content hash in the manifest."""
+    (writer or get_store()).put(key, body, content_type, **extra)
+    run.artifact(name, key, sha256_bytes(body))
+
+def _job_key(company, job, name):
+    return f"{company}/jobs/{job}/{name}"
+
+def _save_checkpoint(company, state):
+    get_store().put_json(_job_key(company, state["job"], "checkpoint.json"), state)
+
+def _continue_later(company, state):
+    """Checkpoint and re-invoke the worker to carry on from the current cursor."""
+    _save_checkpoint(company, state)
+    lambda_client.invoke(
+        FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
+        InvocationType='Event',  # Async invocation
+        Payload=json.dumps({
+            'worker': True,
+            'task_type': 'file_processing',
+            'data': {
+                'company': company,
+                'resume': state["job"],
+                'job': state["job"],
+                'cursor': len(state["done"]),
+            }
+        })
+    )
+    print({"checkpoint": state["job"], "cursor": len(state["done"]), "attempt": state["attempt"]})
+    return {'status': 'continuing'}, 202
+
+def _extract_in_batches(company, state, chunks, context):
+    """
+    Extract the cluster representatives not yet in ``state["done"]``, checkpointing to the store after
+    every batch. Returns False if the job was handed to a fresh invocation: the remaining Lambda
+    time fell under the reserve plus the slowest batch so far, or a batch failed after its retries.
+    """
+    by_id = {ch.get("id"): ch for ch in chunks}
+    todo = [c[0] for c in state["clusters"] if c[0] not in state["done"]]
+    slowest_ms = 0
+    for i in range(0, len(todo), EXTRACT_BATCH):
+        if context is not None and context.get_remaining_time_in_millis() < CHECKPOINT_RESERVE_MS + slowest_ms:
+            _continue_later(company, state)
+            return False
+        batch = todo[i:i + EXTRACT_BATCH]
+        started = time.monotonic()
         try:
-            chunks = ingest_files(saved_files)
-        except FileNotFoundError as e:
-            return {'status': 400, 'body': str(e)}
-        max_chunks: int = 50
-
-        """Run LLM-powered extraction over the previously ingested chunks."""
+            outputs = extract_each([by_id[cid] for cid in batch], stats=state["tiers"])
+        except RuntimeError as e:
+            state["attempt"] += 1
+            if state["attempt"] > EXTRACT_MAX_ATTEMPTS:
+                _save_checkpoint(company, state)
+                raise
+            print(f"Extraction batch failed ({e}); resuming from the checkpoint")
+            _continue_later(company, state)
+            return False
+        state["done"].update(zip(batch, outputs))
+        slowest_ms = max(slowest_ms, (time.monotonic() - started) * 1000)
+        _save_checkpoint(company, state)
+    return True
+
+def _ingest(data, company, job, job_dir, chunks_path, digests, run):
+    """Chunk the uploaded files and tag each chunk once against the maturity model, streaming
+    it straight into the compressed chunk artifact (with its category shards) while the
+    relevance ranker records its features; the extraction budget
+    then goes to the best-ranked chunks across all files (logged in selection.json).
+
+    Incremental mode keeps the company's previous chunks (minus files re-uploaded now),
+    extracts only chunks that are new or changed, and reuses the stored per-chunk
+    extractions for the rest.
+    """
+    files = data.get('files', [])
+    store = get_store()
+    saved_files = fetch_files(store, files, job_dir)
+    for file in saved_files:
+        logger.info(
+            "[UPLOAD] fetched %s (%s)", file['filename'], "memory" if 'data' in file else file['path']
+        )
+    keys = {f['filename']: f['key'] for f in files}
+    run.inputs["files"] = [{"filename": f['filename'], "key": keys.get(f['filename']), "sha256": file_digest(f)}
+                           for f in saved_files]
+    incremental = bool(data.get('incremental'))
+    run.inputs["incremental"] = incremental
+    previous_chunks = load_chunks(store, company) if incremental else None
+    records = (store.get_json(f"{company}/extractions.json") or {}).get("chunks") if incremental else {}
+    if incremental and (previous_chunks is None or records is None):
+        print("No previous assessment to extend; running a full pass")
+        incremental, records = False, {}
+    compiled = load_compiled_model(tenant=company)
+    model = compiled.model
+    ranker = RelevanceRanker(model)
+    tagger = compiled.tagger
+
+    ingest_stats = []
+    stream = iter_chunks(saved_files, stats=ingest_stats)
+    if incremental:
+        replaced = {f['filename'] for f in files}
+        known = {ch.get("id"): chunk_digest(ch) for ch in previous_chunks}
+        stream = itertools.chain(
+            (ch for ch in previous_chunks if (ch.get("source") or {}).get("file") not in replaced), stream)
+
+    # candidates are clustered as they stream past and only representatives are ranked, so
+    # copies of a chunk never spend the extraction budget; the selection fans out to members
+    dupes = NearDuplicates()
+    candidates = []  # candidate chunk ids, in corpus order
+
+    def observe(stream):
+        for ch in stream:
+            tagger.tag(ch)  # previous chunks too: the model may have changed since
+            digests[ch.get("id")] = digest = chunk_digest(ch)
+            if not incremental or known.get(ch.get("id")) != digest:
+                candidates.append(ch.get("id"))
+                if dupes.add(ch) == len(candidates) - 1:
+                    ranker.observe(ch)
+            yield ch
+
+    index = write_chunk_file(observe(stream), chunks_path, category_matcher(model))
+    n_chunks = index["count"]
+    selection = ranker.select()
+    groups = select_clusters(dupes.clusters, candidates, selection["selected"])
+    wanted = {cid for g in groups for cid in g}
+    chunks = [ch for ch in read_chunks(chunks_path) if ch.get("id") in wanted]
+    print({"chunks": n_chunks, "extract": len(chunks), "incremental": incremental,
+           "parse_cache": get_parse_cache().stats()})
+    print({"selection": selection["budget"], "candidates": selection["candidates"]})
+    for st in ingest_stats:
+        print({"boilerplate": st["file"], "removed_chars": st["chars_in"] - st["chars_out"],
+               "chars": st["chars_in"], "lines": st["boilerplate_lines"]})
+
+    position = {ch.get("id"): i for i, ch in enumerate(chunks)}
+    dedup = dedup_report([[position[cid] for cid in g] for g in groups], chunks)
+    print({"dedup": {k: v for k, v in dedup.items() if k != "clusters"}})
+    state = {
+        "job": job,
+        "incremental": incremental,
+        "clusters": groups,
+        "records": {cid: r for cid, r in records.items() if digests.get(cid) == r.get("digest")},
+        "done": {},  # representative chunk id -> extraction result
+        "dedup": dedup,
+        "tiers": {},
+        "attempt": 0,
+    }
+    # the job's chunk artifact replaces the company's only once extraction has finished
+    with store.batch() as batch:
+        batch.upload(chunks_path, _job_key(company, state["job"], CHUNKS_NAME), CONTENT_TYPE)
+        batch.put_json(_job_key(company, state["job"], INDEX_NAME), index)
+        _put_artifact(run, "selection", f"{company}/selection.json", json.dumps(selection).encode("utf-8"), writer=batch)
+        batch.put_json(_job_key(company, state["job"], "checkpoint.json"), state)
+    return state, chunks
+
+def process(data, context=None):
+    """The file_processing stage: ingestion, extraction (possibly over several invocations) and synthesis."""
+    with track(_manifest_for(data), "file_processing", resume=bool(data.get('resume'))) as run:
+        return _process(data, context, run)
+
+def _process(data, context, run):
+    # per-job scratch space: removed when the job ends so warm containers never accumulate or share /tmp state
+    with app.app_context(), tempfile.TemporaryDirectory(prefix="job_") as job_dir:
+        company = data.get('company')
+        store = get_store()
+        chunks_path = os.path.join(job_dir, CHUNKS_NAME)
+        digests = {}  # chunk id -> content digest, in corpus order
+
+        if data.get('resume'):
+            # continuation of a checkpointed job: its chunk artifact and selection were written at ingestion
+            job = data['resume']
+            state = store.get_json(_job_key(company, job, "checkpoint.json"))
+            if state is None or len(state["done"]) != data.get('cursor'):
+                print(f"Stale continuation for job {job}; another invocation owns it")
+                run.suspend()
+                return {'status': 'stale'}, 409
+            store.download(_job_key(company, job, CHUNKS_NAME), chunks_path)
+            wanted = {cid for c in state["clusters"] for cid in c}
+            chunks = []
+            for ch in read_chunks(chunks_path):
+                digests[ch.get("id")] = chunk_digest(ch)
+                if ch.get("id") in wanted:
+                    chunks.append(ch)
+            print({"resume": job, "cursor": data.get('cursor'), "remaining": len(state["clusters"]) - len(state["done"])})
+        else:
+            try:
+                state, chunks = _ingest(data, company, data.get('job') or uuid.uuid4().hex,
+                                        job_dir, chunks_path, digests, run)
+            except FileNotFoundError as e:
+                run.fail(e)
+                return {'status': 400, 'body': str(e)}
+
+        """Run LLM-powered extraction over the previously ingested chunks, one call per
+        cluster of near-duplicate chunks, checkpointing between batches."""
         try:
-            data = extract_from_chunks(chunks, max_chunks=max_chunks)
+            if not _extract_in_batches(company, state, chunks, context):
+                run.suspend()
+                return {'status': 'continuing'}, 202
         except FileNotFoundError as e:
+            run.fail(e)
             return {'status': 400, 'body': str(e)}
+        print({"triage": state["tiers"]})
+        index = {ch.get("id"): i for i, ch in enumerate(chunks)}
+        clusters = [[index[cid] for cid in c] for c in state["clusters"]]
+        outputs = fan_out(chunks, clusters, [state["done"][c[0]] for c in state["clusters"]])
+        records = state["records"]
+        for ch, out in zip(chunks, outputs):
+            records[ch.get("id")] = {"digest": digests[ch.get("id")], "result": out}
+        records = {cid: records[cid] for cid in digests if cid in records}  # corpus order
+        data = merge_extractions([r["result"] for r in records.values()])
 
         counts = {
             "pain_points": len(data.get("pain_points", [])),
@@ -81,11 +272,13 @@ def process(data):
             "chunks_used": len(set(data.get("chunks_used", []))),
         }
         print(counts)
+        print({"llm_cache": get_cache().stats()})
 
         """Aggregate, de-duplicate, and prioritize extracted signals."""
         try:
             synthesis = synthesize(data, top_n=8)
         except FileNotFoundError as e:
+            run.fail(e)
             return {'status': 400, 'body': str(e)}
 
         preview = [
@@ -99,28 +292,19 @@ def process(data):
         ]
         print(preview)
 
-        chunks_json = json.dumps(chunks, indent=2)
         synthesis_json = json.dumps(synthesis, indent=2)
-        # Upload to S3 (creates the directory path automatically)
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=f"{company}/chunks.json",
-            Body=chunks_json,
-            ContentType="application/json"
-        )
-
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=f"{company}/synthesis.json",
-            Body=synthesis_json,
-            ContentType="application/json"
-        )
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=f"{company}/current_state.json",
-            Body=json.dumps({"categories": []}, indent=2).encode("utf-8"),
-            ContentType="application/json"
-        )
+        # the three artifacts are independent: written concurrently
+        index = store.get_json(_job_key(company, state["job"], INDEX_NAME))
+        with store.batch() as batch:
+            batch.call(publish, store, company, index, path=chunks_path)
+            _put_artifact(run, "extractions", f"{company}/extractions.json", json.dumps(
+                {"chunks": records, "dedup": state["dedup"], "triage": state["tiers"]}).encode("utf-8"), writer=batch)
+            _put_artifact(run, "synthesis", f"{company}/synthesis.json", synthesis_json.encode("utf-8"), writer=batch)
+        run.artifact("chunks", chunks_key(company), file_digest({"path": chunks_path}))
+        # a legacy chunks.json left behind would be stale
+        store.delete([_job_key(company, state["job"], name) for name in ("checkpoint.json", CHUNKS_NAME, INDEX_NAME)]
+                     + [f"{company}/{LEGACY_NAME}"])
+        print({"artifacts": store.stats()})
         lambda_client.invoke(
             FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
             InvocationType='Event',  # Async invocation
@@ -129,58 +313,53 @@ def process(data):
                 'task_type': 'score_baseline',
                 'data': {
                     'company': company,
-                    'id': 0
+                    'incremental': state["incremental"],
+                    'job': state["job"],
                 }
             })
         )
     return {'status': 'processing started'}, 202
 
 def process2(data):
-    with app.app_context():
-        model, _ = load_maturity_model()
-        print(data.get("id"))
-        category = score_current_state_baseline(data.get("company"), threshold=55, i=data.get("id"))
-        current_state = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=f"{data.get("company")}/current_state.json")['Body'].read().decode('utf-8'))
-        current_state['categories'].append(category)
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=f"{data.get("company")}/current_state.json",
-            Body=json.dumps(current_state, indent=2).encode("utf-8"),
-            ContentType="application/json"
+    """Score every maturity category in one pass, write current_state.json once, then hand off to policy."""
+    manifest = _manifest_for(data)
+    with app.app_context(), track(manifest, "score_baseline") as run:
+        company = data.get("company")
+        run.inputs.update(incremental=bool(data.get("incremental")),
+                          chunks=manifest.artifact("file_processing", "chunks") if manifest else None)
+        previous = get_store().get_json(f"{company}/current_state.json") if data.get("incremental") else None
+        current_state = score_current_state(company, threshold=55, previous=previous)
+        print([c["id"] for c in current_state["categories"]])
+        _put_artifact(run, "current_state", f"{company}/current_state.json",
+                      json.dumps(current_state, indent=2).encode("utf-8"))
+        lambda_client.invoke(
+            FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
+            InvocationType='Event',  # Async invocation
+            Payload=json.dumps({
+                'worker': True,
+                'task_type': 'policy',
+                'data': {
+                    'company': company,
+                    'job': data.get('job'),
+                }
+            })
         )
-        if data.get("id") < len(model.categories)-1:
-            lambda_client.invoke(
-                FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
-                InvocationType='Event',  # Async invocation
-                Payload=json.dumps({
-                    'worker': True,
-                    'task_type': 'score_baseline',
-                    'data': {
-                        'company': data.get("company"),
-                        'id': data.get("id")+1
-                    }
-                })
-            )
-        else:
-            lambda_client.invoke(
-                FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
-                InvocationType='Event',  # Async invocation
-                Payload=json.dumps({
-                    'worker': True,
-                    'task_type': 'policy',
-                    'data': {
-                        'company': data.get("company"),
-                    }
-                })
-            )
         return {'status': 'processing started'}, 202
 
 def process3(data):
-    with app.app_context():
+    with app.app_context(), track(_manifest_for(data), "policy") as run:
         company = data.get('company')
-        
-        current_state = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=f"{company}/current_state.json")['Body'].read().decode('utf-8'))
-        synthesis = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=f"{company}/synthesis.json")['Body'].read().decode('utf-8'))
+
+        inputs = {}
+        for name in ("current_state", "synthesis"):
+            key = f"{company}/{name}.json"
+            body = get_store().get(key)  # usually cached by the stages before this one in a warm container
+            if body is None:
+                run.fail(f"{key} not found")
+                return {'statusCode': 400, 'body': f"{key} not found"}
+            run.inputs[name] = {"key": key, "sha256": sha256_bytes(body)}
+            inputs[name] = json.loads(body.decode('utf-8'))
+        current_state, synthesis = inputs["current_state"], inputs["synthesis"]
 
         preview = [
             {
@@ -201,8 +380,10 @@ def process3(data):
                 model_path=None,
                 top_k=5,
                 enforce=False,
+                tenant=company,
             )
         except FileNotFoundError as e:
+            run.fail(e)
             return {'statusCode': 400, 'body': str(e)}
 
         policy = out
@@ -219,8 +400,9 @@ def process3(data):
         print(preview)
 
         try:
-            recommendations = generate_recommendations(synthesis, policy, max_recommendations=5)
+            recommendations = generate_recommendations(synthesis, policy, max_recommendations=5, tenant=company)
         except FileNotFoundError as e:
+            run.fail(e)
             return {'status': 400, 'body': str(e)}
         preview = [
             {
@@ -235,18 +417,26 @@ def process3(data):
         ]
         print(preview)
 
+        print({"llm_cache": get_cache().stats(), "llm_cache_pruned": get_cache().prune(),
+               "artifacts": get_store().stats()})
         html = render_dashboard(current_state, policy, recommendations, synthesis, company.capitalize() + " Current State")
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=company + "/dashboard.html",
-            Body=html.encode('utf-8'),
-            ContentType='text/html',
-            ContentDisposition='inline'  # Opens in browser instead of downloading
-        )
+        _put_artifact(run, "dashboard", company + "/dashboard.html", html.encode('utf-8'), content_type='text/html',
+                      ContentDisposition='inline')  # Opens in browser instead of downloading
         return {"message": "process complete!"}, 202
 
         
 
+def process_policy_index(data):
+    """Worker for /pipeline/policy/index: pull the uploaded policy docs and rebuild the index."""
+    with app.app_context(), tempfile.TemporaryDirectory(prefix="job_") as job_dir:
+        saved_files = fetch_files(get_store(), data.get('files', []), job_dir)
+        try:
+            meta = build_policy_index(saved_files, merge=bool(data.get('merge')))
+        except (FileNotFoundError, ValueError) as e:
+            return {'status': 400, 'body': str(e)}
+        print(meta)
+        return {"message": "policy index built"}, 202
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -269,10 +459,15 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 1800,
 }
 
-# Build connection string for MySQL (using pymysql)
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+# Build connection string for MySQL (using pymysql). LOCAL_SQLITE=1 (local runs and
+# benchmarks only) uses a throwaway in-memory SQLite database instead.
+if os.getenv("LOCAL_SQLITE") == "1":
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {}
+else:
+    app.config["SQLALCHEMY_DATABASE_URI"] = (
+        f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
 
 db.init_app(app)
 login_manager.init_app(app)
@@ -295,8 +490,7 @@ def dashboard():
         return redirect(url_for("main.up"))
     print(current_user.email + "/dashboard.html")
     try:
-        s3_object = s3.get_object(Bucket=BUCKET_NAME, Key=current_user.email + "/dashboard.html")
-        html_content = s3_object['Body'].read().decode('utf-8')
+        html_content = get_store().get(current_user.email + "/dashboard.html").decode('utf-8')
         return Response(html_content, mimetype='text/html')
     except:
         with open(os.path.dirname(os.path.realpath(__file__))+'/static/logo.png', 'rb') as f:
@@ -3,6 +3,7 @@
 This module exposes a set of endpoints to:
 
 - Upload raw files for a given job (``/upload``)
+- Report a company's job manifest (``/status``) and re-run one of its stages (``/rerun``)
 - Ingest uploaded files into a chunked intermediate representation (``/ingest``)
 - Run LLM-based extraction over the chunks (``/extract``)
 - Synthesize/prioritize findings (``/synthesize``)
@@ -36,11 +37,13 @@ from flask import Blueprint, request, redirect, url_for
 from flask_login import current_user, login_required
 from werkzeug.utils import secure_filename
 import boto3
-import botocore
 from pydantic import BaseModel
 
 # Local service layer imports
 from ..models.user import User, db
+from ..services.artifacts import get_store
+from ..services.manifest import JobManifest, rerun_event
+from ..services.policy_index import POLICY_INDEX_PREFIX
 
 # -----------------------------------------------------------------------------
 # Logging
@@ -55,8 +58,6 @@ router = Blueprint('pipeline', __name__)
 # =============================================================================
 # Upload
 # =============================================================================
-BUCKET_NAME = os.getenv("BUCKET_NAME")
-s3 = boto3.client('s3', config=botocore.config.Config(s3={'addressing_style':'path'}))
 lambda_client = boto3.client(
     'lambda',
     region_name='us-west-2'
@@ -80,21 +81,15 @@ def upload():
             print(i)
             # Determine a safe destination path under your inputs root.
             filename = secure_filename(f.filename)
-            temp_path = os.path.join("/tmp", filename)   # Lambda's temp folder
-            # Check incoming file size from Flask
-            
-            # Save file
+            # Stream straight to the artifact store: nothing is written to the container's /tmp
             f.stream.seek(0)
-            with open(temp_path, "wb") as tmp:
-                tmp.write(f.read())
-            
-            # Check saved file size
-            
-            s3.upload_file(temp_path, BUCKET_NAME, request.form.get("company") + "/" + filename)
+            get_store().upload_fileobj(f.stream, request.form.get("company") + "/" + filename)
             print("S3")
 
             saved_files.append({"filename": filename, "key": request.form.get("company") + "/" + filename})
         print(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+        incremental = request.form.get("incremental") == "true"
+        manifest = JobManifest.create(get_store(), request.form.get("company"), saved_files, incremental)
         # Invoke this same Lambda function asynchronously as a worker
         lambda_client.invoke(
             FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
@@ -104,13 +99,91 @@ def upload():
                 'task_type': 'file_processing',
                 'data': {
                     'files': saved_files,
-                    'company': request.form.get("company")
+                    'company': request.form.get("company"),
+                    # add these files to the company's existing assessment instead of replacing it
+                    'incremental': incremental,
+                    'job': manifest.job,
                 }
             })
         )
         print("-2")
         
-        return {"message": "proccssing"}, 202
+        return {"message": "proccssing", "job": manifest.job}, 202
     return {"message": "Forbidden"}, 403
 
 
+# =============================================================================
+# Job status
+# =============================================================================
+@router.route("/status", methods=['GET'])
+@login_required
+def status():
+    """The latest job manifest for a company (clients can only see their own)."""
+    company = request.args.get("company") if current_user.acc == "admin" else current_user.email
+    if not company:
+        return {"message": "company is required"}, 400
+    manifest = JobManifest.load(get_store(), company)
+    if manifest is None:
+        return {"message": "No job found"}, 404
+    return manifest.data, 200
+
+
+@router.route("/rerun", methods=['POST'])
+@login_required
+def rerun():
+    """Re-run one stage of a company's latest job from the inputs recorded in its manifest."""
+    if current_user.acc != "admin":
+        return {"message": "Forbidden"}, 403
+    company = request.form.get("company")
+    manifest = JobManifest.load(get_store(), company) if company else None
+    if manifest is None:
+        return {"message": "No job found"}, 404
+    try:
+        event = rerun_event(manifest, request.form.get("stage", ""))
+    except ValueError as e:
+        return {"message": str(e)}, 409
+    lambda_client.invoke(
+        FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
+        InvocationType='Event',  # Async invocation
+        Payload=json.dumps(event)
+    )
+    return {"message": "rerunning", "job": manifest.job, "stage": event["task_type"]}, 202
+
+
+
+
+# =============================================================================
+# Policy index
+# =============================================================================
+POLICY_DOCS_PREFIX = "policy_docs/"
+
+@router.route("/policy/index", methods=['POST'])
+@login_required
+def policy_index():
+    """Upload policy documents and (re)build the policy embedding index in a background worker."""
+    if current_user.acc != "admin":
+        return {"message": "Forbidden"}, 403
+    if not POLICY_INDEX_PREFIX:  # the worker can only publish to S3; the packaged index is read-only
+        return {"message": "Policy indexing is not configured: set POLICY_INDEX_PREFIX"}, 503
+    files = request.files.getlist('files')
+    if not files:
+        return {"message": "No files uploaded"}, 400
+    saved_files = []
+    for f in files:
+        filename = secure_filename(f.filename)
+        f.stream.seek(0)
+        get_store().upload_fileobj(f.stream, POLICY_DOCS_PREFIX + filename)
+        saved_files.append({"filename": filename, "key": POLICY_DOCS_PREFIX + filename})
+    lambda_client.invoke(
+        FunctionName=os.getenv('AWS_LAMBDA_FUNCTION_NAME'),
+        InvocationType='Event',  # Async invocation
+        Payload=json.dumps({
+            'worker': True,
+            'task_type': 'policy_index',
+            'data': {
+                'files': saved_files,
+                'merge': request.form.get("merge") == "true",
+            }
+        })
+    )
+    return {"message": "indexing"}, 202
@@ -0,0 +1,227 @@
+"""Local, in-process assessment pipeline and batch CLI.
+
+Runs ingest -> extract -> synthesize -> baseline -> policy -> recommendations -> dashboard
+for one or many companies in a single process, without the self-invoking Lambda chain,
+and prints per-stage timings. Artifacts go through an artifact store (a local directory,
+the S3 bucket or memory) under the same keys as the deployed pipeline. The maturity model (a
+company's own, when it has one in the store) and the policy index are compiled/loaded once and
+shared by every job that uses them. Ingestion, which parses files in forked worker
+processes, runs for every company first, on the main thread; the remaining stages then run
+in a thread pool, so no process is ever forked while job threads are running.
+
+    python -m src.app.runner acme=inputs/acme globex=inputs/globex --store ./artifacts --jobs 4
+    python -m src.app.runner acme --store s3://my-bucket   # files already uploaded under acme/
+"""
+from __future__ import annotations
+import argparse, json, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .services.artifacts import open_store, set_store
+from .services.chunk_artifact import encode_chunks, publish
+from .services.current_state_baseline import category_matcher, score_chunks
+from .services.dashboard import render_dashboard
+from .services.dedup import cluster_near_duplicates, dedup_report, select_clusters
+from .services.llm import extract_each, fan_out, merge_extractions
+from .services.llm_cache import get_cache
+from .services.maturity import compile_model, load_compiled_model, load_maturity_model, set_default_model_path
+from .services.parsing import PARSERS, chunk_digest, iter_chunks
+from .services.policy_adjudicator import apply_policy_to_current_state
+from .services.policy_index import load_policy_index
+from .services.recommendations import generate_recommendations
+from .services.relevance import RelevanceRanker
+from .services.synthesis import synthesize
+
+STAGES = ("ingest", "extract", "synthesize", "baseline", "policy", "recommendations", "dashboard")
+
+
+class _Timings:
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = round(time.perf_counter() - t0, 3)
+
+
+def _input_files(store, company: str, source: Optional[str]) -> List[Dict]:
+    """Supported files in the local directory ``source``, or the company's uploads in the store."""
+    if source:
+        return [{"filename": p.name, "path": str(p.resolve())}
+                for p in sorted(Path(source).iterdir()) if p.is_file() and p.suffix.lower() in PARSERS]
+    files = []
+    for key in store.list(f"{company}/"):
+        name = key[len(company) + 1:]
+        if "/" not in name and Path(name).suffix.lower() in PARSERS:
+            files.append({"filename": name, "data": store.get(key)})
+    return files
+
+
+def _compiled_for(company: str, store, model=None):
+    return compile_model(model) if model is not None else load_compiled_model(tenant=company, store=store)
+
+
+def ingest_company(company: str, store, model=None, source: Optional[str] = None) -> List[Dict]:
+    """
+    Parse, tag and publish one company's chunks. Parsing forks worker processes: call this
+    from a thread with no other threads running (``run_batch`` ingests before its jobs start).
+    """
+    compiled = _compiled_for(company, store, model)
+    files = _input_files(store, company, source)
+    if not files:
+        raise FileNotFoundError(f"No input files for {company}")
+    chunks = list(iter_chunks(files))
+    compiled.tagger.tag_all(chunks)
+    body, index = encode_chunks(chunks, category_matcher(compiled.model))
+    publish(store, company, index, body=body)
+    return chunks
+
+
+def run_company(company: str, store, model=None, source: Optional[str] = None, index_path: Optional[str] = None,
+                policy: bool = True, threshold: int = 55, chunks: Optional[List[Dict]] = None) -> Dict[str, float]:
+    """
+    Run every stage for one company; returns seconds per stage. ``model`` defaults to the company's own,
+    else the default. ``chunks`` from ``ingest_company`` skip the ingest stage.
+    """
+    timings = _Timings()
+    compiled = _compiled_for(company, store, model)
+    model = compiled.model
+
+    def put(name, doc, writer=store):
+        writer.put_json(f"{company}/{name}", doc, indent=2)
+
+    if chunks is None:
+        with timings.stage("ingest"):
+            chunks = ingest_company(company, store, model, source)
+
+    with timings.stage("extract"):
+        # near-duplicates first: only representatives are ranked, then the selection fans out
+        ranker = RelevanceRanker(model)
+        everything = cluster_near_duplicates(chunks)
+        for c in everything:
+            ranker.observe(chunks[c[0]])
+        selection = ranker.select()
+        groups = select_clusters(everything, [ch.get("id") for ch in chunks], selection["selected"])
+        wanted = {cid for g in groups for cid in g}
+        picked = [ch for ch in chunks if ch.get("id") in wanted]
+        position = {ch.get("id"): i for i, ch in enumerate(picked)}
+        clusters = [[position[cid] for cid in g] for g in groups]
+        tiers = {}
+        outputs = fan_out(picked, clusters, extract_each([picked[c[0]] for c in clusters], stats=tiers))
+        with store.batch() as batch:
+            put("selection.json", selection, batch)
+            put("extractions.json", {
+                "chunks": {ch.get("id"): {"digest": chunk_digest(ch), "result": out} for ch, out in zip(picked, outputs)},
+                "dedup": dedup_report(clusters, picked),
+                "triage": tiers,
+            }, batch)
+
+    with timings.stage("synthesize"):
+        synthesis = synthesize(merge_extractions(outputs), top_n=8)
+        put("synthesis.json", synthesis)
+
+    with timings.stage("baseline"):
+        current_state = score_chunks(chunks, model, threshold=threshold, tagged=True)
+        put("current_state.json", current_state)
+
+    with timings.stage("policy"):
+        adjusted = None
+        if policy:
+            adjusted = apply_policy_to_current_state(current_state, index_path=index_path, top_k=5, enforce=False,
+                                                     tenant=company)
+            put("current_state_policy.json", adjusted)
+
+    with timings.stage("recommendations"):
+        recommendations = generate_recommendations(synthesis, adjusted or current_state, max_recommendations=5,
+                                                   tenant=company)
+        put("recommendations.json", recommendations)
+
+    with timings.stage("dashboard"):
+        html = render_dashboard(current_state, adjusted, recommendations, synthesis, company.capitalize() + " Current State")
+        store.put(f"{company}/dashboard.html", html.encode("utf-8"), content_type="text/html")
+    return timings.seconds
+
+
+def run_batch(jobs: Dict[str, Optional[str]], store, model=None, workers: int = 4, **kwargs) -> Dict[str, Dict]:
+    """
+    ``{company: source dir or None}`` -> ``{company: {"seconds": {...}} or {"error": ...}}``. Every company
+    is ingested first, one after another on this thread (parsing forks processes); the remaining stages
+    then run concurrently.
+    """
+    results: Dict[str, Dict] = {}
+    ingested: Dict[str, tuple] = {}  # company -> (chunks, ingest seconds)
+    for company in jobs:
+        t0 = time.perf_counter()
+        try:
+            ingested[company] = (ingest_company(company, store, model, source=jobs[company]),
+                                 round(time.perf_counter() - t0, 3))
+        except Exception as e:
+            print(f"{company}: failed: {e}")
+            results[company] = {"error": str(e), "total": round(time.perf_counter() - t0, 3)}
+
+    def one(company):
+        chunks, ingest = ingested.pop(company)  # the job owns its chunks from here
+        t0 = time.perf_counter()
+        try:
+            seconds = dict(ingest=ingest, **run_company(company, store, model, chunks=chunks, **kwargs))
+            return company, {"seconds": seconds, "total": round(ingest + time.perf_counter() - t0, 3)}
+        except Exception as e:
+            print(f"{company}: failed: {e}")
+            return company, {"error": str(e), "total": round(ingest + time.perf_counter() - t0, 3)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results.update(pool.map(one, list(ingested)))
+    return {company: results[company] for company in jobs}
+
+
+def _print_report(results: Dict[str, Dict], wall: float) -> None:
+    width = max([len("company")] + [len(c) for c in results])
+    print(f"{'company':<{width}} " + " ".join(f"{s:>15}" for s in STAGES) + f" {'total':>8}")
+    for company, r in results.items():
+        if "error" in r:
+            print(f"{company:<{width}} failed: {r['error']}")
+            continue
+        print(f"{company:<{width}} " + " ".join(f"{r['seconds'].get(s, 0.0):>15.2f}" for s in STAGES)
+              + f" {r['total']:>8.2f}")
+    print(f"{len(results)} companies in {wall:.2f}s")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the assessment pipeline locally for one or many companies")
+    ap.add_argument("companies", nargs="+",
+                    help="COMPANY=DIR to read input files from DIR, or COMPANY for files already under COMPANY/ in the store")
+    ap.add_argument("--store", default="artifacts", help="artifact directory, s3://bucket or memory:// (default ./artifacts)")
+    ap.add_argument("--jobs", type=int, default=4, help="companies processed concurrently")
+    ap.add_argument("--model", default=None, help="maturity model YAML (default assets/maturity_model.yaml)")
+    ap.add_argument("--policy-index", default=None, help="policy index JSON (default assets/policy_index.json)")
+    ap.add_argument("--no-policy", action="store_true", help="skip policy adjudication")
+    ap.add_argument("--report", default=None, help="write the per-company timings as JSON to this path")
+    args = ap.parse_args(argv)
+
+    if args.model:
+        set_default_model_path(args.model)
+    load_maturity_model()  # compiled once; shared by every job without a model of its own
+    store = open_store(args.store)
+    set_store(store)  # policy and recommendations resolve company models through the same store
+    if not args.no_policy:
+        load_policy_index(args.policy_index)  # cached per process: loaded once for all jobs
+    jobs = dict(c.split("=", 1) if "=" in c else (c, None) for c in args.companies)
+
+    t0 = time.perf_counter()
+    results = run_batch(jobs, store, workers=args.jobs,
+                        index_path=args.policy_index, policy=not args.no_policy)
+    _print_report(results, time.perf_counter() - t0)
+    get_cache().prune()
+    if args.report:
+        Path(args.report).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0 if all("error" not in r for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
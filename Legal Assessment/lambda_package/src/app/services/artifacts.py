@@ -0,0 +1,381 @@
+"""Artifact store for the assessment pipeline.
+
+Every stage reads and writes its artifacts (uploads, ``{company}/chunks.jsonl.gz``,
+``{company}/synthesis.json``, the job manifest and checkpoints, ...) through an
+``ArtifactStore``, so the Lambda chain and the local runner can run against S3, a
+directory or memory interchangeably, with the same keys.
+
+Backends (``ARTIFACT_STORE``, or ``open_store(uri)``):
+
+- ``s3``: objects in ``BUCKET_NAME`` (``s3://bucket``).
+- ``local``: files under ``ARTIFACT_DIR`` (a directory path).
+- ``memory``: a dict in this process (``memory://``), a stand-in for development runs.
+
+The default is ``s3`` when ``BUCKET_NAME`` is set, ``local`` otherwise.
+
+Reads are cached per process, so a warm Lambda container keeps them across
+invocations, up to ``ARTIFACT_CACHE_MB``. Every read of a cached key is revalidated
+by ETag (a conditional GET on S3), so an artifact another container rewrote is never
+served stale. ``batch()`` issues independent writes concurrently.
+"""
+from __future__ import annotations
+import hashlib, io, json, os, shutil, threading, uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import boto3
+import botocore
+
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "s3" if BUCKET_NAME else "local")
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "artifacts")
+ARTIFACT_CACHE_MB = int(os.getenv("ARTIFACT_CACHE_MB", "64"))
+ARTIFACT_WRITE_WORKERS = int(os.getenv("ARTIFACT_WRITE_WORKERS", "8"))
+
+# Backends implement get(key, etag) -> (body, etag), where (None, etag) means "not
+# modified since etag" and (None, None) means missing, get_range(key, start, end) ->
+# (bytes, object size), plus put / open / download / upload / upload_fileobj / delete / list.
+
+
+class _S3Backend:
+    def __init__(self, bucket: str, client=None):
+        self.bucket = bucket
+        self.s3 = client or boto3.client('s3', config=botocore.config.Config(s3={'addressing_style': 'path'}))
+
+    def get(self, key: str, etag: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=key, **({"IfNoneMatch": etag} if etag else {}))
+        except botocore.exceptions.ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("304", "NotModified"):
+                return None, etag
+            if code in ("NoSuchKey", "404"):
+                return None, None
+            raise
+        return obj['Body'].read(), obj.get('ETag')
+
+    def get_range(self, key: str, start: int, end: int) -> Tuple[bytes, int]:
+        obj = self.s3.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end - 1}")
+        return obj['Body'].read(), int(obj['ContentRange'].rsplit("/", 1)[1])
+
+    def put(self, key: str, body: bytes, content_type: str, **extra) -> Optional[str]:
+        return self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type, **extra).get('ETag')
+
+    def open(self, key: str) -> Tuple[int, BinaryIO]:
+        obj = self.s3.get_object(Bucket=self.bucket, Key=key)
+        return int(obj.get('ContentLength') or 0), obj['Body']
+
+    def download(self, key: str, path: str) -> None:
+        self.s3.download_file(self.bucket, key, path)
+
+    def upload(self, path: str, key: str, content_type: str) -> None:
+        self.s3.upload_file(path, self.bucket, key, ExtraArgs={"ContentType": content_type})
+
+    def upload_fileobj(self, fileobj: BinaryIO, key: str) -> None:
+        self.s3.upload_fileobj(fileobj, self.bucket, key)
+
+    def delete(self, keys: List[str]) -> None:
+        for i in range(0, len(keys), 1000):
+            self.s3.delete_objects(Bucket=self.bucket, Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]]})
+
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(o["Key"] for o in page.get("Contents", []))
+        return sorted(keys)
+
+
+class _LocalBackend:
+    """Files under ``root``; the ETag is the file's mtime and size."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    @staticmethod
+    def _etag(p: Path) -> str:
+        st = p.stat()
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    @contextmanager
+    def _replace(self, key: str) -> Iterator[BinaryIO]:
+        p = self.root / key
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.name}.{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp, "wb") as f:
+                yield f
+            tmp.replace(p)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def get(self, key: str, etag: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        p = self.root / key
+        try:
+            tag = self._etag(p)
+            if tag == etag:
+                return None, etag
+            return p.read_bytes(), tag
+        except FileNotFoundError:
+            return None, None
+
+    def get_range(self, key: str, start: int, end: int) -> Tuple[bytes, int]:
+        with open(self.root / key, "rb") as f:
+            f.seek(start)
+            return f.read(end - start), os.fstat(f.fileno()).st_size
+
+    def put(self, key: str, body: bytes, content_type: str, **extra) -> Optional[str]:
+        with self._replace(key) as f:
+            f.write(body)
+        return self._etag(self.root / key)
+
+    def open(self, key: str) -> Tuple[int, BinaryIO]:
+        p = self.root / key
+        return p.stat().st_size, open(p, "rb")
+
+    def download(self, key: str, path: str) -> None:
+        shutil.copyfile(self.root / key, path)
+
+    def upload(self, path: str, key: str, content_type: str) -> None:
+        with open(path, "rb") as src:
+            self.upload_fileobj(src, key)
+
+    def upload_fileobj(self, fileobj: BinaryIO, key: str) -> None:
+        with self._replace(key) as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            (self.root / key).unlink(missing_ok=True)
+
+    def list(self, prefix: str) -> List[str]:
+        base = self.root / prefix.rsplit("/", 1)[0] if "/" in prefix else self.root
+        if not base.is_dir():
+            return []
+        keys = (str(p.relative_to(self.root)).replace(os.sep, "/") for p in base.rglob("*")
+                if p.is_file() and not p.name.endswith(".part"))
+        return sorted(k for k in keys if k.startswith(prefix))
+
+
+class _MemoryBackend:
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, etag: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        with self._lock:
+            body, tag = self.objects.get(key, (None, None))
+        if body is None:
+            return None, None
+        return (None, etag) if tag == etag else (body, tag)
+
+    def get_range(self, key: str, start: int, end: int) -> Tuple[bytes, int]:
+        body, _ = self.get(key)
+        if body is None:
+            raise FileNotFoundError(key)
+        return body[start:end], len(body)
+
+    def put(self, key: str, body: bytes, content_type: str, **extra) -> Optional[str]:
+        tag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            self.objects[key] = (bytes(body), tag)
+        return tag
+
+    def open(self, key: str) -> Tuple[int, BinaryIO]:
+        body, _ = self.get(key)
+        if body is None:
+            raise FileNotFoundError(key)
+        return len(body), io.BytesIO(body)
+
+    def download(self, key: str, path: str) -> None:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.open(key)[1], f)
+
+    def upload(self, path: str, key: str, content_type: str) -> None:
+        self.put(key, Path(path).read_bytes(), content_type)
+
+    def upload_fileobj(self, fileobj: BinaryIO, key: str) -> None:
+        self.put(key, fileobj.read(), "application/octet-stream")
+
+    def delete(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self.objects.pop(key, None)
+
+    def list(self, prefix: str) -> List[str]:
+        with self._lock:
+            return sorted(k for k in self.objects if k.startswith(prefix))
+
+
+class _Batch:
+    """Writes collected by ``ArtifactStore.batch`` and issued together."""
+
+    def __init__(self, store: "ArtifactStore"):
+        self.store = store
+        self.calls: List[Tuple[Any, tuple, dict]] = []
+
+    def put(self, *args, **kwargs) -> None:
+        self.calls.append((self.store.put, args, kwargs))
+
+    def put_json(self, *args, **kwargs) -> None:
+        self.calls.append((self.store.put_json, args, kwargs))
+
+    def upload(self, *args, **kwargs) -> None:
+        self.calls.append((self.store.upload, args, kwargs))
+
+    def call(self, fn, *args, **kwargs) -> None:
+        """Any other write, e.g. one that must itself issue several writes in order."""
+        self.calls.append((fn, args, kwargs))
+
+
+class ArtifactStore:
+    """Artifacts by key, with ETag-validated read caching over one backend."""
+
+    def __init__(self, backend, cache_mb: int = ARTIFACT_CACHE_MB, write_workers: int = ARTIFACT_WRITE_WORKERS):
+        self.backend = backend
+        self.cache_bytes = cache_mb * 2**20
+        self.write_workers = write_workers
+        self._cache: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()  # key -> (etag, body), LRU order
+        self._cached = 0
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @classmethod
+    def from_env(cls) -> "ArtifactStore":
+        if ARTIFACT_STORE == "s3" and BUCKET_NAME:
+            return cls(_S3Backend(BUCKET_NAME))
+        if ARTIFACT_STORE == "memory":
+            return cls(_MemoryBackend())
+        return cls(_LocalBackend(ARTIFACT_DIR))
+
+    def _remember(self, key: str, etag: Optional[str], body: bytes) -> None:
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old:
+                self._cached -= len(old[1])
+            if etag is None or len(body) > self.cache_bytes:
+                return
+            self._cache[key] = (etag, body)
+            self._cached += len(body)
+            while self._cached > self.cache_bytes:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached -= len(evicted)
+
+    def _forget(self, key: str) -> None:
+        self._remember(key, None, b"")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The artifact's bytes, or None if it does not exist."""
+        with self._lock:
+            hit = self._cache.get(key)
+        body, etag = self.backend.get(key, hit[0] if hit else None)
+        if body is None and etag is not None and hit:
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                self._stats["revalidated"] += 1
+            return hit[1]
+        if body is None:
+            self._forget(key)
+            with self._lock:
+                self._stats["missing"] += 1
+            return None
+        self._remember(key, etag, body)
+        with self._lock:
+            self._stats["fetched"] += 1
+        return body
+
+    def get_json(self, key: str) -> Any:
+        body = self.get(key)
+        return None if body is None else json.loads(body.decode("utf-8"))
+
+    def put(self, key: str, body: bytes, content_type: str = "application/json", **extra) -> None:
+        """Write ``body``; ``extra`` is passed through to S3 ``put_object`` (ignored by the other backends)."""
+        self._remember(key, self.backend.put(key, body, content_type, **extra), body)
+
+    def put_json(self, key: str, doc: Any, indent: Optional[int] = None) -> bytes:
+        body = json.dumps(doc, indent=indent).encode("utf-8")
+        self.put(key, body)
+        return body
+
+    def get_range(self, key: str, start: int, end: int) -> Tuple[bytes, int]:
+        """Bytes ``[start, end)`` of an artifact and its total size, bypassing the cache."""
+        return self.backend.get_range(key, start, end)
+
+    def open(self, key: str) -> Tuple[int, BinaryIO]:
+        """(size, readable stream) for large objects, bypassing the cache."""
+        return self.backend.open(key)
+
+    def download(self, key: str, path: str) -> None:
+        self.backend.download(key, path)
+
+    def upload(self, path: str, key: str, content_type: str = "application/json") -> None:
+        """Stream the file at ``path`` into the store (not cached: it may be large)."""
+        self._forget(key)
+        self.backend.upload(path, key, content_type)
+
+    def upload_fileobj(self, fileobj: BinaryIO, key: str) -> None:
+        self._forget(key)
+        self.backend.upload_fileobj(fileobj, key)
+
+    def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            self._forget(key)
+        if keys:
+            self.backend.delete(list(keys))
+
+    def list(self, prefix: str) -> List[str]:
+        return self.backend.list(prefix)
+
+    @contextmanager
+    def batch(self) -> Iterator[_Batch]:
+        """
+        Collect independent writes (``put``, ``put_json``, ``upload``) and issue them
+        concurrently when the block exits; the first failure is re-raised once all have ended.
+        """
+        batch = _Batch(self)
+        yield batch
+        if len(batch.calls) <= 1 or self.write_workers <= 1:
+            for call, args, kwargs in batch.calls:
+                call(*args, **kwargs)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.write_workers, len(batch.calls))) as pool:
+            futures = [pool.submit(call, *args, **kwargs) for call, args, kwargs in batch.calls]
+        for f in futures:
+            f.result()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"fetched": self._stats["fetched"], "revalidated": self._stats["revalidated"],
+                    "missing": self._stats["missing"], "cached_bytes": self._cached}
+
+
+def open_store(uri: str) -> ArtifactStore:
+    """``s3://bucket``, ``memory://`` or a local directory."""
+    if uri.startswith("s3://"):
+        return ArtifactStore(_S3Backend(uri[len("s3://"):].strip("/")))
+    if uri.startswith("memory://"):
+        return ArtifactStore(_MemoryBackend())
+    return ArtifactStore(_LocalBackend(uri))
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    """Process-wide store configured from the environment (its read cache lives as long as the container)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore.from_env()
+        return _store
+
+
+def set_store(store: Optional[ArtifactStore]) -> None:
+    """Route every stage through ``store`` (e.g. ``open_store("memory://")``); None restores the default."""
+    global _store
+    with _store_lock:
+        _store = store
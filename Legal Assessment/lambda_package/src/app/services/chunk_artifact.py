@@ -0,0 +1,195 @@
+"""Chunk artifact codec: gzip-compressed JSON Lines with an offset index and category shards.
+
+``{company}/chunks.jsonl.gz`` holds one chunk per line, compressed in blocks of
+``CHUNK_BLOCK`` chunks. Each block is its own gzip member, so the file as a whole is
+an ordinary gzip stream, and any run of blocks can be fetched with one range GET and
+decompressed on its own. ``{company}/chunks.index.json`` lists the blocks
+``[byte offset, length, first chunk ordinal, count]``, the data size, and per maturity
+category the ordinals of the chunks containing one of its keywords (null when the
+category scores against every chunk; see ``current_state_baseline.category_matcher``).
+Shards are keyed by the model's keywords, so a changed model falls back to full reads.
+
+Companies ingested before this format have a plain ``{company}/chunks.json``, which
+``load_chunks`` and ``open_chunks`` fall back to.
+"""
+from __future__ import annotations
+import gzip, io, json, os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+CHUNKS_NAME = "chunks.jsonl.gz"
+INDEX_NAME = "chunks.index.json"
+LEGACY_NAME = "chunks.json"
+CONTENT_TYPE = "application/gzip"
+
+CHUNK_BLOCK = int(os.getenv("CHUNK_BLOCK", "32"))  # chunks per gzip member
+CHUNK_RANGE_GAP = int(os.getenv("CHUNK_RANGE_GAP", str(512 * 1024)))  # bytes skipped-over rather than split into two GETs
+CHUNK_FULL_READ = float(os.getenv("CHUNK_FULL_READ", "0.75"))  # fraction of the file above which one plain GET is used
+
+# (shard key, chunk -> ids of the categories it belongs to)
+Matcher = Tuple[str, Callable[[Dict[str, Any]], Iterable[str]]]
+
+
+def chunks_key(company: str) -> str:
+    return f"{company}/{CHUNKS_NAME}"
+
+
+def index_key(company: str) -> str:
+    return f"{company}/{INDEX_NAME}"
+
+
+class ChunkWriter:
+    """Write chunks to the binary ``fp`` block by block; ``close`` returns the index."""
+
+    def __init__(self, fp: BinaryIO, matcher: Optional[Matcher] = None, block: int = CHUNK_BLOCK):
+        self.fp = fp
+        self.matcher = matcher
+        self.block = max(1, block)
+        self.blocks: List[List[int]] = []
+        self.shards: Dict[str, List[int]] = {}
+        self.count = 0
+        self.offset = 0
+        self._lines: List[bytes] = []
+
+    def _flush(self) -> None:
+        if not self._lines:
+            return
+        member = gzip.compress(b"".join(self._lines), compresslevel=6, mtime=0)
+        self.fp.write(member)
+        self.blocks.append([self.offset, len(member), self.count - len(self._lines), len(self._lines)])
+        self.offset += len(member)
+        self._lines = []
+
+    def write(self, ch: Dict[str, Any]) -> None:
+        if self.matcher is not None:
+            for cat_id in self.matcher[1](ch):
+                self.shards.setdefault(cat_id, []).append(self.count)
+        self._lines.append(json.dumps(ch, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.count += 1
+        if len(self._lines) >= self.block:
+            self._flush()
+
+    def close(self) -> Dict[str, Any]:
+        self._flush()
+        index: Dict[str, Any] = {"version": 1, "count": self.count, "size": self.offset, "blocks": self.blocks}
+        if self.matcher is not None:
+            index["shard_key"] = self.matcher[0]
+            index["shards"] = self.shards
+        return index
+
+
+def write_chunk_file(chunks: Iterable[Dict[str, Any]], path: str, matcher: Optional[Matcher] = None) -> Dict[str, Any]:
+    """Stream ``chunks`` into a chunk artifact at ``path``; returns its index."""
+    with open(path, "wb") as fp:
+        writer = ChunkWriter(fp, matcher)
+        for ch in chunks:
+            writer.write(ch)
+        return writer.close()
+
+
+def encode_chunks(chunks: Iterable[Dict[str, Any]], matcher: Optional[Matcher] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """(artifact bytes, index) for in-memory ``chunks``."""
+    buf = io.BytesIO()
+    writer = ChunkWriter(buf, matcher)
+    for ch in chunks:
+        writer.write(ch)
+    index = writer.close()
+    return buf.getvalue(), index
+
+
+def publish(store, company: str, index: Dict[str, Any], path: Optional[str] = None, body: Optional[bytes] = None) -> None:
+    """Write a company's chunk artifact (from ``path`` or ``body``), then its index."""
+    if path is not None:
+        store.upload(path, chunks_key(company), CONTENT_TYPE)
+    else:
+        store.put(chunks_key(company), body, CONTENT_TYPE)
+    store.put_json(index_key(company), index)  # last: readers never see an index ahead of its data
+
+
+def _decode(body: bytes) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in gzip.decompress(body).splitlines() if line.strip()]
+
+
+class ChunkArtifact:
+    """Reader for one company's chunk artifact."""
+
+    def __init__(self, store, key: str, index: Dict[str, Any]):
+        self.store = store
+        self.key = key
+        self.index = index
+
+    @property
+    def count(self) -> int:
+        return self.index["count"]
+
+    def shards(self, shard_key: str) -> Optional[Dict[str, Optional[List[int]]]]:
+        """Category id -> chunk ordinals, or None if the shards were built for a different model."""
+        if self.index.get("shard_key") != shard_key:
+            return None
+        return self.index.get("shards") or {}
+
+    def _runs(self, blocks: List[List[int]]) -> List[Tuple[int, int, List[List[int]]]]:
+        # adjacent (or nearly adjacent) blocks share one range request: (start, end, blocks)
+        runs: List[Tuple[int, int, List[List[int]]]] = []
+        for b in blocks:
+            if runs and b[0] - runs[-1][1] <= CHUNK_RANGE_GAP:
+                start, _, members = runs[-1]
+                runs[-1] = (start, b[0] + b[1], members + [b])
+            else:
+                runs.append((b[0], b[0] + b[1], [b]))
+        return runs
+
+    def _fetch(self, run: Tuple[int, int, List[List[int]]]) -> Dict[int, Dict[str, Any]]:
+        start, end, members = run
+        body, size = self.store.get_range(self.key, start, end)
+        if size != self.index["size"]:
+            raise RuntimeError(f"{self.key} changed while it was being read; retry the stage")
+        out = {}
+        for offset, length, first, _ in members:
+            for k, ch in enumerate(_decode(body[offset - start:offset - start + length])):
+                out[first + k] = ch
+        return out
+
+    def read(self, ordinals: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Chunks by ordinal, in corpus order: all of them, or at least those in ``ordinals``
+        (whole blocks are decoded). Only the blocks needed are fetched, with range GETs
+        issued concurrently, unless they make up most of the file.
+        """
+        blocks = self.index["blocks"]
+        if ordinals is not None:
+            wanted = sorted(set(ordinals))
+            picked, i = [], 0
+            for b in blocks:
+                while i < len(wanted) and wanted[i] < b[2]:
+                    i += 1
+                if i < len(wanted) and wanted[i] < b[2] + b[3]:
+                    picked.append(b)
+            blocks = picked
+        if not blocks:
+            return {}
+        if sum(b[1] for b in blocks) > CHUNK_FULL_READ * self.index["size"]:
+            body = self.store.get(self.key)
+            if body is None or len(body) != self.index["size"]:
+                raise RuntimeError(f"{self.key} is missing or does not match its index")
+            return dict(enumerate(_decode(body)))
+        runs = self._runs(blocks)
+        out: Dict[int, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=min(8, len(runs))) as pool:
+            for part in pool.map(self._fetch, runs):
+                out.update(part)
+        return dict(sorted(out.items()))
+
+
+def open_chunks(store, company: str) -> Optional[ChunkArtifact]:
+    """The company's chunk artifact, or None if it only has a legacy ``chunks.json`` (or nothing)."""
+    index = store.get_json(index_key(company))
+    return ChunkArtifact(store, chunks_key(company), index) if index is not None else None
+
+
+def load_chunks(store, company: str) -> Optional[List[Dict[str, Any]]]:
+    """Every chunk of the company, from the chunk artifact or a legacy ``chunks.json``; None if neither exists."""
+    artifact = open_chunks(store, company)
+    if artifact is not None:
+        return list(artifact.read().values())
+    return store.get_json(f"{company}/{LEGACY_NAME}")
@@ -1,62 +1,85 @@
 from __future__ import annotations
-import json, statistics
+import hashlib, heapq, json, statistics
 from pathlib import Path
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
 from rapidfuzz import fuzz
+from rapidfuzz import process as rf_process
+
+# optional: rapidfuzz.process.cdist needs numpy; without it we use the pruned single-core scorer.
+# The Lambda dependency layer ships no numpy, so the deployed baseline always takes the pruned path.
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-import boto3
 import os
 import json
-BUCKET_NAME = os.getenv("BUCKET_NAME")
-s3 = boto3.client('s3')
+BASELINE_WORKERS = int(os.getenv("BASELINE_WORKERS", str(min(8, os.cpu_count() or 1))))
+BASELINE_CDIST_WORKERS = int(os.getenv("BASELINE_CDIST_WORKERS", "-1"))  # -1 = all cores
 
-from ..services.maturity import load_maturity_model
-from ..schemas.maturity import Criterion
+from ..services.artifacts import get_store
+from ..services.chunk_artifact import load_chunks, open_chunks
+from ..services.maturity import compile_model, load_compiled_model
+from ..services.tagger import TEXT_LIMIT, category_tags, criterion_tag, tagger_for
+from ..schemas.maturity import Criterion, MaturityModel
 
 
 def _text(ch: Dict) -> str:
-    return (ch.get("text") or "")[:4000]
+    return (ch.get("text") or "")[:TEXT_LIMIT]
 
 def _source(ch: Dict) -> Dict:
     src = ch.get("source") or {}
     return {"file": src.get("file"), "locator": src.get("locator"),
             "excerpt": (ch.get("text") or "")[:240]}
 
-def _similarity(a: str, b: str) -> int:
+def _lowered(chunks: List[Dict]) -> List[str]:
+    # truncate + lowercase each chunk once per job; every scorer below works on these
+    return [_text(ch).lower() for ch in chunks]
+
+def _use_cdist() -> bool:
+    return np is not None and BASELINE_CDIST_WORKERS != 1 and (os.cpu_count() or 1) > 1
+
+def _score_matrix(descriptors: List[str], texts: List[str]) -> List[List[float]]:
+    """partial_ratio for every (descriptor, text) pair in one multi-core call; rows follow ``descriptors``."""
     # partial ratio works well for short descriptors vs long chunks
-    return fuzz.partial_ratio(a.lower(), b.lower())
-
-def _match_level(descriptor: str, chunks: List[Dict]) -> Tuple[int, List[Dict]]:
-    # return best score and the top 3 evidence chunks
-    scores = []
-    for ch in chunks:
-        scores.append((_similarity(descriptor, _text(ch)), ch))
-    scores.sort(key=lambda x: x[0], reverse=True)
-    top = scores[:3]
-    best = top[0][0] if top else 0
-    evid = [{"score": s, "source": _source(ch)} for s, ch in top]
-    return best, evid
-
-def _filter_chunks(chunks: List[Dict], keywords: List[str]) -> List[Dict]:
-    if not keywords:
-        return chunks
-    kw = [k.lower() for k in keywords]
-    out = []
-    for ch in chunks:
-        t = _text(ch).lower()
-        if any(k in t for k in kw):
-            out.append(ch)
+    if not descriptors or not texts:
+        return [[] for _ in descriptors]
+    m = rf_process.cdist(descriptors, texts, scorer=fuzz.partial_ratio,
+                         dtype=np.float64, workers=BASELINE_CDIST_WORKERS)
+    return m.tolist()
+
+def _top3_from_row(row: List[float], col_of: Dict[int, int], idx: List[int]) -> List[Tuple[float, int]]:
+    # partial selection of the 3 best (score, chunk index); ties keep chunk order
+    top = heapq.nsmallest(3, range(len(idx)), key=lambda k: (-row[col_of[idx[k]]], k))
+    return [(row[col_of[idx[k]]], idx[k]) for k in top]
+
+def _top3_pruned(descriptor: str, lowered: List[str], idx: List[int]) -> List[Tuple[float, int]]:
+    # single-core path: once 3 candidates are held, score_cutoff lets rapidfuzz skip weaker chunks early
+    heap: List[Tuple[float, int, int]] = []  # (score, -position, chunk index)
+    for k, i in enumerate(idx):
+        cutoff = heap[0][0] if len(heap) == 3 else 0
+        item = (fuzz.partial_ratio(descriptor, lowered[i], score_cutoff=cutoff), -k, i)
+        if len(heap) < 3:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return [(sc, i) for sc, _, i in sorted(heap, reverse=True)]
+
+def _filter_idx(chunks: List[Dict], idx: List[int], tag: str) -> List[int]:
+    # chunks carrying ``tag`` (see services.tagger): the category's / criterion's keywords occur in them
+    out = [i for i in idx if tag in chunks[i]["tags"]]
     # fallback to all if filter too strict
-    return out if out else chunks
+    return out if out else idx
 
-def _score_criterion(cr: Criterion, chunks: List[Dict]) -> Dict:
-    # For each level (1..4), score against chunks; pick highest
+def _score_criterion(cr: Criterion, tops: Dict[int, List[Tuple[float, int]]], chunks: List[Dict]) -> Dict:
+    # For each level (1..4), take its top-3 (score, chunk) matches; pick highest
     candidates = []
     evid_map = {}
-    for lvl, desc in cr.levels.items():
-        best, evid = _match_level(desc, chunks)
-        candidates.append((lvl, best))
-        evid_map[lvl] = evid
+    for lvl in cr.levels:
+        top = tops[lvl]
+        candidates.append((lvl, top[0][0] if top else 0))
+        evid_map[lvl] = [{"score": sc, "source": _source(chunks[i])} for sc, i in top]
     candidates.sort(key=lambda x: x[1], reverse=True)
     pred_level, pred_score = candidates[0]
     return {
@@ -75,19 +98,25 @@ def _rollup(levels: List[int], method: str) -> int:
         return max(1, min(4, round(sum(levels)/len(levels))))
     return max(1, min(4, int(statistics.median(levels))))
 
-def score_current_state_baseline(company, i, threshold: int = 55, model_path: str | None = None):
-    """
-    Build current-state levels for every category using fuzzy match to descriptors.
-    Writes data/working/{job}/current_state.json
-    """
-    chunks = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=f"{company}/chunks.json")['Body'].read().decode('utf-8'))
-    model, _ = load_maturity_model(model_path)
-    cat = model.categories[i]
-    rel_chunks = _filter_chunks(chunks, keywords=[k for cr in cat.criteria for k in cr.keywords])
-    crit_results = []
-    for cr in cat.criteria:
-        crit_chunks = _filter_chunks(rel_chunks, cr.keywords)
-        crit_results.append(_score_criterion(cr, crit_chunks))
+def _score_category(cat, chunks: List[Dict], threshold: int, lowered: List[str] | None = None,
+                    descs: List[Tuple[str, int, str]] | None = None) -> Dict:
+    lowered = _lowered(chunks) if lowered is None else lowered
+    # (criterion id, level, lowercased descriptor), precompiled per model (see maturity.CompiledModel)
+    if descs is None:
+        descs = [(cr.id, lvl, desc.lower()) for cr in cat.criteria for lvl, desc in cr.levels.items()]
+    rel = _filter_idx(chunks, list(range(len(chunks))), cat.id)
+    crit_idx = {cr.id: _filter_idx(chunks, rel, criterion_tag(cat.id, cr.id)) for cr in cat.criteria}
+    tops: Dict[str, Dict[int, List[Tuple[float, int]]]] = {cr.id: {} for cr in cat.criteria}
+    if _use_cdist():
+        # one batched call scores every level descriptor of the category against its chunks
+        matrix = _score_matrix([d for _, _, d in descs], [lowered[i] for i in rel])
+        col_of = {ci: k for k, ci in enumerate(rel)}
+        for (cid, lvl, _), row in zip(descs, matrix):
+            tops[cid][lvl] = _top3_from_row(row, col_of, crit_idx[cid])
+    else:
+        for cid, lvl, desc in descs:
+            tops[cid][lvl] = _top3_pruned(desc, lowered, crit_idx[cid])
+    crit_results = [_score_criterion(cr, tops[cr.id], chunks) for cr in cat.criteria]
     levels = [c["level"] for c in crit_results]
     level = _rollup(levels, cat.rollup)
     coverage = (sum(1 for c in crit_results if c["score"] >= threshold) / max(1, len(crit_results)))
@@ -100,4 +129,128 @@ def score_current_state_baseline(company, i, threshold: int = 55, model_path: st
         "coverage": round(coverage, 2),
         "confidence": round(confidence, 2),
         "criteria": crit_results
-    }
\ No newline at end of file
+    }
+
+def category_matcher(model: MaturityModel) -> Tuple[str, Callable[[Dict], List[str]]]:
+    """
+    (key, tagged chunk -> its category ids), for the category shards of the chunk artifact.
+    A category only ever scores the chunks tagged with it, or every chunk when none are,
+    so shards give identical results. The key is the tagger's: it changes with the model's keywords.
+    """
+    return tagger_for(model).key, lambda ch: category_tags(ch["tags"])
+
+def _load_chunks(company) -> List[Dict]:
+    chunks = load_chunks(get_store(), company)
+    if chunks is None:
+        raise FileNotFoundError(f"No chunks for {company}")
+    return chunks
+
+def _load_shards(company, model: MaturityModel, categories) -> Tuple[List[Dict], Dict[str, List[int]] | None]:
+    """
+    The chunks ``categories`` score against, tagged for ``model``, and each one's positions
+    in that list (None: all of them). Only their shards are fetched when the chunk artifact
+    was tagged for this model; otherwise every chunk is read and tagged.
+    """
+    artifact = open_chunks(get_store(), company)
+    tagger = tagger_for(model)
+    shards = artifact.shards(tagger.key) if artifact is not None else None
+    if shards is None:  # legacy chunks.json, or tagged against another model: tag them now
+        return tagger.tag_all(_load_chunks(company)), None
+    wanted = [shards.get(cat.id) for cat in categories]
+    fetched = artifact.read(None if any(w is None for w in wanted) else [o for w in wanted for o in w])
+    pos = {o: k for k, o in enumerate(fetched)}
+    print({"baseline_chunks": len(fetched), "of": artifact.count})
+    return list(fetched.values()), {cat.id: [pos[o] for o in shards[cat.id]]
+                                    for cat in categories if shards.get(cat.id) is not None}
+
+def _views(chunks: List[Dict], lowered: List[str], shards: Dict[str, List[int]] | None):
+    def view(cat) -> Tuple[List[Dict], List[str]]:
+        idx = (shards or {}).get(cat.id)
+        if idx is None:
+            return chunks, lowered
+        return [chunks[i] for i in idx], [lowered[i] for i in idx]
+    return view
+
+def _score_all(categories, view, threshold: int, workers: int | None,
+               descriptors: Dict[str, List[Tuple[str, int, str]]] | None = None) -> List[Dict]:
+    def score(cat):
+        chunks, lowered = view(cat)
+        return _score_category(cat, chunks, threshold, lowered, (descriptors or {}).get(cat.id))
+    workers = workers or BASELINE_WORKERS
+    if workers <= 1 or len(categories) <= 1:
+        return [score(cat) for cat in categories]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(score, categories))
+
+def score_categories(chunks: List[Dict], model: MaturityModel, threshold: int = 55,
+                     workers: int | None = None) -> List[Dict]:
+    """Score every category of ``model`` against ``chunks`` in a worker pool; results keep model order."""
+    compiled = compile_model(model)
+    compiled.tagger.tag_all(chunks)
+    return _score_all(model.categories, _views(chunks, _lowered(chunks), None), threshold, workers,
+                      compiled.descriptors)
+
+def category_fingerprint(cat, chunks: List[Dict], threshold: int) -> str:
+    """
+    Hash of everything ``_score_category`` reads: the category definition, the threshold and
+    the tag-filtered chunks (ids, scored text, sources, criterion tags) in order. Equal
+    fingerprints mean an identical category result.
+    """
+    rel = _filter_idx(chunks, list(range(len(chunks))), cat.id)
+    h = hashlib.sha256(json.dumps([cat.dict(), threshold], sort_keys=True, default=str).encode("utf-8"))
+    prefix = criterion_tag(cat.id, "")
+    for i in rel:
+        src = chunks[i].get("source") or {}
+        tags = [t for t in chunks[i]["tags"] if t.startswith(prefix)]
+        h.update(json.dumps([chunks[i].get("id"), _text(chunks[i]), src.get("file"), src.get("locator"),
+                             tags]).encode("utf-8"))
+    return h.hexdigest()
+
+def score_current_state(company, threshold: int = 55, model_path: str | None = None,
+                        workers: int | None = None, previous: Dict | None = None) -> Dict:
+    """
+    Fan-out/fan-in baseline: fetch the chunks the categories can match (their shards of the
+    chunk artifact) and load the maturity model once, score all categories in parallel,
+    and return the full current_state document.
+
+    With ``previous`` (an earlier current_state document), categories whose fingerprint
+    is unchanged are carried over instead of re-scored. The company's own maturity model
+    is used when it has one (see ``maturity.load_compiled_model``).
+    """
+    model = load_compiled_model(model_path, tenant=company).model
+    chunks, shards = _load_shards(company, model, model.categories)
+    return score_chunks(chunks, model, threshold, workers, previous, shards, tagged=True)
+
+def score_chunks(chunks: List[Dict], model: MaturityModel, threshold: int = 55,
+                 workers: int | None = None, previous: Dict | None = None,
+                 shards: Dict[str, List[int]] | None = None, tagged: bool = False) -> Dict:
+    """
+    The current_state document for in-memory ``chunks`` (see ``score_current_state``);
+    ``shards`` restricts categories to their positions in ``chunks``. Chunks are tagged
+    for ``model`` first unless ``tagged`` says the ingest tagger already did.
+    """
+    compiled = compile_model(model)
+    if not tagged:
+        compiled.tagger.tag_all(chunks)
+    view = _views(chunks, _lowered(chunks), shards)
+    prints = {cat.id: category_fingerprint(cat, view(cat)[0], threshold) for cat in model.categories}
+    old_prints = (previous or {}).get("fingerprints") or {}
+    old = {c["id"]: c for c in (previous or {}).get("categories", [])}
+    todo = [cat for cat in model.categories if not (cat.id in old and old_prints.get(cat.id) == prints[cat.id])]
+    scored = dict(zip([cat.id for cat in todo], _score_all(todo, view, threshold, workers, compiled.descriptors)))
+    print({"rescored": [cat.id for cat in todo], "reused": len(model.categories) - len(todo)})
+    return {
+        "categories": [scored[cat.id] if cat.id in scored else old[cat.id] for cat in model.categories],
+        "fingerprints": prints,
+    }
+
+def score_current_state_baseline(company, i, threshold: int = 55, model_path: str | None = None):
+    """
+    Build the current-state level for category ``i`` using fuzzy match to descriptors.
+    Prefer ``score_current_state`` when scoring the whole model.
+    """
+    compiled = load_compiled_model(model_path, tenant=company)
+    cat = compiled.model.categories[i]
+    chunks, shards = _load_shards(company, compiled.model, [cat])
+    chunks, lowered = _views(chunks, _lowered(chunks), shards)(cat)
+    return _score_category(cat, chunks, threshold, lowered, compiled.descriptors[cat.id])
@@ -0,0 +1,126 @@
+"""Near-duplicate chunk clustering ahead of LLM extraction.
+
+Decks and PDFs repeat slides, boilerplate and disclaimers; each copy would cost
+an extraction call. Chunks are sketched with one-permutation MinHash over word
+shingles (one hash per shingle, ``DEDUP_PERMS`` bins, densified by rotation so
+short chunks leave no empty bins), bucketed with LSH banding,
+and a candidate joins a cluster only if its exact shingle Jaccard similarity to
+the cluster's representative (its first chunk) is at least ``DEDUP_THRESHOLD``.
+Clustering runs before relevance ranking: only representatives are ranked against
+the extraction budget and extracted; ``llm.fan_out`` attributes their results to
+every member.
+"""
+from __future__ import annotations
+import hashlib, os, re
+from typing import Dict, List, Set
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # 0 disables
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "3"))  # words per shingle
+DEDUP_PERMS = 64
+DEDUP_BANDS = 16  # 16 bands x 4 rows: candidates from roughly 50% similarity, verified exactly
+
+_EMPTY = (1 << 64) - 1
+_ROTATE = 0x9E3779B97F4A7C15  # offset added per bin an empty bin borrows across
+
+
+def _shingles(text: str, k: int) -> Set[str]:
+    words = re.sub(r"[^\w\s]", " ", (text or "").lower()).split()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def _signature(shingles: Set[str]) -> List[int]:
+    # one-permutation hashing: a 64-bit hash per shingle, minimum kept per bin
+    sig = [_EMPTY] * DEDUP_PERMS
+    for s in shingles:
+        h = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        b = h % DEDUP_PERMS
+        if h < sig[b]:
+            sig[b] = h
+    # densify: an empty bin takes the nearest filled bin to its right (circularly) plus an
+    # offset per step. Otherwise short chunks, which fill only a few bins, would share their
+    # all-empty bands and land in the same LSH buckets.
+    out = list(sig)
+    nxt, dist = None, 0
+    for step in range(2 * DEDUP_PERMS):  # right to left, twice round, so every bin sees a filled one
+        b = DEDUP_PERMS - 1 - step % DEDUP_PERMS
+        if sig[b] != _EMPTY:
+            nxt, dist = sig[b], 0
+        elif nxt is not None:
+            dist += 1
+            out[b] = (nxt + dist * _ROTATE) & _EMPTY
+    return out
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if (a or b) else 1.0
+
+
+class NearDuplicates:
+    """Incremental ``cluster_near_duplicates``: ``add`` chunks in corpus order as they stream past."""
+
+    def __init__(self, threshold: float | None = None):
+        self.threshold = DEDUP_THRESHOLD if threshold is None else threshold
+        self._buckets: Dict[tuple, List[int]] = {}  # (band, band values) -> representative indices
+        self._rep_shingles: Dict[int, Set[str]] = {}
+        self._members: Dict[int, List[int]] = {}
+        self._n = 0
+
+    def add(self, chunk: Dict) -> int:
+        """Index of the representative ``chunk`` joins: its own index when it starts a new cluster."""
+        i, self._n = self._n, self._n + 1
+        if self.threshold <= 0:
+            self._members[i] = [i]
+            return i
+        rows = DEDUP_PERMS // DEDUP_BANDS
+        sh = _shingles(chunk.get("text") or "", DEDUP_SHINGLE)
+        sig = _signature(sh)
+        keys = [(b, tuple(sig[b * rows:(b + 1) * rows])) for b in range(DEDUP_BANDS)]
+        candidates = sorted({r for k in keys for r in self._buckets.get(k, ())})
+        rep = next((r for r in candidates if _jaccard(sh, self._rep_shingles[r]) >= self.threshold), None)
+        if rep is not None:
+            self._members[rep].append(i)
+            return rep
+        self._rep_shingles[i] = sh
+        self._members[i] = [i]
+        for k in keys:
+            self._buckets.setdefault(k, []).append(i)
+        return i
+
+    @property
+    def clusters(self) -> List[List[int]]:
+        return list(self._members.values())
+
+
+def cluster_near_duplicates(chunks: List[Dict], threshold: float | None = None) -> List[List[int]]:
+    """
+    Group chunk indices into clusters of near-duplicates (singletons included).
+
+    Each cluster is ordered by position and led by its representative; clusters are
+    ordered by their representative, so ``[c[0] for c in clusters]`` keeps chunk order.
+    """
+    dupes = NearDuplicates(threshold)
+    for ch in chunks:
+        dupes.add(ch)
+    return dupes.clusters
+
+
+def select_clusters(clusters: List[List[int]], ids: List[str], selected: List[str]) -> List[List[str]]:
+    """
+    The clusters, as chunk ids (``ids[i]`` is chunk ``i``'s), whose representative is in
+    ``selected`` (the relevance ranker's pick among representatives).
+    """
+    selected = set(selected)
+    return [[ids[i] for i in c] for c in clusters if ids[c[0]] in selected]
+
+
+def dedup_report(clusters: List[List[int]], chunks: List[Dict]) -> Dict:
+    """Calls saved by extracting one chunk per cluster, plus the duplicated groups by chunk id."""
+    dupes = [c for c in clusters if len(c) > 1]
+    return {
+        "chunks": len(chunks),
+        "extracted": len(clusters),
+        "calls_saved": len(chunks) - len(clusters),
+        "clusters": [[chunks[i].get("id") for i in c] for c in dupes],
+    }
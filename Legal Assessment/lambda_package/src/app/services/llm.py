@@ -1,13 +1,17 @@
-import os, json, re
+import asyncio, os, json, random, re, threading, time
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from io import BytesIO
 
 from ..schemas.extraction import ExtractionResult, PainPoint, CurrentTool, ProcessStep, Metric, Opportunity
+from ..services.llm_cache import get_cache
+from ..services.triage import EXTRACT_TRIAGE, route
+from ..services import wire as compact_wire
 
 # OpenAI client - required for this module
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY environment variable is required")
     client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=60)
@@ -16,19 +20,43 @@ except Exception as e:
     raise RuntimeError(f"OpenAI client initialization failed: {e}")
 
 MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Concurrent extraction: max in-flight requests and per-minute limits (0 = unlimited)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RPM = int(os.getenv("LLM_RPM", "0"))
+LLM_TPM = int(os.getenv("LLM_TPM", "0"))
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "400"))
+# Per-request retries for extraction calls: exponential backoff from LLM_BACKOFF seconds, with jitter
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "3"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+# Packed extraction: consecutive chunks share one request up to this many input tokens (0 = one call per chunk)
+LLM_PACK_TOKENS = int(os.getenv("LLM_PACK_TOKENS", "0"))
+# Second cascade tier: one-token yes/no call for chunks the local classifier is unsure about
+TRIAGE_MODEL = os.getenv("TRIAGE_MODEL", MODEL)
+# Extraction reply format: "json" (verbose keys, the original prompt) or, opt-in, "compact"
+# (schema-constrained tuples with fewer output tokens, see ``wire``)
+EXTRACT_WIRE = os.getenv("EXTRACT_WIRE", "json")
 
 def _first_sentence(text: str, max_len: int = 240) -> str:
     s = re.split(r"(?<=[.!?])\s+", text.strip())
     out = s[0] if s else text.strip()
     return out[:max_len]
 
-def _llm_extract_one(chunk: Dict) -> Dict[str, List[Dict]]:
-    """Extract information using LLM in JSON mode"""
-    print("Extracting with LLM")
+def _build_extract_messages(chunk: Dict, compact: bool = False) -> List[Dict[str, str]]:
     text = chunk.get("text", "").strip()
-    src = chunk.get("source", {})
-
-    messages = [
+    if compact:
+        return [
+            {"role": "system", "content": (
+                "You are a precise information extractor for legal operations assessments. "
+                "Return ONLY JSON matching the schema; do not add commentary."
+            )},
+            {"role": "user", "content": (
+                "Extract pain points, tools, processes, metrics, and opportunities from the text.\n"
+                "Use concise phrasing, no hallucinations.\n"
+                f"{compact_wire.INSTRUCTIONS}\n\n"
+                f"TEXT:\n{text}"
+            )},
+        ]
+    return [
         {"role": "system", "content": (
             "You are a precise information extractor for legal operations assessments. "
             "Return ONLY JSON matching the schema; do not add commentary."
@@ -40,19 +68,111 @@ def _llm_extract_one(chunk: Dict) -> Dict[str, List[Dict]]:
         )},
     ]
 
-    try:
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0,
-            response_format={"type": "json_object"},
-        )
-        content = resp.choices[0].message.content
-        data = json.loads(content) if content else {}
-    except Exception as e:
-        print(e)
-        raise RuntimeError(f"LLM extraction failed: {e}")
+def _build_packed_messages(chunks: List[Dict], compact: bool = False) -> List[Dict[str, str]]:
+    sections = "\n\n".join(f"### CHUNK {ch.get('id', '')}\n{ch.get('text', '').strip()}" for ch in chunks)
+    if compact:
+        return [
+            {"role": "system", "content": (
+                "You are a precise information extractor for legal operations assessments. "
+                "Return ONLY JSON matching the schema; do not add commentary."
+            )},
+            {"role": "user", "content": (
+                "Extract pain points, tools, processes, metrics, and opportunities from each chunk below, "
+                "separately per chunk. Use concise phrasing, no hallucinations.\n"
+                f"{compact_wire.INSTRUCTIONS}\n"
+                'Return {"r": [{"c": "<id after ### CHUNK>", "p": [], "t": [], "s": [], "m": [], "o": []}]} '
+                "with one entry per chunk, in order.\n\n"
+                f"{sections}"
+            )},
+        ]
+    return [
+        {"role": "system", "content": (
+            "You are a precise information extractor for legal operations assessments. "
+            "Return ONLY JSON matching the schema; do not add commentary."
+        )},
+        {"role": "user", "content": (
+            "Extract pain points, tools, processes, metrics, and opportunities from each chunk below, "
+            "separately per chunk. Use concise phrasing, no hallucinations.\n"
+            'Return {"results": [{"chunk_id": "<id after ### CHUNK>", "pain_points": [], "current_tools": [], '
+            '"processes": [], "metrics": [], "opportunities": []}]} with one entry per chunk, in order; '
+            "use empty arrays when a chunk has nothing.\n\n"
+            f"{sections}"
+        )},
+    ]
 
+def _build_gate_messages(chunk: Dict) -> List[Dict[str, str]]:
+    text = chunk.get("text", "").strip()
+    return [
+        {"role": "system", "content": "You screen text for a legal operations assessment. Answer with one letter."},
+        {"role": "user", "content": (
+            "Does the text mention any pain point, tool or system, process step, metric, "
+            "or improvement opportunity? Answer Y or N.\n\n"
+            f"TEXT:\n{text}"
+        )},
+    ]
+
+def _gate_request(chunk: Dict) -> Dict:
+    return {"model": TRIAGE_MODEL, "messages": _build_gate_messages(chunk), "temperature": 0, "max_tokens": 1}
+
+def _gate_answer(content: Optional[str]) -> bool:
+    # anything but an explicit N goes on to full extraction
+    return not (content or "").strip().upper().startswith("N")
+
+def _extract_request(chunks: List[Dict], wire: str) -> Dict:
+    """Chat request for one chunk or a packed group, in the given wire format."""
+    packed = len(chunks) > 1
+    compact = wire == "compact"
+    if compact:
+        response_format = compact_wire.PACKED_RESPONSE_FORMAT if packed else compact_wire.RESPONSE_FORMAT
+    else:
+        response_format = {"type": "json_object"}
+    return {
+        "model": MODEL,
+        "messages": _build_packed_messages(chunks, compact) if packed else _build_extract_messages(chunks[0], compact),
+        "temperature": 0,
+        "response_format": response_format,
+    }
+
+def _decode_reply(chunks: List[Dict], data, wire: str) -> List[Dict[str, List[Dict]]]:
+    """Per-chunk ``ExtractionResult`` dicts from a reply to ``_extract_request``."""
+    if wire == "compact":
+        if len(chunks) > 1:
+            by_id = compact_wire.expand_packed(data)
+            return [_parse_extraction(ch, by_id.get(ch.get("id"), {})) for ch in chunks]
+        return [_parse_extraction(chunks[0], compact_wire.expand(data))]
+    return _split_packed(chunks, data) if len(chunks) > 1 else [_parse_extraction(chunks[0], data)]
+
+def _split_packed(chunks: List[Dict], data) -> List[Dict[str, List[Dict]]]:
+    """Per-chunk ``ExtractionResult`` dicts from a packed reply, attributed by ``chunk_id``."""
+    results = data.get("results") if isinstance(data, dict) else None
+    by_id = {r.get("chunk_id"): r for r in (results or []) if isinstance(r, dict)}
+    return [_parse_extraction(ch, by_id.get(ch.get("id"), {})) for ch in chunks]
+
+def _pack(chunks: List[Dict], budget: int) -> List[List[Dict]]:
+    """Consecutive groups of chunks whose text fits in ``budget`` tokens (a larger chunk travels alone)."""
+    groups: List[List[Dict]] = []
+    used = 0
+    for ch in chunks:
+        t = _chunk_tokens(ch)
+        if groups and used + t <= budget:
+            groups[-1].append(ch)
+            used += t
+        else:
+            groups.append([ch])
+            used = t
+    return groups
+
+def _source_ref(chunk: Dict) -> Dict:
+    text = chunk.get("text", "").strip()
+    src = chunk.get("source", {})
+    return {
+        "file": src.get("file", ""),
+        "locator": src.get("locator", ""),
+        "excerpt": text[:240] if text else None,
+    }
+
+def _parse_extraction(chunk: Dict, data) -> Dict[str, List[Dict]]:
+    """Normalize the raw JSON returned for ``chunk`` and validate it into an ``ExtractionResult`` dict."""
     # Normalize any strings → dicts so Pydantic validation won't explode
     def _coerce_item(it, kind: str) -> Optional[Dict]:
         if isinstance(it, dict):
@@ -87,11 +207,7 @@ def _llm_extract_one(chunk: Dict) -> Dict[str, List[Dict]]:
                 norm.append(coerced)
         data[k] = norm  # now guaranteed list-of-dicts
     # Attach source_ref to each item
-    source_ref = {
-        "file": src.get("file", ""),
-        "locator": src.get("locator", ""),
-        "excerpt": text[:240] if text else None,
-    }
+    source_ref = _source_ref(chunk)
     for k in keys:
         for item in data.get(k, []):
             item["source_ref"] = source_ref  # safe: item is dict
@@ -106,11 +222,253 @@ def _llm_extract_one(chunk: Dict) -> Dict[str, List[Dict]]:
     )
     return validated.dict()
 
-def extract_from_chunks(chunks, max_chunks: int = 50) -> Path:
-    """Read working/{job_id}/chunks.json (new) or working/{job_id}_chunks.json (legacy)."""
+def _backoff(attempt: int) -> float:
+    return LLM_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+def _chat_with_retries(site: str, request: Dict) -> Optional[str]:
+    """Cached extraction call, retried with backoff; raises RuntimeError once retries are exhausted."""
+    for attempt in range(LLM_RETRIES + 1):
+        try:
+            return get_cache().chat(client, site, validate=json.loads, **request)
+        except Exception as e:
+            print(e)
+            if attempt == LLM_RETRIES:
+                raise RuntimeError(f"LLM extraction failed: {e}")
+            delay = _backoff(attempt)
+            print(f"Retrying {site} call {attempt + 1}/{LLM_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _llm_extract_packed(chunks: List[Dict], wire: Optional[str] = None) -> List[Dict[str, List[Dict]]]:
+    """One request for several chunks; results stay attributed to their chunk."""
+    wire = EXTRACT_WIRE if wire is None else wire
+    if len(chunks) == 1:
+        return [_llm_extract_one(chunks[0], wire)]
+    print(f"Extracting {len(chunks)} packed chunks with LLM")
+    content = _chat_with_retries("extraction_packed", _extract_request(chunks, wire))
+    data = json.loads(content) if content else {}
+    return _decode_reply(chunks, data, wire)
+
+def _llm_extract_one(chunk: Dict, wire: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """Extract information using LLM in JSON mode"""
+    print("Extracting with LLM")
+    wire = EXTRACT_WIRE if wire is None else wire
+    content = _chat_with_retries("extraction", _extract_request([chunk], wire))
+    data = json.loads(content) if content else {}
+    return _decode_reply([chunk], data, wire)[0]
+
+def _llm_gate(chunk: Dict) -> bool:
+    """Cheap yes/no call: does ``chunk`` deserve full extraction? Fails open."""
+    try:
+        return _gate_answer(get_cache().chat(client, "triage", **_gate_request(chunk)))
+    except Exception as e:
+        print(f"Triage call failed, extracting anyway: {e}")
+        return True
+
+# --- concurrent extraction ---
+class _RatePacer:
+    """Sliding one-minute window that keeps requests/tokens under the account's RPM/TPM limits.
+
+    A limit of 0 disables that dimension. Callers ``await acquire(tokens)`` before each request.
+    The window is guarded by a thread lock, never held across an ``await``, so one pacer can
+    serve every event loop in the process (``_PACER``).
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._window: deque = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= 60.0:
+            _, t = self._window.popleft()
+            self._tokens -= t
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        waits = [0.0]
+        if self.rpm and len(self._window) >= self.rpm:
+            waits.append(60.0 - (now - self._window[len(self._window) - self.rpm][0]))
+        if self.tpm and self._window and self._tokens + tokens > self.tpm:
+            # wait until enough of the oldest entries have aged out
+            freed = 0
+            for ts, t in self._window:
+                freed += t
+                if self._tokens - freed + tokens <= self.tpm:
+                    waits.append(60.0 - (now - ts))
+                    break
+            else:
+                waits.append(60.0 - (now - self._window[-1][0]))
+        return max(waits)
+
+    async def acquire(self, tokens: int) -> None:
+        if not self.rpm and not self.tpm:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    self._window.append((now, tokens))
+                    self._tokens += tokens
+                    return
+            await asyncio.sleep(wait)
+
+# the account's limits apply to the whole process: batches, triage and extraction, and
+# concurrent jobs all draw on this one window
+_PACER = _RatePacer(rpm=LLM_RPM, tpm=LLM_TPM)
 
-    
+def _chunk_tokens(chunk: Dict) -> int:
+    return int(chunk.get("tokens") or max(1, len(chunk.get("text", "")) // 4))
 
+def _estimate_call_tokens(chunks: List[Dict]) -> int:
+    # prompt overhead + chunk text + expected JSON output
+    return 120 + sum(_chunk_tokens(ch) + LLM_OUTPUT_TOKENS_ESTIMATE for ch in chunks)
+
+async def _allm_extract(aclient, chunks: List[Dict], sem: asyncio.Semaphore,
+                       pacer: _RatePacer, wire: Optional[str] = None) -> List[Dict[str, List[Dict]]]:
+    """Async twin of ``_llm_extract_one`` / ``_llm_extract_packed``; bounded by ``sem`` and paced by ``pacer``."""
+    wire = EXTRACT_WIRE if wire is None else wire
+    request = _extract_request(chunks, wire)
+    site = "extraction_packed" if len(chunks) > 1 else "extraction"
+    cache = get_cache()
+    key, content = await asyncio.to_thread(cache.lookup, site, **request)
+    if content is None:  # cache hits skip both the concurrency slot and the rate pacer
+        for attempt in range(LLM_RETRIES + 1):
+            try:
+                async with sem:
+                    await pacer.acquire(_estimate_call_tokens(chunks))
+                    resp = await aclient.chat.completions.create(**request)
+                content = resp.choices[0].message.content
+                data = json.loads(content) if content else {}
+                break
+            except Exception as e:
+                print(e)
+                if attempt == LLM_RETRIES:
+                    raise RuntimeError(f"LLM extraction failed: {e}")
+                await asyncio.sleep(_backoff(attempt))  # backoff without holding a concurrency slot
+        await asyncio.to_thread(cache.store, key, content, site)
+    else:
+        data = json.loads(content)
+    return _decode_reply(chunks, data, wire)
+
+async def _agate(aclient, chunk: Dict, sem: asyncio.Semaphore, pacer: _RatePacer) -> bool:
+    """Async twin of ``_llm_gate``."""
+    request = _gate_request(chunk)
+    cache = get_cache()
+    key, content = await asyncio.to_thread(cache.lookup, "triage", **request)
+    if content is None:
+        async with sem:
+            await pacer.acquire(60 + _chunk_tokens(chunk))
+            try:
+                resp = await aclient.chat.completions.create(**request)
+                content = resp.choices[0].message.content
+            except Exception as e:
+                print(f"Triage call failed, extracting anyway: {e}")
+                return True
+        await asyncio.to_thread(cache.store, key, content, "triage")
+    return _gate_answer(content)
+
+# Concurrent calls run on one long-lived event loop (a daemon thread), so the async client
+# and its connection pool are created once per process and reused by every batch and job.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_aclient = None
+_loop_lock = threading.Lock()
+
+def _reset_loop() -> None:
+    global _loop, _aclient
+    _loop, _aclient = None, None  # a forked child has no loop thread
+
+os.register_at_fork(after_in_child=_reset_loop)
+
+def _run(coro):
+    """Run ``coro`` on the process's extraction loop and wait for its result."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+        loop = _loop
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+async def _with_client(work, aclient=None):
+    """``await work(client)`` with ``aclient``, or with the process's async client (created on first use)."""
+    global _aclient
+    if aclient is None:
+        if _aclient is None:  # only touched from the loop thread
+            _aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=60)
+        aclient = _aclient
+    return await work(aclient)
+
+def _tally(routes: List[str], answers: List[bool]) -> Tuple[List[bool], Dict[str, int]]:
+    """Which chunks go to full extraction, plus per-tier counts, from the routes and gate answers."""
+    it = iter(answers)
+    keep = [r == "extract" or (r == "gate" and next(it)) for r in routes]
+    counts = {
+        "local_skipped": routes.count("skip"),
+        "local_passed": routes.count("extract"),
+        "gate_skipped": answers.count(False),
+        "gate_passed": answers.count(True),
+        "extracted": sum(keep),
+    }
+    return keep, counts
+
+async def _aextract_each(chunks: List[Dict], concurrency: int, aclient, pack_tokens: int, triage: bool,
+                         wire: str) -> Tuple[List[bool], Dict[str, int], List[List[Dict[str, List[Dict]]]]]:
+    """Triage then extraction in one event loop, sharing a client, a semaphore and ``_PACER``."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def work(ac):
+        if triage:
+            routes = route(chunks)
+            gated = [ch for ch, r in zip(chunks, routes) if r == "gate"]
+            answers = list(await asyncio.gather(*(_agate(ac, ch, sem, _PACER) for ch in gated)))
+            keep, counts = _tally(routes, answers)
+        else:
+            keep, counts = [True] * len(chunks), {"extracted": len(chunks)}
+        todo = [ch for ch, k in zip(chunks, keep) if k]
+        groups = _pack(todo, pack_tokens) if pack_tokens > 0 else [[ch] for ch in todo]
+        outputs = await asyncio.gather(*(_allm_extract(ac, g, sem, _PACER, wire=wire) for g in groups))
+        return keep, counts, outputs
+    return await _with_client(work, aclient)
+
+def extract_each(chunks: List[Dict], concurrency: Optional[int] = None, aclient=None,
+                 pack_tokens: Optional[int] = None, triage: Optional[bool] = None,
+                 stats: Optional[Dict[str, int]] = None, wire: Optional[str] = None) -> List[Dict[str, List[Dict]]]:
+    """One validated ``ExtractionResult`` dict per chunk, in chunk order (see ``extract_from_chunks``).
+
+    ``pack_tokens`` > 0 (default ``LLM_PACK_TOKENS``) sends consecutive chunks together, up to that
+    many input tokens per request; the reply is split back per chunk id so ``source_ref`` stays exact.
+    ``triage`` (default ``EXTRACT_TRIAGE``) first runs the cascade in ``triage``: chunks rejected by the
+    local classifier or the cheap gate get empty results without a full extraction call. Per-tier
+    counts are added into ``stats``. ``wire`` (default ``EXTRACT_WIRE``) picks the reply format.
+    """
+    concurrency = LLM_CONCURRENCY if concurrency is None else concurrency
+    pack_tokens = LLM_PACK_TOKENS if pack_tokens is None else pack_tokens
+    wire = EXTRACT_WIRE if wire is None else wire
+    triage = EXTRACT_TRIAGE if triage is None else triage
+    if not chunks:
+        keep, counts, outputs = [], _tally([], [])[1] if triage else {"extracted": 0}, []
+    elif concurrency > 1 or aclient is not None:
+        keep, counts, outputs = _run(_aextract_each(chunks, concurrency, aclient, pack_tokens, triage, wire))
+    else:
+        if triage:
+            routes = route(chunks)
+            keep, counts = _tally(routes, [_llm_gate(ch) for ch, r in zip(chunks, routes) if r == "gate"])
+        else:
+            keep, counts = [True] * len(chunks), {"extracted": len(chunks)}
+        todo = [ch for ch, k in zip(chunks, keep) if k]
+        groups = _pack(todo, pack_tokens) if pack_tokens > 0 else [[ch] for ch in todo]
+        outputs = [_llm_extract_packed(g, wire) for g in groups]
+    if stats is not None:
+        for k, v in counts.items():
+            stats[k] = stats.get(k, 0) + v
+    extracted = iter(out for group in outputs for out in group)
+    return [next(extracted) if k else _parse_extraction(ch, {}) for ch, k in zip(chunks, keep)]
+
+def merge_extractions(outputs: List[Dict[str, List[Dict]]]) -> Dict[str, List]:
+    """Concatenate per-chunk results into the shape ``synthesize`` expects."""
     results = {
         "pain_points": [],
         "current_tools": [],
@@ -119,11 +477,36 @@ def extract_from_chunks(chunks, max_chunks: int = 50) -> Path:
         "opportunities": [],
         "chunks_used": []
     }
-
-    for i, ch in enumerate(chunks[:max_chunks]):
-        out = _llm_extract_one(ch)
-        results["chunks_used"].extend(out.get("chunks_used", [ch.get("id","")]))
+    for out in outputs:
+        results["chunks_used"].extend(out.get("chunks_used", []))
         for k in ["pain_points","current_tools","processes","metrics","opportunities"]:
             results[k].extend(out.get(k, []))
+    return results
+
+def fan_out(chunks: List[Dict], clusters: List[List[int]],
+            outputs: List[Dict[str, List[Dict]]]) -> List[Dict[str, List[Dict]]]:
+    """
+    Per-chunk results from one result per near-duplicate cluster (``dedup.cluster_near_duplicates``):
+    every member gets its representative's items, attributed to the member's own source.
+    """
+    per_chunk: List[Optional[Dict]] = [None] * len(chunks)
+    for cluster, out in zip(clusters, outputs):
+        for i in cluster:
+            ref = _source_ref(chunks[i])
+            copy = {"chunks_used": [chunks[i].get("id", "")]}
+            for k in ["pain_points","current_tools","processes","metrics","opportunities"]:
+                copy[k] = [dict(item, source_ref=dict(ref)) for item in out.get(k, [])]
+            per_chunk[i] = out if i == cluster[0] else copy
+    return per_chunk
+
+def extract_from_chunks(chunks, max_chunks: int = 50, concurrency: Optional[int] = None, aclient=None,
+                        pack_tokens: Optional[int] = None, triage: Optional[bool] = None,
+                        wire: Optional[str] = None) -> Path:
+    """Run extraction over the first ``max_chunks`` chunks and merge results in chunk order.
 
-    return results
\ No newline at end of file
+    ``concurrency`` > 1 (default ``LLM_CONCURRENCY``) issues the calls through a shared async
+    client with at most that many requests in flight, paced by ``LLM_RPM``/``LLM_TPM``.
+    ``aclient`` injects an async client (e.g. ``StandInAsyncClient``) for offline benchmarks.
+    """
+    return merge_extractions(extract_each(chunks[:max_chunks], concurrency=concurrency, aclient=aclient,
+                                          pack_tokens=pack_tokens, triage=triage, wire=wire))
@@ -0,0 +1,245 @@
+"""Content-addressed cache for chat completion responses.
+
+Entries are keyed by sha256 of the canonical JSON of the whole request
+(model, messages, response_format, temperature, max_tokens, ...), so any service issuing the
+same request again (a re-run after one extra upload, an unchanged category)
+gets the stored content back instead of paying for the call.
+
+Backends (``LLM_CACHE_BACKEND``):
+
+- ``sqlite``: a local file (``LLM_CACHE_PATH``), for development and local runs.
+- ``s3``: one object per entry under ``LLM_CACHE_PREFIX`` in ``BUCKET_NAME``.
+- ``none``: disabled.
+
+The default is ``s3`` when ``BUCKET_NAME`` is set, ``sqlite`` otherwise. Entries
+older than ``LLM_CACHE_TTL_DAYS`` are treated as misses. The SQLite store is
+trimmed to ``LLM_CACHE_MAX_ENTRIES`` on write. ``prune()`` deletes expired entries
+and applies the same bound to S3; the last pipeline stage calls it at the end of
+every job, and it does the work at most once per ``LLM_CACHE_PRUNE_HOURS`` (tracked
+by a marker object next to the entries). A small in-process LRU sits in front of
+either backend. Hit/miss counters are kept per call site (``stats()``).
+
+Only deterministic requests go through the cache: one with a non-zero ``temperature``
+bypasses it (``lookup`` returns no key and ``store`` ignores it).
+"""
+from __future__ import annotations
+import hashlib, json, os, sqlite3, threading, time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import boto3
+import botocore
+
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "s3" if BUCKET_NAME else "sqlite")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(Path.home() / ".cache" / "legal_assessment" / "llm_cache.sqlite"))
+LLM_CACHE_PREFIX = os.getenv("LLM_CACHE_PREFIX", "cache/llm/")
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_PRUNE_HOURS = float(os.getenv("LLM_CACHE_PRUNE_HOURS", "24"))  # minimum interval between S3 prunes
+_MEMORY_ENTRIES = 1024
+
+
+class _SQLiteBackend:
+    def __init__(self, path: str, max_entries: int):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, content TEXT, created REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, content: str, site: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, content, time.time()))
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self._db.commit()
+
+    def prune(self, ttl: float) -> int:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+        return cur.rowcount
+
+    def pruned_at(self) -> float:
+        return 0.0  # a local DELETE is cheap: prune every time
+
+
+class _S3Backend:
+    def __init__(self, bucket: str, prefix: str, max_entries: int):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self._s3 = boto3.client('s3')
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        try:
+            obj = self._s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+        except botocore.exceptions.ClientError:
+            return None
+        data = json.loads(obj['Body'].read().decode('utf-8'))
+        return data["content"], float(data.get("created", 0))
+
+    def put(self, key: str, content: str, site: str) -> None:
+        body = json.dumps({"content": content, "created": time.time(), "site": site})
+        self._s3.put_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json",
+                            Body=body.encode("utf-8"), ContentType="application/json")
+
+    def _marker(self) -> str:
+        return f"{self.prefix}_pruned"
+
+    def pruned_at(self) -> float:
+        try:
+            return self._s3.head_object(Bucket=self.bucket, Key=self._marker())["LastModified"].timestamp()
+        except botocore.exceptions.ClientError:
+            return 0.0
+
+    def prune(self, ttl: float) -> int:
+        """Delete expired entries and the oldest ones beyond ``max_entries``."""
+        self._s3.put_object(Bucket=self.bucket, Key=self._marker(), Body=b"")  # claim this round first
+        objs = []
+        for page in self._s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix):
+            objs.extend(o for o in page.get("Contents", []) if o["Key"].endswith(".json"))
+        objs.sort(key=lambda o: o["LastModified"], reverse=True)
+        cutoff = time.time() - ttl
+        doomed = [o["Key"] for i, o in enumerate(objs)
+                  if i >= self.max_entries or o["LastModified"].timestamp() < cutoff]
+        for i in range(0, len(doomed), 1000):
+            self._s3.delete_objects(Bucket=self.bucket,
+                                    Delete={"Objects": [{"Key": k} for k in doomed[i:i + 1000]]})
+        return len(doomed)
+
+
+class LLMCache:
+    """Response cache shared by the extraction, adjudication and recommendation services."""
+
+    def __init__(self, backend=None, ttl_days: float = LLM_CACHE_TTL_DAYS):
+        self.backend = backend
+        self.ttl = ttl_days * 86400
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Counter] = {}
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        if LLM_CACHE_BACKEND == "s3" and BUCKET_NAME:
+            backend = _S3Backend(BUCKET_NAME, LLM_CACHE_PREFIX, LLM_CACHE_MAX_ENTRIES)
+        elif LLM_CACHE_BACKEND == "sqlite":
+            backend = _SQLiteBackend(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+        else:
+            backend = None
+        return cls(backend)
+
+    @staticmethod
+    def key(**request: Any) -> str:
+        """Key of a ``chat.completions.create`` request: every argument counts (a reply cut off by a
+        smaller ``max_tokens`` must not answer a request with a larger one)."""
+        blob = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(request: Dict[str, Any]) -> bool:
+        return not request.get("temperature")
+
+    def _count(self, site: str, outcome: str) -> None:
+        with self._lock:
+            self._stats.setdefault(site, Counter())[outcome] += 1
+
+    def lookup(self, site: str, **request: Any) -> Tuple[Optional[str], Optional[str]]:
+        """(key, cached content or None) for a ``chat.completions.create`` request; the key is
+        None for a request that must not be cached (non-zero temperature)."""
+        if not self.cacheable(request):
+            return None, None
+        key = self.key(**request)
+        if self.backend is None:
+            self._count(site, "misses")
+            return key, None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:  # a broken cache must never fail the pipeline
+                print(f"LLM cache read failed: {e}")
+                entry = None
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            entry = None
+        self._count(site, "hits" if entry is not None else "misses")
+        if entry is None:
+            return key, None
+        self._remember(key, entry)
+        return key, entry[0]
+
+    def store(self, key: Optional[str], content: Optional[str], site: str) -> None:
+        if self.backend is None or key is None or not content:
+            return
+        self._remember(key, (content, time.time()))
+        try:
+            self.backend.put(key, content, site)
+        except Exception as e:
+            print(f"LLM cache write failed: {e}")
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > _MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def chat(self, client, site: str, validate: Optional[Callable[[str], Any]] = None, **request: Any) -> Optional[str]:
+        """Cached ``client.chat.completions.create(**request)``; returns the message content.
+
+        ``validate`` (e.g. ``json.loads``) must accept the content before it is stored. Requests
+        with a non-zero ``temperature`` go straight to the client.
+        """
+        key, content = self.lookup(site, **request)
+        if content is None:
+            resp = client.chat.completions.create(**request)
+            content = resp.choices[0].message.content
+            if validate is not None:
+                validate(content)
+            self.store(key, content, site)
+        return content
+
+    def prune(self, force: bool = False) -> int:
+        """
+        Delete expired and surplus entries; returns how many. Unless ``force``d, does nothing
+        if the backend was pruned within ``LLM_CACHE_PRUNE_HOURS``. Never raises.
+        """
+        if self.backend is None:
+            return 0
+        try:
+            if not force and time.time() - self.backend.pruned_at() < LLM_CACHE_PRUNE_HOURS * 3600:
+                return 0
+            return self.backend.prune(self.ttl)
+        except Exception as e:  # housekeeping must never fail the pipeline
+            print(f"LLM cache prune failed: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {site: {"hits": c["hits"], "misses": c["misses"]} for site, c in self._stats.items()}
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Process-wide cache configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache.from_env()
+        return _cache
@@ -0,0 +1,79 @@
+"""Offline stand-in for the OpenAI async client.
+
+Mimics ``client.chat.completions.create(...)`` closely enough for the extraction
+engine: each call sleeps for a simulated round-trip latency and returns a canned
+JSON payload (one entry per ``### CHUNK <id>`` section for packed prompts, in
+the compact wire format when a ``json_schema`` response format is requested),
+or ``gate_answer`` for one-token triage calls. ``token_latency`` adds a per
+output token delay, approximating generation speed. Used to benchmark
+concurrency, packing, triage and wire formats without network access or API spend.
+"""
+from __future__ import annotations
+import asyncio, json, random, re
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .wire import encode
+
+
+_CANNED = {
+    "pain_points": [{"text": "Manual contract intake via email", "impact_hint": "high", "effort_hint": "med"}],
+    "current_tools": [{"name": "SharePoint", "purpose": "document storage"}],
+    "processes": [{"process_name": "Contract review", "step": "Legal reviews redlines"}],
+    "metrics": [],
+    "opportunities": [{"area": "Intake", "description": "Introduce a self-service intake form"}],
+}
+
+
+class _StandInCompletions:
+    def __init__(self, owner: "StandInAsyncClient"):
+        self._owner = owner
+
+    def _reply(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]]) -> str:
+        payload = self._owner.payload
+        compact = (response_format or {}).get("type") == "json_schema"
+        packed = re.findall(r"^### CHUNK (.+)$", messages[-1]["content"], flags=re.M)
+        if compact:
+            if packed:
+                return json.dumps({"r": [dict(encode(payload), c=cid) for cid in packed]})
+            return json.dumps(encode(payload))
+        if packed:
+            return json.dumps({"results": [dict(payload, chunk_id=cid) for cid in packed]})
+        return json.dumps(payload)
+
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+        o = self._owner
+        o.calls += 1
+        if kwargs.get("max_tokens") == 1:
+            o.gate_calls += 1
+            content = o.gate_answer
+        else:
+            content = self._reply(messages, kwargs.get("response_format"))
+        out_tokens = max(1, len(content) // 4)
+        o.output_tokens += out_tokens
+        o.in_flight += 1
+        o.max_in_flight = max(o.max_in_flight, o.in_flight)
+        try:
+            await asyncio.sleep(o.latency + random.uniform(0, o.jitter) + out_tokens * o.token_latency)
+        finally:
+            o.in_flight -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=SimpleNamespace(completion_tokens=out_tokens))
+
+
+class StandInAsyncClient:
+    """Async client double: ``latency``/``jitter`` in seconds, ``payload`` is the JSON returned."""
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.0, payload: Optional[Dict[str, Any]] = None,
+                 gate_answer: str = "Y", token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.gate_answer = gate_answer
+        self.jitter = jitter
+        self.payload = payload if payload is not None else _CANNED
+        self.calls = 0
+        self.gate_calls = 0
+        self.output_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=_StandInCompletions(self))
@@ -0,0 +1,170 @@
+"""Per-job manifest for the assessment pipeline.
+
+The upload endpoint creates ``{company}/jobs/{job}/manifest.json`` for a new job and
+points ``{company}/jobs/latest.json`` at it; each worker stage (``file_processing`` ->
+``score_baseline`` -> ``policy``) records its status, timings, the inputs it ran from
+(keys plus SHA-256 of their content) and the artifacts it wrote into its own job's
+manifest, so a second upload never takes over a running job's record.
+``/pipeline/status`` serves the latest manifest, and ``rerun_event`` rebuilds a stage's
+worker event from its recorded inputs, once it has checked they are still the content
+the stage ran from, so any stage can be re-run without redoing the ones before it.
+"""
+from __future__ import annotations
+import hashlib, time, uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+STAGES = ("file_processing", "score_baseline", "policy")
+
+
+def manifest_key(company: str, job: str) -> str:
+    return f"{company}/jobs/{job}/manifest.json"
+
+
+def latest_key(company: str) -> str:
+    return f"{company}/jobs/latest.json"
+
+
+def sha256_bytes(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class _StageRun:
+    """Handle yielded by ``JobManifest.stage``: record inputs and artifacts, or end the invocation early."""
+
+    def __init__(self):
+        self.inputs: Dict[str, Any] = {}
+        self.artifacts: Dict[str, Dict[str, str]] = {}
+        self.error: Optional[str] = None
+        self.suspended = False
+
+    def artifact(self, name: str, key: str, sha256: str) -> None:
+        self.artifacts[name] = {"key": key, "sha256": sha256}
+
+    def fail(self, error: Any) -> None:
+        self.error = str(error)
+
+    def suspend(self) -> None:
+        """The stage continues in another invocation (see ``process`` checkpoints)."""
+        self.suspended = True
+
+
+class JobManifest:
+    def __init__(self, store, data: Dict[str, Any]):
+        self.store = store
+        self.data = data
+
+    @property
+    def job(self) -> str:
+        return self.data["job"]
+
+    @classmethod
+    def create(cls, store, company: str, files: List[Dict[str, str]],
+               incremental: bool = False) -> "JobManifest":
+        now = time.time()
+        manifest = cls(store, {
+            "job": uuid.uuid4().hex,
+            "company": company,
+            "status": "queued",
+            "stage": STAGES[0],
+            "created": now,
+            "updated": now,
+            "stages": {name: {"status": "pending"} for name in STAGES},
+        })
+        manifest.data["stages"][STAGES[0]]["inputs"] = {"files": files, "incremental": incremental}
+        manifest.save()
+        store.put_json(latest_key(company), {"job": manifest.job})
+        return manifest
+
+    @classmethod
+    def load(cls, store, company: str, job: Optional[str] = None) -> Optional["JobManifest"]:
+        """The manifest of the company's ``job`` (default: its latest) from the artifact ``store``, or None."""
+        if job is None:
+            job = (store.get_json(latest_key(company)) or {}).get("job")
+            if job is None:
+                return None
+        data = store.get_json(manifest_key(company, job))
+        return cls(store, data) if data is not None else None
+
+    def save(self) -> None:
+        self.data["updated"] = time.time()
+        self.store.put_json(manifest_key(self.data["company"], self.job), self.data, indent=2)
+
+    def artifact(self, stage: str, name: str) -> Optional[Dict[str, str]]:
+        return (self.data["stages"][stage].get("artifacts") or {}).get(name)
+
+    @contextmanager
+    def stage(self, name: str, resume: bool = False) -> Iterator[_StageRun]:
+        """
+        Record one invocation of stage ``name``. A fresh (non-``resume``) start resets the
+        stages after it to pending. The stage ends complete unless the body raised, called
+        ``fail`` or ``suspend``d it for a continuation.
+        """
+        rec = self.data["stages"][name]
+        now = time.time()
+        if not resume:
+            rec.update(status="running", started=now, finished=None, seconds=0.0, invocations=0, error=None)
+            for later in STAGES[STAGES.index(name) + 1:]:
+                self.data["stages"][later] = {"status": "pending"}
+        rec["invocations"] = rec.get("invocations", 0) + 1
+        self.data.update(status="running", stage=name)
+        self.save()
+        run = _StageRun()
+        try:
+            yield run
+        except Exception as e:
+            run.fail(e)
+            raise
+        finally:
+            rec["seconds"] = round(rec.get("seconds", 0.0) + time.time() - now, 3)
+            rec["inputs"] = dict(rec.get("inputs") or {}, **run.inputs)
+            rec.setdefault("artifacts", {}).update(run.artifacts)
+            if run.error is not None:
+                rec.update(status="failed", error=run.error, finished=time.time())
+                self.data["status"] = "failed"
+            elif not run.suspended:
+                rec.update(status="complete", finished=time.time())
+                if name == STAGES[-1]:
+                    self.data["status"] = "complete"
+                else:
+                    self.data["stage"] = STAGES[STAGES.index(name) + 1]  # queued behind this one
+            self.save()
+
+
+def track(manifest: Optional[JobManifest], name: str, resume: bool = False):
+    """``manifest.stage(...)``, or a throwaway handle for events that carry no job (direct invocations)."""
+    return manifest.stage(name, resume=resume) if manifest is not None else nullcontext(_StageRun())
+
+
+def _recorded(inputs: Dict[str, Any]) -> Iterator[Dict[str, str]]:
+    """The ``{"key", "sha256"}`` entries among a stage's recorded inputs."""
+    for value in inputs.values():
+        for entry in value if isinstance(value, list) else [value]:
+            if isinstance(entry, dict) and entry.get("key") and entry.get("sha256"):
+                yield entry
+
+
+def rerun_event(manifest: JobManifest, stage: str) -> Dict[str, Any]:
+    """
+    Worker event that re-runs ``stage`` from the inputs recorded in the manifest. Raises
+    ValueError if a stage before it has not completed, or an input's content no longer
+    matches its recorded SHA-256 (a later job or upload replaced it).
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage: {stage}")
+    stages = manifest.data["stages"]
+    for earlier in STAGES[:STAGES.index(stage)]:
+        if stages[earlier]["status"] != "complete":
+            raise ValueError(f"Stage {earlier} has not completed; re-run it first")
+    inputs = stages[stage].get("inputs") or {}
+    for entry in _recorded(inputs):
+        body = manifest.store.get(entry["key"])
+        if body is None or sha256_bytes(body) != entry["sha256"]:
+            raise ValueError(f"{entry['key']} has changed since job {manifest.job} ran {stage}; start a new job")
+    data: Dict[str, Any] = {"company": manifest.data["company"], "job": manifest.job}
+    if stage == "file_processing":
+        data["files"] = [{"filename": f["filename"], "key": f["key"]} for f in inputs.get("files", [])]
+        data["incremental"] = bool(inputs.get("incremental"))
+    elif stage == "score_baseline":
+        data["incremental"] = bool(inputs.get("incremental"))
+    return {"worker": True, "task_type": stage, "data": data}
@@ -1,15 +1,144 @@
+"""Maturity model loading.
+
+A model file is parsed and compiled once per content hash and shared by every caller
+in the process (a warm Lambda container keeps it across invocations). The
+``CompiledModel`` carries what the stages derive from the model on every run: the
+Pydantic model and raw YAML, categories by id, the lowercased level descriptors the
+baseline scores against, the keyword ``Tagger``, and each category's level definitions
+rendered for prompts.
+
+A company (tenant) may have its own model at ``{company}/maturity_model.yaml`` in the
+artifact store; ``load_compiled_model(tenant=...)`` uses it when present and the
+default model otherwise. The most recently used ``_CACHE_ENTRIES`` compiled models are
+kept, so a warm container serving many tenants does not hold every tenant's model.
+"""
+from __future__ import annotations
+import hashlib, threading
+from collections import OrderedDict
 from pathlib import Path
 import yaml as yaml
-from typing import Tuple
-from ..schemas.maturity import MaturityModel
+from typing import Dict, List, Tuple
+from ..schemas.maturity import Category, MaturityModel
+from ..services.artifacts import get_store
+from ..services.tagger import Tagger, tagger_for
 
 BASE_DIR = Path(__file__).parent.parent.parent  # services -> app -> src
 DEFAULT_YAML = BASE_DIR / "assets" / "maturity_model.yaml"
+TENANT_MODEL_NAME = "maturity_model.yaml"
+PROMPT_CRITERIA = 6  # criteria per category included in prompt definitions
+_CACHE_ENTRIES = 16  # compiled models kept per process, least recently used evicted first
+
+def set_default_model_path(path: str | Path) -> None:
+    """Point every ``load_maturity_model()`` call without a path at ``path`` (local runs)."""
+    global DEFAULT_YAML
+    DEFAULT_YAML = Path(path)
+
+
+class CompiledModel:
+    """A maturity model with the lookups derived from it, built once per model file content."""
+
+    def __init__(self, model: MaturityModel, raw: dict, sha256: str = ""):
+        self.model = model
+        self.raw = raw  # the YAML as loaded, if you want to inspect
+        self.sha256 = sha256
+        self.categories: Dict[str, Category] = model.index()
+        # category id -> [(criterion id, level, lowercased descriptor)], criteria and levels in model order
+        self.descriptors: Dict[str, List[Tuple[str, int, str]]] = {
+            cat.id: [(cr.id, lvl, desc.lower()) for cr in cat.criteria for lvl, desc in cr.levels.items()]
+            for cat in model.categories
+        }
+        # category id -> "Criterion: L1=...; L2=...; L3=...; L4=..." lines for LLM prompts
+        self.definitions: Dict[str, List[str]] = {
+            cat.id: [f"{cr.label}: " + "; ".join(f"L{n}={cr.levels.get(n, '')}" for n in (1, 2, 3, 4))
+                     for cr in cat.criteria[:PROMPT_CRITERIA]]
+            for cat in model.categories
+        }
+        self.tagger: Tagger = tagger_for(model)
+
+
+_COMPILED: "OrderedDict[str, CompiledModel]" = OrderedDict()  # content sha256 -> compiled model, LRU order
+_FILES: Dict[str, Tuple[int, int, str]] = {}  # resolved path -> (mtime_ns, size, sha256): skips re-reading
+_BY_MODEL: "OrderedDict[int, Tuple[MaturityModel, CompiledModel]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cached(sha: str) -> CompiledModel | None:
+    with _lock:
+        hit = _COMPILED.get(sha)
+        if hit is not None:
+            _COMPILED.move_to_end(sha)
+            if id(hit.model) in _BY_MODEL:
+                _BY_MODEL.move_to_end(id(hit.model))
+        return hit
+
 
-def load_maturity_model(path: str | None = None) -> Tuple[MaturityModel, dict]:
-    p = Path(path) if path else DEFAULT_YAML
+def _remember_model(model: MaturityModel, compiled: CompiledModel) -> None:
+    # caller holds _lock
+    _BY_MODEL[id(model)] = (model, compiled)
+    _BY_MODEL.move_to_end(id(model))
+    while len(_BY_MODEL) > _CACHE_ENTRIES:
+        _BY_MODEL.popitem(last=False)
+
+
+def _compiled(body: bytes, sha: str | None = None) -> CompiledModel:
+    sha = sha or hashlib.sha256(body).hexdigest()
+    hit = _cached(sha)
+    if hit is not None:
+        return hit
+    data = yaml.safe_load(body.decode("utf-8")) or {}
+    compiled = CompiledModel(MaturityModel(**data), data, sha)
+    with _lock:
+        compiled = _COMPILED.setdefault(sha, compiled)
+        _COMPILED.move_to_end(sha)
+        _remember_model(compiled.model, compiled)
+        while len(_COMPILED) > _CACHE_ENTRIES:
+            _, evicted = _COMPILED.popitem(last=False)
+            _BY_MODEL.pop(id(evicted.model), None)
+    return compiled
+
+
+def _load_file(p: Path) -> CompiledModel:
     if not p.exists():
         raise FileNotFoundError(f"Maturity model not found: {p}")
-    data = yaml.safe_load(p.read_text(encoding="utf-8")) or {}
-    model = MaturityModel(**data)
-    return model, data  # return raw too, if you want to inspect
+    st = p.stat()
+    path = str(p.resolve())
+    seen = _FILES.get(path)
+    if seen is not None and seen[:2] == (st.st_mtime_ns, st.st_size):
+        hit = _cached(seen[2])
+        if hit is not None:
+            return hit
+    body = p.read_bytes()
+    compiled = _compiled(body)
+    _FILES[path] = (st.st_mtime_ns, st.st_size, compiled.sha256)
+    return compiled
+
+
+def load_compiled_model(path: str | None = None, tenant: str | None = None, store=None) -> CompiledModel:
+    """
+    The compiled model at ``path`` (default: the packaged model), or the ``tenant``'s own
+    model from the artifact store when it has one. Cached by content hash.
+    """
+    if tenant and not path:
+        body = (store or get_store()).get(f"{tenant}/{TENANT_MODEL_NAME}")  # ETag-revalidated by the store
+        if body is not None:
+            return _compiled(body)
+    return _load_file(Path(path) if path else DEFAULT_YAML)
+
+
+def compile_model(model: MaturityModel) -> CompiledModel:
+    """The ``CompiledModel`` of a loaded ``model`` (compiled on the spot for models built elsewhere)."""
+    with _lock:
+        hit = _BY_MODEL.get(id(model))
+        if hit is not None and hit[0] is model:
+            _BY_MODEL.move_to_end(id(model))
+            return hit[1]
+    compiled = CompiledModel(model, model.dict())
+    with _lock:
+        _remember_model(model, compiled)
+    return compiled
+
+
+def load_maturity_model(path: str | None = None, tenant: str | None = None) -> Tuple[MaturityModel, dict]:
+    """(model, raw YAML) from ``load_compiled_model``: parsed once per file content and shared process-wide."""
+    compiled = load_compiled_model(path, tenant)
+    return compiled.model, compiled.raw
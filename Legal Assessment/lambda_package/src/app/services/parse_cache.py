@@ -0,0 +1,157 @@
+"""Content-addressed cache of parsed chunk lists.
+
+Entries are keyed by the SHA-256 of a file's bytes plus ``PARSER_VERSION`` (see
+``parsing``), so a document re-uploaded unchanged, or the same template shared
+by several companies, is parsed once. Chunks are stored under the filename they
+were first parsed with and re-labelled (ids, ``source.file``) on reuse.
+
+Backends (``PARSE_CACHE_BACKEND``):
+
+- ``s3``: one gzipped JSON object per entry under ``PARSE_CACHE_PREFIX`` in ``BUCKET_NAME``.
+- ``local``: the same files under ``PARSE_CACHE_DIR``, for development and local runs.
+- ``none``: disabled.
+
+The default is ``s3`` when ``BUCKET_NAME`` is set, ``local`` otherwise.
+"""
+from __future__ import annotations
+import gzip, hashlib, json, os, threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import boto3
+import botocore
+
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+PARSE_CACHE_BACKEND = os.getenv("PARSE_CACHE_BACKEND", "s3" if BUCKET_NAME else "local")
+PARSE_CACHE_PREFIX = os.getenv("PARSE_CACHE_PREFIX", "cache/parse/")
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", str(Path.home() / ".cache" / "legal_assessment" / "parse"))
+
+
+def file_digest(file_info: Dict[str, Any]) -> str:
+    """SHA-256 of the file behind ``{"filename", "path" or "data"}``."""
+    if file_info.get("data") is not None:
+        return hashlib.sha256(file_info["data"]).hexdigest()
+    h = hashlib.sha256()
+    with open(file_info["path"], "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class _LocalStore:
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def get(self, name: str) -> Optional[bytes]:
+        p = self.root / name
+        return p.read_bytes() if p.exists() else None
+
+    def put(self, name: str, body: bytes) -> None:
+        p = self.root / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".part")
+        tmp.write_bytes(body)
+        tmp.replace(p)
+
+
+class _S3Store:
+    def __init__(self, bucket: str, prefix: str):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3 = boto3.client('s3')
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            return self._s3.get_object(Bucket=self.bucket, Key=self.prefix + name)['Body'].read()
+        except botocore.exceptions.ClientError:
+            return None
+
+    def put(self, name: str, body: bytes) -> None:
+        self._s3.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=body,
+                            ContentType="application/gzip")
+
+
+def _relabel(chunks: List[Dict[str, Any]], old: str, new: str) -> List[Dict[str, Any]]:
+    if old == new:
+        return chunks
+    out = []
+    for ch in chunks:
+        ch = dict(ch)
+        if ch.get("id", "").startswith(old + "::"):
+            ch["id"] = new + ch["id"][len(old):]
+        ch["source"] = dict(ch.get("source") or {}, file=new)
+        out.append(ch)
+    return out
+
+
+class ParseCache:
+    """Chunk lists by (file content, parser version, file type)."""
+
+    def __init__(self, store=None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @classmethod
+    def from_env(cls) -> "ParseCache":
+        if PARSE_CACHE_BACKEND == "s3" and BUCKET_NAME:
+            return cls(_S3Store(BUCKET_NAME, PARSE_CACHE_PREFIX))
+        if PARSE_CACHE_BACKEND == "local":
+            return cls(_LocalStore(PARSE_CACHE_DIR))
+        return cls(None)
+
+    @staticmethod
+    def key(digest: str, ext: str, version: str) -> str:
+        return f"v{version}/{digest}{ext}.json.gz"
+
+    def _get(self, key: str, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            body = self.store.get(key)
+        except Exception as e:  # a broken cache must never fail ingestion
+            print(f"Parse cache read failed: {e}")
+            body = None
+        if body is None:
+            return None
+        entry = json.loads(gzip.decompress(body).decode("utf-8"))
+        return {"chunks": _relabel(entry["chunks"], entry["filename"], filename), "stats": entry.get("stats")}
+
+    def get_many(self, keys: List[str], filenames: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """{"chunks" (re-labelled to ``filenames``), "stats"} or None per key, fetched concurrently."""
+        if self.store is None or not keys:
+            hits = [None] * len(keys)
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(keys))) as pool:
+                hits = list(pool.map(self._get, keys, filenames))
+        with self._lock:
+            self._stats["hits"] += sum(h is not None for h in hits)
+            self._stats["misses"] += sum(h is None for h in hits)
+        return hits
+
+    def put(self, key: str, filename: str, chunks: List[Dict[str, Any]], stats: Optional[Dict[str, Any]] = None) -> None:
+        if self.store is None:
+            return
+        entry = {"filename": filename, "chunks": chunks, "stats": stats}
+        body = gzip.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        try:
+            self.store.put(key, body)
+        except Exception as e:
+            print(f"Parse cache write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self._stats["hits"], "misses": self._stats["misses"]}
+
+
+_cache: Optional[ParseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """Process-wide cache configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParseCache.from_env()
+        return _cache
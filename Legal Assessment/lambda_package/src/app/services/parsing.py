@@ -1,7 +1,9 @@
 from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
-import json, re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+import gzip, hashlib, json, math, multiprocessing, re, shutil, tempfile, threading, time, zipfile
 from io import BytesIO
 
 import fitz  # PyMuPDF
@@ -10,77 +12,332 @@ import os
 import requests
 from pptx import Presentation
 from docx import Document  # Add this import at the top
+
+from .parse_cache import file_digest, get_parse_cache
+
+# Bump whenever parser output changes: cached chunk lists are keyed by it
+PARSER_VERSION = "3"
+
+# Chunking: token budget per chunk (0 = the legacy 1500/1200-character budget), paragraphs
+# of overlap between consecutive chunks, and the token counter (see TOKEN_COUNTERS)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0"))
+CHUNK_OVERLAP_PARAS = int(os.getenv("CHUNK_OVERLAP_PARAS", "0"))
+CHUNK_TOKEN_COUNTER = os.getenv("CHUNK_TOKEN_COUNTER", "approx")
+
+# Page furniture: PDF lines on at least this fraction of pages (0 disables), judged on up to
+# BOILERPLATE_SAMPLE_PAGES evenly spaced pages; DOCX section header/footer text and page
+# numbers repeated this many times in the body
+BOILERPLATE_MIN_FRACTION = float(os.getenv("BOILERPLATE_MIN_FRACTION", "0.5"))
+BOILERPLATE_SAMPLE_PAGES = int(os.getenv("BOILERPLATE_SAMPLE_PAGES", "60"))
+BOILERPLATE_DOCX_REPEATS = int(os.getenv("BOILERPLATE_DOCX_REPEATS", "3"))
+BOILERPLATE_MAX_LINE = 200  # longer lines are content, never furniture
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDFs with at least this many pages are split into page ranges parsed in separate processes
+PDF_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_PAGES", "200"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# S3 uploads are read into memory up to INGEST_MEMORY_MB in total; the rest spills to the
+# job's scratch directory, which may hold at most INGEST_SCRATCH_MB
+INGEST_DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))
+INGEST_MEMORY_MB = int(os.getenv("INGEST_MEMORY_MB", "256"))
+INGEST_SCRATCH_MB = int(os.getenv("INGEST_SCRATCH_MB", "400"))
+
+# A parser source is a filesystem path or the file's bytes
+Source = Union[str, bytes]
+
+# bytes of PDFs being split into page ranges; forked range workers inherit them instead of
+# having the document pickled once per range
+_FORKED_STREAMS: Dict[str, bytes] = {}
 # --- helpers ---
 def _approx_tokens(s) -> int:
     return max(1, len(s) // 4)  # rough heuristic
 
-def _split_into_chunks(text: str, max_chars: int = 1500) -> List[str]:
-    paras = re.split(r"\n\s*\n", (text or "").strip())
-    out, buf = [], ""
+def _tiktoken_counter():
+    try:  # optional: exact counts for OpenAI models
+        import tiktoken
+    except ImportError:
+        raise RuntimeError("CHUNK_TOKEN_COUNTER=tiktoken requires the tiktoken package")
+    enc = tiktoken.get_encoding(os.getenv("CHUNK_TIKTOKEN_ENCODING", "o200k_base"))
+    return lambda s: max(1, len(enc.encode(s, disallowed_special=())))
+
+# name -> factory for a ``str -> int`` token counter
+TOKEN_COUNTERS = {
+    "approx": lambda: _approx_tokens,
+    "tiktoken": _tiktoken_counter,
+}
+
+def set_token_counter(counter) -> None:
+    """Use ``counter`` (a TOKEN_COUNTERS name or a ``str -> int`` callable) for chunk budgets and ``tokens``."""
+    global count_tokens, _counter_name
+    if callable(counter):
+        count_tokens, _counter_name = counter, getattr(counter, "__name__", "custom")
+    else:
+        count_tokens, _counter_name = TOKEN_COUNTERS[counter](), counter
+
+set_token_counter(CHUNK_TOKEN_COUNTER)
+
+def _parser_signature() -> str:
+    """PARSER_VERSION plus any non-default chunking settings (part of the parse-cache key)."""
+    if not CHUNK_MAX_TOKENS and not CHUNK_OVERLAP_PARAS and _counter_name == "approx":
+        return PARSER_VERSION
+    return f"{PARSER_VERSION}-t{CHUNK_MAX_TOKENS}-o{CHUNK_OVERLAP_PARAS}-{_counter_name}"
+
+def _split_into_chunks(text: str, max_chars: int = 1500, max_tokens: Optional[int] = None,
+                       overlap: Optional[int] = None) -> List[str]:
+    """
+    Pack paragraphs into chunks of at most ``max_chars`` characters, or ``max_tokens`` tokens
+    (default ``CHUNK_MAX_TOKENS``; 0 = use characters) as measured by ``count_tokens``.
+    A paragraph larger than the budget becomes a chunk on its own. With ``overlap`` > 0 each
+    chunk starts with the last ``overlap`` paragraphs of the previous one, as far as they fit.
+    """
+    max_tokens = CHUNK_MAX_TOKENS if max_tokens is None else max_tokens
+    overlap = CHUNK_OVERLAP_PARAS if overlap is None else overlap
+    if max_tokens:
+        size, sep, budget = count_tokens, 1, max_tokens
+    else:
+        size, sep, budget = len, 2, max_chars
+    paras = [p.strip() for p in re.split(r"\n\s*\n", (text or "").strip())]
+    out: List[str] = []
+    buf: List[str] = []
+    sizes: List[int] = []
     for p in paras:
-        p = p.strip()
         if not p:
             continue
-        if len(buf) + len(p) + 2 <= max_chars:
-            buf = (buf + "\n\n" + p).strip() if buf else p
-        else:
-            if buf:
-                out.append(buf)
-            buf = p
+        n = size(p)
+        if not buf or sum(sizes) + sep * len(buf) + n <= budget:
+            buf.append(p)
+            sizes.append(n)
+            continue
+        out.append("\n\n".join(buf))
+        keep = len(buf) - min(overlap, len(buf) - 1) if overlap else len(buf)
+        buf, sizes = buf[keep:], sizes[keep:]
+        while buf and sum(sizes) + sep * len(buf) + n > budget:
+            buf, sizes = buf[1:], sizes[1:]
+        buf.append(p)
+        sizes.append(n)
     if buf:
-        out.append(buf)
+        out.append("\n\n".join(buf))
     return out
 
-# --- per-type parsers ---
-def _parse_pdf(path, name) -> List[Dict]:
-    doc = fitz.open(path)
-    chunks = []
-    for i, page in enumerate(doc, start=1):
-        text = page.get_text("text") or ""
+# --- boilerplate (running headers/footers, page numbers, legends) ---
+_WS = re.compile(r"[ \t\u00a0]+")
+# "Page 3", "page 3 of 40", "p. 3/40", and lines that are only "3 of 40" / "3 / 40"
+_PAGE_NUMBER = re.compile(r"\b(?:page|pg\.?|p\.)\s*\d+(?:\s*(?:of|/)\s*\d+)?\b"
+                          r"|^[\s\-\u2013\u2014|\[(]*\d+\s*(?:of|/)\s*\d+[\s\-\u2013\u2014|\])]*$")
+_PAGE_KEY = re.compile(r"^[\s\-\u2013\u2014|\[(]*(?:(?:page|pg\.?|p\.)\s*)?#(?:\s*(?:of|/)\s*#)?[\s\-\u2013\u2014|\])]*$")
+# a line that is only a number ("3", "- 3 -"): a page number only at a page's edge, see _edge_numbers
+_BARE_NUMBER = re.compile(r"^[\s\-\u2013\u2014|\[(]*(\d{1,5})[\s\-\u2013\u2014|\])]*$")
+
+def _line_key(line: str) -> str:
+    key = _WS.sub(" ", line).strip().lower()
+    # page numbers vary from page to page: only they are masked, other figures must match exactly
+    return _PAGE_NUMBER.sub(lambda m: re.sub(r"\d+", "#", m.group()), key)
+
+def _edges(lines: List[str]) -> Dict[str, int]:
+    """Positions of the first and last non-empty line."""
+    filled = [i for i, l in enumerate(lines) if l.strip()]
+    return {"first": filled[0], "last": filled[-1]} if filled else {}
+
+def _edge_numbers(lines: List[str], page: int) -> Set[tuple]:
+    """``(edge, offset)`` for each page edge holding a bare number: its value minus the page index."""
+    out = set()
+    for edge, i in _edges(lines).items():
+        m = _BARE_NUMBER.match(lines[i])
+        if m:
+            out.add((edge, int(m.group(1)) - page))
+    return out
+
+def _repeated_lines(texts: Dict[int, str], min_fraction: float) -> Set:
+    """
+    Keys of short lines present on at least ``min_fraction`` of ``texts`` (page index -> page
+    text), plus ``(edge, offset)`` for bare page numbers: a number alone on the first or last
+    line of that share of pages whose value is the page index plus the same offset.
+    """
+    if min_fraction <= 0 or len(texts) < 3:
+        return set()
+    counts = Counter()
+    for page, t in texts.items():
+        lines = t.splitlines()
+        # number-only lines are figures unless they track the page (metric values, table cells)
+        counts.update({_line_key(l) for l in lines
+                       if l.strip() and len(l) <= BOILERPLATE_MAX_LINE and not _BARE_NUMBER.match(l)})
+        counts.update(_edge_numbers(lines, page))
+    need = max(2, math.ceil(min_fraction * len(texts)))
+    return {k for k, n in counts.items() if n >= need}
+
+def _clean_text(text: str, boilerplate: Set, stats: Optional[Dict], page: Optional[int] = None) -> str:
+    """Drop boilerplate lines (page ``page``'s own page number too) and collapse whitespace runs;
+    counts characters into ``stats``."""
+    lines = text.splitlines()
+    drop = set()
+    if boilerplate and page is not None:
+        edges = _edges(lines)
+        drop = {edges[edge] for edge, _ in _edge_numbers(lines, page) & boilerplate}
+    lines = [_WS.sub(" ", l).strip() for i, l in enumerate(lines)
+             if i not in drop and not (boilerplate and l.strip() and _line_key(l) in boilerplate)]
+    out = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    if stats is not None:
+        stats["chars_in"] += len(text)
+        stats["chars_out"] += len(out)
+    return out
+
+def _new_stats(name: str) -> Dict:
+    return {"file": name, "chars_in": 0, "chars_out": 0, "boilerplate_lines": 0}
+
+# --- per-type parsers (generators: chunks are yielded page by page / slide by slide) ---
+def _pdf_boilerplate(doc) -> tuple[Set, Dict[int, str]]:
+    """Repeated lines judged on a sample of pages, plus the sampled page texts (for reuse)."""
+    n = doc.page_count
+    if n <= BOILERPLATE_SAMPLE_PAGES:
+        sample = list(range(n))
+    else:
+        sample = sorted({round(k * (n - 1) / max(1, BOILERPLATE_SAMPLE_PAGES - 1)) for k in range(BOILERPLATE_SAMPLE_PAGES)})
+    texts = {i: doc[i].get_text("text") or "" for i in sample}
+    boilerplate = _repeated_lines(texts, BOILERPLATE_MIN_FRACTION)
+    if boilerplate and not any(_clean_text(t, boilerplate, None, i) for i, t in texts.items()):
+        return set(), texts  # every line repeats: that is the content, not furniture
+    return boilerplate, texts
+
+def _pdf_pages(doc, name, start: int, stop: int, boilerplate: Set, stats: Optional[Dict],
+               texts: Optional[Dict[int, str]] = None) -> Iterator[Dict]:
+    for i in range(start, stop):
+        raw = texts.pop(i) if texts and i in texts else (doc[i].get_text("text") or "")
+        text = _clean_text(raw, boilerplate, stats, i)
         for j, c in enumerate(_split_into_chunks(text), start=1):
-            chunks.append({
-                "id": f"{name}::p{i}::{j}",
+            yield {
+                "id": f"{name}::p{i + 1}::{j}",
                 "text": c,
-                "tokens": _approx_tokens(c),
+                "tokens": count_tokens(c),
                 "doc_type": "pdf",
                 "tags": [],
-                "source": {"file": name, "locator": f"p{i}"}
-            })
-    doc.close()
-    return chunks
-
-def _parse_docx(filepath, name) -> List[Dict]:
-    """filepath: string path to DOCX file"""
-    doc = Document(filepath)
+                "source": {"file": name, "locator": f"p{i + 1}"}
+            }
+
+def _open_pdf(src: Source):
+    if isinstance(src, bytes):
+        return fitz.open(stream=src, filetype="pdf")
+    if src in _FORKED_STREAMS:
+        return fitz.open(stream=_FORKED_STREAMS[src], filetype="pdf")
+    return fitz.open(src)
+
+def _pdf_range(src: Source, name, start: int, stop: int, boilerplate: Set) -> tuple[List[Dict], Dict]:
+    """Pool worker: chunks (and character counts) for pages ``[start, stop)``, read through the
+    worker's own fitz handle."""
+    doc = _open_pdf(src)
+    stats = _new_stats(name)
+    try:
+        return list(_pdf_pages(doc, name, start, stop, boilerplate, stats)), stats
+    finally:
+        doc.close()
+
+def _parse_pdf(src: Source, name, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    doc = _open_pdf(src)
+    try:
+        pages = doc.page_count
+        boilerplate, texts = _pdf_boilerplate(doc)
+        if stats is not None:
+            stats["boilerplate_lines"] = len(boilerplate)
+        if pages < PDF_PARALLEL_PAGES or PDF_WORKERS <= 1:
+            yield from _pdf_pages(doc, name, 0, pages, boilerplate, stats, texts)
+            return
+    finally:
+        doc.close()
+    texts = None  # sampled pages are re-read by the range workers
+    # a few ranges per worker keeps the pool busy when some pages are much heavier than others
+    step = max(1, -(-pages // (PDF_WORKERS * 4)))
+    ranges = [(a, min(a + step, pages)) for a in range(0, pages, step)]
+    try:
+        pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("fork"))
+    except (OSError, ValueError, NotImplementedError) as e:
+        print(f"Process pool unavailable ({e}); parsing {name} on one core")
+        doc = _open_pdf(src)
+        try:
+            yield from _pdf_pages(doc, name, 0, pages, boilerplate, stats)
+        finally:
+            doc.close()
+        return
+    ref = src
+    if isinstance(src, bytes):
+        ref = f"stream:{id(src)}:{name}"
+        _FORKED_STREAMS[ref] = src
+    try:
+        with pool:
+            futures = [pool.submit(_pdf_range, ref, name, a, b, boilerplate) for a, b in ranges]
+            for fut in futures:  # page order
+                chunks, part = fut.result()
+                if stats is not None:
+                    stats["chars_in"] += part["chars_in"]
+                    stats["chars_out"] += part["chars_out"]
+                yield from chunks
+    finally:
+        _FORKED_STREAMS.pop(ref, None)
+
+def _docx_furniture(doc) -> Set[str]:
+    """Line keys of the text in every section's headers and footers."""
+    keys = set()
+    for section in doc.sections:
+        parts = [section.header, section.footer]
+        parts += [getattr(section, a, None) for a in ("first_page_header", "first_page_footer",
+                                                      "even_page_header", "even_page_footer")]
+        for part in parts:
+            if part is None or getattr(part, "is_linked_to_previous", False):
+                continue
+            for para in part.paragraphs:
+                for line in para.text.splitlines():
+                    if line.strip():
+                        keys.add(_line_key(line))
+    return keys
+
+def _parse_docx(src: Source, name, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """src: path to the DOCX file, or its bytes"""
+    doc = Document(BytesIO(src) if isinstance(src, bytes) else src)
     
-    # Extract all text from paragraphs
+    # Extract all text from paragraphs; the section headers/footers and page numbers that a
+    # converted document repeats in its body are kept once (other repeated text is content)
     paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-    text = "\n\n".join(paragraphs)
+    furniture = _docx_furniture(doc)
+    counts = Counter(k for k in (_line_key(p) for p in paragraphs if len(p) <= BOILERPLATE_MAX_LINE)
+                     if k in furniture or _PAGE_KEY.match(k))
+    repeated = {k for k, n in counts.items() if BOILERPLATE_MIN_FRACTION > 0 and n >= BOILERPLATE_DOCX_REPEATS}
+    seen = set()
+    kept = []
+    for p in paragraphs:
+        key = _line_key(p)
+        if key in repeated:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(p)
+    if stats is not None:
+        stats["boilerplate_lines"] = len(repeated)
+    raw = "\n\n".join(paragraphs)
+    text = "\n\n".join(kept)
     
     # Also extract text from tables if any
     for table in doc.tables:
         for row in table.rows:
             row_text = " | ".join(cell.text.strip() for cell in row.cells)
             if row_text.strip():
+                raw += "\n" + row_text
                 text += "\n" + row_text
     
-    
-    chunks = []
+    text = _clean_text(text, set(), None)
+    if stats is not None:
+        stats["chars_in"] += len(raw)
+        stats["chars_out"] += len(text)
     for j, c in enumerate(_split_into_chunks(text), start=1):
-        chunks.append({
+        yield {
             "id": f"{name}::doc::{j}",
             "text": c,
-            "tokens": _approx_tokens(c),
+            "tokens": count_tokens(c),
             "doc_type": "docx",
             "tags": [],
             "source": {"file": name, "locator": f"sec{j}"}
-        })
-    return chunks
+        }
         
 
-def _parse_pptx(path, name) -> List[Dict]:
-    prs = Presentation(path)
-    chunks = []
+def _parse_pptx(src: Source, name, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    prs = Presentation(BytesIO(src) if isinstance(src, bytes) else src)
     def text_from_shape(shape) -> str:
         if hasattr(shape, "text"):
             return shape.text or ""
@@ -94,33 +351,39 @@ def _parse_pptx(path, name) -> List[Dict]:
             if t:
                 texts.append(t)
         slide_text = "\n".join(texts).strip()
+        if stats is not None:
+            stats["chars_in"] += len(slide_text)
+            stats["chars_out"] += len(slide_text)
         if not slide_text:
             continue
         for j, c in enumerate(_split_into_chunks(slide_text, max_chars=1200), start=1):
-            chunks.append({
+            yield {
                 "id": f"{name}::s{i}::{j}",
                 "text": c,
-                "tokens": _approx_tokens(c),
+                "tokens": count_tokens(c),
                 "doc_type": "pptx",
                 "tags": [],
                 "source": {"file": name, "locator": f"s{i}"}
-            })
-    return chunks
+            }
 
-def _parse_txt(path, name) -> List[Dict]:
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        text = f.read()
-    chunks = []
+def _parse_txt(src: Source, name, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    if isinstance(src, bytes):
+        text = src.decode('utf-8', errors='ignore')
+    else:
+        with open(src, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+    if stats is not None:
+        stats["chars_in"] += len(text)
+        stats["chars_out"] += len(text)
     for j, c in enumerate(_split_into_chunks(text), start=1):
-        chunks.append({
+        yield {
             "id": f"{name}::txt::{j}",
             "text": c,
-            "tokens": _approx_tokens(c),
+            "tokens": count_tokens(c),
             "doc_type": "txt",
             "tags": [],
             "source": {"file": name, "locator": f"sec{j}"}
-        })
-    return chunks
+        }
 
 PARSERS = {
     ".pdf": _parse_pdf,
@@ -129,33 +392,163 @@ PARSERS = {
     ".txt": _parse_txt,
 }
 
-# In parsing.py - ingest_files function
-def ingest_files(filenames: List[Dict]) -> bytes:
-    all_chunks: List[Dict] = []
-    
-    for file_info in filenames:
-        filename = file_info['filename']
-        filepath = file_info['path']
-        ext = "." + filename.split(".")[-1].lower()
-        
-        # DEBUG: Only check DOCX files
-        
-        # Read from local file
-        if ext == ".docx":
-            import time, zipfile
-
-            time.sleep(0.05)  # small wait to avoid race (Lambda-specific quirk)
-            print("try zip")
-            with open(filepath, "rb") as f:
-                # double-check ZIP validity by actually opening it as zip
-                z = zipfile.ZipFile(f)
-                z.testzip()  # will raise BadZipFile if something is wrong
-            print("try docx")
-            # Now open with python-docx
-            doc = Document(filepath)
-            print("success?")
-        parser = PARSERS.get(ext)
-        if parser:
-            all_chunks.extend(parser(filepath, filename))
-    
-    return all_chunks
+def _ext(filename: str) -> str:
+    return "." + filename.split(".")[-1].lower()
+
+def _check_docx(src: Source) -> None:
+    if isinstance(src, bytes):
+        zipfile.ZipFile(BytesIO(src)).testzip()
+        return
+    time.sleep(0.05)  # small wait to avoid race (Lambda-specific quirk)
+    with open(src, "rb") as f:
+        # double-check ZIP validity by actually opening it as zip
+        z = zipfile.ZipFile(f)
+        z.testzip()  # will raise BadZipFile if something is wrong
+
+def _iter_file(file_info: Dict, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """file_info: {"filename", "path"} or {"filename", "data": bytes}; ``stats`` collects character counts"""
+    filename = file_info['filename']
+    src = file_info['data'] if file_info.get('data') is not None else file_info['path']
+    ext = _ext(filename)
+    parser = PARSERS.get(ext)
+    if not parser:
+        return
+    if ext == ".docx":
+        _check_docx(src)
+    yield from parser(src, filename, stats)
+
+def _spool_file(file_info: Dict, out_path: str) -> Dict:
+    """Pool worker: parse one file and stream its chunks to a JSON Lines spool file; returns its stats."""
+    stats = _new_stats(file_info['filename'])
+    with open(out_path, "w", encoding="utf-8") as out:
+        for ch in _iter_file(file_info, stats):
+            out.write(json.dumps(ch, ensure_ascii=False) + "\n")
+    return stats
+
+def _make_pool(workers: int):
+    # fork keeps workers from re-importing the Flask app; Lambda has no /dev/shm for
+    # multiprocessing semaphores, so fall back to threads there
+    try:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    except (OSError, ValueError, NotImplementedError) as e:
+        print(f"Process pool unavailable ({e}); parsing with threads")
+        return ThreadPoolExecutor(max_workers=workers)
+
+def _parse_stream(filenames: List[Dict], workers: int) -> Iterator[tuple[Iterator[Dict], Dict]]:
+    """
+    (chunk iterator, stats) per file, in file order; each iterator must be consumed before the
+    next, and its stats are complete once it is.
+    """
+    if workers <= 1 or len(filenames) <= 1:
+        for file_info in filenames:
+            stats = _new_stats(file_info['filename'])
+            yield _iter_file(file_info, stats), stats
+        return
+    with tempfile.TemporaryDirectory(prefix="ingest_") as spool_dir, _make_pool(workers) as pool:
+        futures = [pool.submit(_spool_file, f, os.path.join(spool_dir, f"{i}.jsonl"))
+                   for i, f in enumerate(filenames)]
+        for i, fut in enumerate(futures):
+            stats = fut.result()  # re-raises parser errors in file order
+            yield _read_spool(os.path.join(spool_dir, f"{i}.jsonl")), stats
+
+def _read_spool(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as spool:
+        for line in spool:
+            yield json.loads(line)
+
+def iter_chunks(filenames: List[Dict], workers: Optional[int] = None,
+                stats: Optional[List[Dict]] = None) -> Iterator[Dict]:
+    """
+    Yield chunks for every file, in file order, without holding the corpus in memory.
+
+    Files whose bytes were parsed before (by this parser version) come from the parse
+    cache. The rest are parsed, with several files each going to a worker process
+    that spools its chunks to a scratch JSONL file streamed back one at a time.
+    Per-file character counts before/after boilerplate stripping are appended to ``stats``.
+    Freshly parsed chunks are yielded as copies, so callers can annotate them (``tags``)
+    without changing what goes into the cache.
+    """
+    workers = INGEST_WORKERS if workers is None else workers
+    cache = get_parse_cache()
+    keys = [cache.key(file_digest(f), _ext(f['filename']), _parser_signature()) for f in filenames]
+    hits = cache.get_many(keys, [f['filename'] for f in filenames])
+    parsed = _parse_stream([f for f, hit in zip(filenames, hits) if hit is None], workers)
+    for file_info, key, hit in zip(filenames, keys, hits):
+        if hit is not None:
+            if stats is not None and hit.get("stats"):
+                stats.append(dict(hit["stats"], file=file_info['filename'], cached=True))
+            yield from hit["chunks"]
+            continue
+        chunks = []
+        stream, file_stats = next(parsed)
+        for ch in stream:
+            chunks.append(ch)
+            yield dict(ch)
+        if _ext(file_info['filename']) in PARSERS:
+            if stats is not None:
+                stats.append(file_stats)
+            cache.put(key, file_info['filename'], chunks, file_stats)
+
+def fetch_files(store, files: List[Dict], scratch_dir: str, workers: Optional[int] = None) -> List[Dict]:
+    """
+    Download ``files`` ([{"filename", "key"}]) from the artifact ``store`` concurrently for ``iter_chunks``.
+
+    Objects are read into memory ({"filename", "data"}) while the ``INGEST_MEMORY_MB``
+    budget lasts; later ones are written under ``scratch_dir`` ({"filename", "path"}),
+    which the caller owns and removes. Exceeding ``INGEST_SCRATCH_MB`` raises RuntimeError.
+    """
+    lock = threading.Lock()
+    budget = {"memory": INGEST_MEMORY_MB * 2**20, "scratch": INGEST_SCRATCH_MB * 2**20}
+
+    def take(pool: str, size: int) -> bool:
+        with lock:
+            if size > budget[pool]:
+                return False
+            budget[pool] -= size
+            return True
+
+    def fetch(i_file):
+        i, file = i_file
+        size, body = store.open(file['key'])
+        with body:
+            if take("memory", size):
+                return {"filename": file['filename'], "data": body.read()}
+            if not take("scratch", size):
+                raise RuntimeError(f"Upload {file['key']} does not fit in the {INGEST_SCRATCH_MB} MB ingestion scratch space")
+            path = os.path.join(scratch_dir, f"{i}_{os.path.basename(file['filename'])}")
+            with open(path, "wb") as out:
+                shutil.copyfileobj(body, out)
+        return {"filename": file['filename'], "path": path}
+
+    workers = workers or INGEST_DOWNLOAD_WORKERS
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files) or 1))) as pool:
+        return list(pool.map(fetch, enumerate(files)))
+
+def chunk_digest(chunk: Dict) -> str:
+    """Content digest of a chunk (text + source), used to tell new or edited chunks from known ones."""
+    src = chunk.get("source") or {}
+    blob = json.dumps([chunk.get("text") or "", src.get("file"), src.get("locator")], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+def write_chunks(chunks: Iterable[Dict], fp) -> int:
+    """Write ``chunks`` to ``fp`` as a JSON array one element at a time; returns the count."""
+    n = 0
+    fp.write("[")
+    for ch in chunks:
+        fp.write(("\n" if n == 0 else ",\n") + json.dumps(ch, ensure_ascii=False))
+        n += 1
+    fp.write("\n]" if n else "]")
+    return n
+
+def read_chunks(path: str) -> Iterator[Dict]:
+    """Chunks from a gzip JSON Lines chunk artifact (``chunk_artifact``) or a file written by ``write_chunks``, one line at a time."""
+    with open(path, "rb") as fp:
+        compressed = fp.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rt", encoding="utf-8") if compressed else open(path, encoding="utf-8")) as fp:
+        for line in fp:
+            line = line.strip().rstrip(",")
+            if line and line not in ("[", "]", "[]"):
+                yield json.loads(line)
+
+def ingest_files(filenames: List[Dict]) -> List[Dict]:
+    return list(iter_chunks(filenames))
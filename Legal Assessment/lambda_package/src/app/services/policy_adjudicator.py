@@ -1,9 +1,12 @@
 from __future__ import annotations
-import json, math, re
+import json, os, re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
 
-from ..services.maturity import load_maturity_model
+from ..services.llm_cache import get_cache
+from ..services.maturity import load_compiled_model
+from ..services.policy_index import PolicyIndex, load_policy_index
 
 # OpenAI client - required for this module
 try:
@@ -19,50 +22,73 @@ except Exception as e:
 
 CHAT_MODEL = "gpt-4o-mini"
 EMBED_MODEL = "text-embedding-3-small"
+POLICY_CONCURRENCY = int(os.getenv("POLICY_CONCURRENCY", "8"))  # max adjudication calls in flight
+# opt-in: search only the policy chunks tagged with the category (when at least top_k are).
+# Faster on large indexes, but passages without any of the category's keywords can then no
+# longer be retrieved, so verdicts may differ from a full search.
+POLICY_TAG_FILTER = os.getenv("POLICY_TAG_FILTER", "0") == "1"
 
 
-def _load_index(index_path: str | None) -> Dict[str, Any]:
-    BASE_DIR = Path(__file__).parent.parent.parent  # services -> app -> src
-    p = BASE_DIR / "assets" / "policy_index.json"
-    if not p.exists():
-        raise FileNotFoundError(f"Policy index not found at {p}")
-    return json.loads(p.read_text(encoding="utf-8"))
+def _load_index(index_path: str | None) -> PolicyIndex:
+    # binary matrix when available, JSON otherwise; cached per warm container
+    return load_policy_index(index_path)
 
 
-def _embed_query(q: str) -> List[float]:
-    """Generate embedding for query using OpenAI API"""
+def _embed_queries(qs: List[str]) -> List[List[float]]:
+    """Embed every query in a single OpenAI request (results keep input order)."""
+    if not qs:
+        return []
     try:
-        resp = client.embeddings.create(model=EMBED_MODEL, input=[q])
-        return resp.data[0].embedding
+        resp = client.embeddings.create(model=EMBED_MODEL, input=qs)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
     except Exception as e:
         raise RuntimeError(f"Query embedding generation failed: {e}")
 
 
-def _cosine(a: List[float], b: List[float]) -> float:
-    num = sum(x * y for x, y in zip(a, b))
-    da = math.sqrt(sum(x * x for x in a)) or 1.0
-    db = math.sqrt(sum(x * x for x in b)) or 1.0
-    return num / (da * db)
-
+def _embed_query(q: str) -> List[float]:
+    """Generate embedding for query using OpenAI API"""
+    return _embed_queries([q])[0]
 
-def _retrieve(idx: Dict[str, Any], query: str, k: int = 5) -> List[Dict[str, Any]]:
-    """Retrieve most relevant policy chunks using semantic search"""
-    chunks = idx.get("chunks", [])
-    engine = (idx.get("meta") or {}).get("engine", "")
 
+def _check_engine(idx: PolicyIndex) -> None:
+    engine = idx.engine
     if engine != "openai":
         raise ValueError(f"Policy index was not built with OpenAI embeddings (engine: {engine})")
 
-    qv = _embed_query(query)
-    scored = []
-    for c in chunks:
-        if "embedding" not in c:
-            continue
-        s = _cosine(qv, c["embedding"])
-        scored.append((s, c))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for _, c in scored[:k]]
+def _retrieve(idx: PolicyIndex, query: str, k: int = 5, query_vec: Optional[List[float]] = None,
+              rows: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Retrieve most relevant policy chunks using semantic search (among ``rows`` if given)"""
+    _check_engine(idx)
+    qv = query_vec if query_vec is not None else _embed_query(query)
+    return idx.search(qv, k=k, rows=rows)
+
+
+def _candidate_rows(idx: PolicyIndex, cat: Dict[str, Any], tag_key: str, k: int) -> Optional[List[int]]:
+    # tag lookup instead of scanning text; None (search everything) unless POLICY_TAG_FILTER is
+    # on, or if the index was tagged for another model, or too few chunks carry the category
+    if not POLICY_TAG_FILTER or (idx.meta or {}).get("tag_key") != tag_key:
+        return None
+    rows = idx.tagged(str(cat.get("id")))
+    return rows if len(rows) >= k else None
+
+
+def _adjudicate(cat: Dict[str, Any], hits: List[Dict[str, Any]], definitions: Dict[str, List[str]]) -> Dict[str, Any]:
+    """LLM verdict for one category; the prompt is built from the category query and the
+    retrieved snippets, so an unchanged category is answered from the shared response cache."""
+    msgs = _build_prompt(cat, hits, definitions)
+    try:
+        content = get_cache().chat(
+            client, "policy_adjudication", validate=json.loads,
+            model=CHAT_MODEL,
+            messages=msgs,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        data = json.loads(content)
+    except Exception as e:
+        raise RuntimeError(f"LLM adjudication failed for category {cat.get('name', cat.get('id', 'unknown'))}: {e}")
+    return data
 
 
 def _build_category_query(cat: Dict[str, Any]) -> str:
@@ -74,21 +100,11 @@ def _build_category_query(cat: Dict[str, Any]) -> str:
     return "\n".join(parts)
 
 
-def _build_prompt(cat: Dict[str, Any], policy_snippets: List[Dict[str, Any]], maturity_defs: Dict[str, Any]) -> List[
+def _build_prompt(cat: Dict[str, Any], policy_snippets: List[Dict[str, Any]], definitions: Dict[str, List[str]]) -> List[
     Dict[str, str]]:
     name = cat.get("name", cat.get("id", ""))
-    # try to include the category's criteria/levels definitions from the maturity model (if present)
-    defs = []
-    # maturity_defs: {"categories":[{id,name,criteria:[{label,levels{1..4}}]}]}
-    try:
-        md_cat = next((x for x in maturity_defs.get("categories", []) if x.get("id") == cat.get("id")), None)
-        if md_cat:
-            for cr in md_cat.get("criteria", [])[:6]:
-                lv = cr.get("levels", {})
-                defs.append(
-                    f"{cr.get('label', cr.get('id'))}: L1={lv.get(1, '')}; L2={lv.get(2, '')}; L3={lv.get(3, '')}; L4={lv.get(4, '')}")
-    except Exception:
-        pass
+    # the category's criteria/levels definitions, rendered once per model (see maturity.CompiledModel)
+    defs = definitions.get(cat.get("id"), [])
 
     pol_text = "\n\n".join(
         [f"[{i + 1}] {s['file']} — {s['id']}\n{(s.get('text') or '')[:900]}" for i, s in enumerate(policy_snippets)])
@@ -113,36 +129,32 @@ def apply_policy_to_current_state(
         index_path: Optional[str] = None,
         model_path: Optional[str] = None,
         top_k: int = 5,
-        enforce: bool = False
+        enforce: bool = False,
+        tenant: Optional[str] = None
 ) -> Path:
     """
     Reads working/{job}/current_state.json and maturity model, retrieves policy snippets,
     asks LLM for policy-aligned level per category, writes working/{job}/current_state_policy.json.
+    The ``tenant``'s own maturity model supplies the definitions when it has one.
     """
 
-    # raw maturity YAML (as dict) for definitions
-    model, raw = load_maturity_model()
-    maturity_defs = raw  # {"categories":[...]}
+    compiled = load_compiled_model(model_path, tenant=tenant)
 
     idx = _load_index(index_path)
+    _check_engine(idx)
 
-    results: List[Dict[str, Any]] = []
-    for cat in cs.get("categories", []):
-        query = _build_category_query(cat)
-        hits = _retrieve(idx, query, k=top_k)
-
-        msgs = _build_prompt(cat, hits, maturity_defs)
-        try:
-            resp = client.chat.completions.create(
-                model=CHAT_MODEL,
-                messages=msgs,
-                temperature=0,
-                response_format={"type": "json_object"}
-            )
-            data = json.loads(resp.choices[0].message.content)
-        except Exception as e:
-            raise RuntimeError(f"LLM adjudication failed for category {cat.get('name', cat.get('id', 'unknown'))}: {e}")
+    cats = cs.get("categories", [])
+    queries = [_build_category_query(cat) for cat in cats]
+    vectors = _embed_queries(queries)  # one request for every category
+    tag_key = compiled.tagger.key
+    hits = [_retrieve(idx, q, k=top_k, query_vec=v, rows=_candidate_rows(idx, cat, tag_key, top_k))
+            for cat, q, v in zip(cats, queries, vectors)]
+
+    with ThreadPoolExecutor(max_workers=max(1, POLICY_CONCURRENCY)) as pool:
+        verdicts = list(pool.map(lambda a: _adjudicate(*a, compiled.definitions), zip(cats, hits)))
 
+    results: List[Dict[str, Any]] = []
+    for cat, data in zip(cats, verdicts):
         # merge
         cat_out = dict(cat)  # copy
         cat_out["policy_level"] = int(data.get("level", cat.get("level", 1)))
@@ -0,0 +1,346 @@
+"""Policy embedding index storage.
+
+Two on-disk formats are supported:
+
+- Legacy JSON (``policy_index.json``): ``{"meta": {...}, "chunks": [{..., "embedding": [floats]}]}``.
+- Binary: ``policy_index.f32.npy`` holds a contiguous float32 matrix with one
+  L2-normalized row per chunk, memory-mapped on load; ``policy_index.meta.json``
+  holds ``meta`` plus the chunk metadata (everything except the embedding).
+
+The binary format is read and written with the standard library (``mmap`` plus a
+float32 ``memoryview``), so it also works in the Lambda, whose dependency layer has
+no numpy: there ``search`` computes the dot products in Python over the mapped rows,
+which saves parsing the embeddings out of JSON but not the per-row arithmetic. With
+numpy installed (local runs, the indexer CLI) the same file is ``np.load``-ed as a
+memmap and ranked with one matrix-vector product.
+
+``load_policy_index`` prefers the binary pair when present and built with the JSON
+beside it (same ``built_at``/``chunks`` in ``meta``; a leftover pair from an older
+build is ignored), falls back to JSON otherwise, and caches the loaded index per warm
+container, revalidating it on every load: by S3 ETag for a published index, by file
+mtime/size for a local one. ``PolicyIndex.search`` returns the top-k chunks by cosine
+similarity, optionally among a subset of rows (e.g. ``tagged`` with a maturity category).
+
+When ``POLICY_INDEX_PREFIX`` is set, the index published under that S3 prefix
+(see ``publish_policy_index``) takes precedence over the packaged asset and is
+mirrored into ``/tmp/policy_index`` whenever its ETag changes.
+
+Convert an existing JSON index with::
+
+    python -m src.app.services.policy_index convert [path/to/policy_index.json]
+"""
+from __future__ import annotations
+import array, ast, heapq, json, math, mmap, operator, os, struct, sys, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+import botocore
+
+try:  # optional: without numpy (as in the Lambda) search falls back to pure-Python dot products
+    import numpy as np
+except ImportError:
+    np = None
+
+BASE_DIR = Path(__file__).parent.parent.parent  # services -> app -> src
+DEFAULT_INDEX = BASE_DIR / "assets" / "policy_index.json"
+
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+POLICY_INDEX_PREFIX = os.getenv("POLICY_INDEX_PREFIX", "")  # e.g. "policy_index/"; empty = packaged asset only
+MIRROR_DIR = Path("/tmp/policy_index")
+s3 = boto3.client('s3')
+
+_INDEX_CACHE: Dict[str, Tuple["PolicyIndex", Any]] = {}  # path -> (index, stamp it was loaded at)
+
+
+def _sidecars(json_path: Path) -> tuple[Path, Path]:
+    stem = json_path.name[:-len(".json")] if json_path.name.endswith(".json") else json_path.name
+    return json_path.with_name(f"{stem}.f32.npy"), json_path.with_name(f"{stem}.meta.json")
+
+
+def resolve_index_path(index_path: str | None) -> Path:
+    if not index_path:
+        return DEFAULT_INDEX
+    p = Path(index_path)
+    return p if p.is_absolute() else BASE_DIR / p
+
+
+def index_files(json_path: Path) -> List[Path]:
+    """The JSON index and its binary sidecars."""
+    return [json_path, *_sidecars(json_path)]
+
+
+def _fetch_published(name: str) -> Optional[Path]:
+    """Mirror the index published under ``POLICY_INDEX_PREFIX`` into /tmp; None if nothing is published."""
+    dest = MIRROR_DIR / name
+    MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+    found = False
+    for p in index_files(dest):
+        try:
+            s3.download_file(BUCKET_NAME, POLICY_INDEX_PREFIX + p.name, str(p))
+            found = True
+        except botocore.exceptions.ClientError:
+            p.unlink(missing_ok=True)
+    return dest if found else None
+
+
+def _published_etag(name: str) -> Optional[str]:
+    try:
+        return s3.head_object(Bucket=BUCKET_NAME, Key=POLICY_INDEX_PREFIX + name)["ETag"]
+    except botocore.exceptions.ClientError:
+        return None
+
+
+def publish_policy_index(json_path: str | Path) -> List[str]:
+    """
+    Upload the index at ``json_path`` and its sidecars under ``POLICY_INDEX_PREFIX``:
+    sidecars first and the JSON last (its ETag is what readers revalidate against).
+    Published sidecars with no local counterpart are deleted.
+    """
+    json_path = Path(json_path)
+    keys = []
+    for p in [*_sidecars(json_path), json_path]:
+        key = POLICY_INDEX_PREFIX + p.name
+        if p.exists():
+            s3.upload_file(str(p), BUCKET_NAME, key)
+            keys.append(key)
+        elif p != json_path:
+            s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+    _INDEX_CACHE.clear()
+    return keys
+
+
+def _normalized(vec: List[float]) -> List[float]:
+    n = math.sqrt(sum(x * x for x in vec))
+    return [x / n for x in vec] if n else list(vec)
+
+
+_NPY_MAGIC = b"\x93NUMPY"
+
+
+def _write_npy(path: Path, rows: List[List[float]], dim: int) -> None:
+    """Write ``rows`` as a little-endian float32 ``.npy`` (format 1.0) without numpy."""
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({len(rows)}, {dim}), }}"
+    header += " " * (63 - (len(_NPY_MAGIC) + 4 + len(header)) % 64) + "\n"  # data starts 64-byte aligned
+    data = array.array("f")
+    for r in rows:
+        data.extend(r)
+    if sys.byteorder != "little":
+        data.byteswap()
+    with open(path, "wb") as f:
+        f.write(_NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+        data.tofile(f)
+
+
+class _MappedRows:
+    """Rows of a float32 ``.npy`` matrix, memory-mapped with the standard library (no numpy)."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:6] != _NPY_MAGIC:
+            raise ValueError(f"{path} is not a .npy file")
+        major = self._mm[6]
+        if major == 1:
+            (hlen,), start = struct.unpack("<H", self._mm[8:10]), 10
+        else:
+            (hlen,), start = struct.unpack("<I", self._mm[8:12]), 12
+        header = ast.literal_eval(self._mm[start:start + hlen].decode("latin1"))
+        if header.get("descr") != "<f4" or header.get("fortran_order") or len(header.get("shape", ())) != 2:
+            raise ValueError(f"{path}: expected a C-ordered little-endian float32 matrix, got {header}")
+        self.shape = tuple(header["shape"])
+        n, d = self.shape
+        raw = memoryview(self._mm)[start + hlen:start + hlen + n * d * 4]
+        if sys.byteorder == "little":
+            self._flat = raw.cast("f")
+        else:  # big-endian host: one swapped copy
+            flat = array.array("f", bytes(raw))
+            flat.byteswap()
+            self._flat = memoryview(flat)
+        self.dim = d
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, i: int):
+        return self._flat[i * self.dim:(i + 1) * self.dim]
+
+
+def _dot(q: List[float], row) -> float:
+    return sum(map(operator.mul, q, row))
+
+
+class PolicyIndex:
+    """Chunk metadata plus a row-normalized embedding matrix (numpy array/memmap, mapped rows or list of lists)."""
+
+    def __init__(self, meta: Dict[str, Any], chunks: List[Dict[str, Any]], matrix, fmt: str):
+        self.meta = meta
+        self.chunks = chunks
+        self.matrix = matrix
+        self.format = fmt
+        self._tagged: Optional[Dict[str, List[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def engine(self) -> str:
+        return (self.meta or {}).get("engine", "")
+
+    def tagged(self, tag: str) -> List[int]:
+        """Rows whose chunk carries ``tag`` (tags are set when the index is built; see ``tagger``)."""
+        if self._tagged is None:
+            by_tag: Dict[str, List[int]] = {}
+            for i, c in enumerate(self.chunks):
+                for t in c.get("tags") or ():
+                    by_tag.setdefault(t, []).append(i)
+            self._tagged = by_tag
+        return self._tagged.get(tag, [])
+
+    def search(self, query_vec: List[float], k: int = 5, rows: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-``k`` chunks by cosine similarity, among ``rows`` (default: all, ascending):
+        one matrix-vector product plus partial selection.
+        """
+        ids = list(range(len(self.chunks))) if rows is None else rows
+        n = len(ids)
+        if n == 0 or k <= 0:
+            return []
+        k = min(k, n)
+        q = _normalized(query_vec)
+        if np is not None and isinstance(self.matrix, np.ndarray):
+            sub = self.matrix if rows is None else self.matrix[np.asarray(ids)]
+            scores = sub @ np.asarray(q, dtype=np.float32)
+            part = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            order = part[np.lexsort((part, -scores[part]))]  # score desc, then index
+            return [self.chunks[ids[i]] for i in order.tolist()]
+        m = self.matrix
+        top = heapq.nsmallest(k, range(n), key=lambda i: (-_dot(q, m[ids[i]]), i))
+        return [self.chunks[ids[i]] for i in top]
+
+
+def _load_json(p: Path) -> PolicyIndex:
+    data = json.loads(p.read_text(encoding="utf-8"))
+    chunks, rows = [], []
+    for c in data.get("chunks", []):
+        if "embedding" not in c:
+            continue
+        chunks.append({k: v for k, v in c.items() if k != "embedding"})
+        rows.append(_normalized(c["embedding"]))
+    matrix = np.asarray(rows, dtype=np.float32) if (np is not None and rows) else rows
+    return PolicyIndex(data.get("meta") or {}, chunks, matrix, "json")
+
+
+def _json_meta(p: Path) -> Dict[str, Any]:
+    """``meta`` of a JSON index, read from the head of the file when it comes first (as the builder writes it)."""
+    with open(p, "rb") as f:
+        head = f.read(1 << 16).decode("utf-8", "ignore")
+    prefix = '{"meta": '
+    if head.startswith(prefix):
+        try:
+            return json.JSONDecoder().raw_decode(head, len(prefix))[0] or {}
+        except ValueError:
+            pass
+    return json.loads(p.read_text(encoding="utf-8")).get("meta") or {}
+
+
+def _same_build(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    # unstamped metadata (a legacy index, a leftover sidecar) never proves two files are one build
+    a, b = a or {}, b or {}
+    return bool(a.get("built_at")) and a.get("built_at") == b.get("built_at") and a.get("chunks") == b.get("chunks")
+
+
+def _load_binary(npy: Path, meta_path: Path) -> PolicyIndex:
+    side = json.loads(meta_path.read_text(encoding="utf-8"))
+    matrix = np.load(npy, mmap_mode="r") if np is not None else _MappedRows(npy)
+    chunks = side.get("chunks", [])
+    if matrix.shape[0] != len(chunks):
+        raise ValueError(f"Policy index mismatch: {matrix.shape[0]} vectors vs {len(chunks)} chunks in {meta_path}")
+    return PolicyIndex(side.get("meta") or {}, chunks, matrix, "binary")
+
+
+def _local_stamp(p: Path):
+    return tuple((f.stat().st_mtime_ns, f.stat().st_size) if f.exists() else None for f in index_files(p))
+
+
+def load_policy_index(index_path: str | None = None, reload: bool = False) -> PolicyIndex:
+    """
+    The index at ``index_path`` (default ``assets/policy_index.json``), kept per warm
+    container and reloaded when the published (or local) index changes.
+    """
+    p = resolve_index_path(index_path)
+    key = str(p)
+    etag = _published_etag(p.name) if POLICY_INDEX_PREFIX and BUCKET_NAME else None
+    stamp = etag if etag is not None else _local_stamp(p)  # nothing published: the packaged asset
+    hit = _INDEX_CACHE.get(key)
+    if hit is not None and not reload and hit[1] == stamp:
+        return hit[0]
+    if etag is not None:
+        p = _fetch_published(p.name) or p
+    npy, meta_path = _sidecars(p)
+    idx = None
+    if npy.exists() and meta_path.exists():
+        idx = _load_binary(npy, meta_path)
+        if p.exists() and not _same_build(idx.meta, _json_meta(p)):
+            print(f"Ignoring binary policy index sidecars left over from another build of {p}")
+            idx = None
+    if idx is None:
+        if not p.exists():
+            raise FileNotFoundError(f"Policy index not found at {p}")
+        idx = _load_json(p)
+    _INDEX_CACHE[key] = (idx, stamp)
+    return idx
+
+
+def write_binary_index(json_path: str | Path, meta: Dict[str, Any], chunks: List[Dict[str, Any]],
+                       embeddings: List[List[float]]) -> tuple[Path, Path]:
+    """Write the float32 matrix + metadata sidecar next to ``json_path`` (standard library only)."""
+    if len(chunks) != len(embeddings):
+        raise ValueError(f"{len(chunks)} chunks but {len(embeddings)} embeddings")
+    dims = {len(e) for e in embeddings}
+    if len(dims) > 1:
+        raise ValueError(f"Embeddings of mixed dimensions: {sorted(dims)}")
+    dim = dims.pop() if dims else 0
+    npy, meta_path = _sidecars(Path(json_path))
+    _write_npy(npy, [_normalized(e) for e in embeddings], dim)
+    side = {"meta": meta, "dim": dim, "count": len(chunks), "chunks": chunks}
+    meta_path.write_text(json.dumps(side, ensure_ascii=False), encoding="utf-8")
+    return npy, meta_path
+
+
+def convert_json_index(json_path: str | None = None) -> tuple[Path, Path]:
+    """
+    Convert a legacy ``policy_index.json`` into the binary matrix + metadata sidecar beside it.
+    An index without ``built_at``/``chunks`` in its meta is stamped first (and rewritten, meta
+    leading), since sidecars are only loaded for the build they match.
+    """
+    p = resolve_index_path(json_path)
+    if not p.exists():
+        raise FileNotFoundError(f"Policy index not found at {p}")
+    data = json.loads(p.read_text(encoding="utf-8"))
+    chunks, embeddings = [], []
+    for c in data.get("chunks", []):
+        if "embedding" not in c:
+            continue
+        chunks.append({k: v for k, v in c.items() if k != "embedding"})
+        embeddings.append(c["embedding"])
+    meta = data.get("meta") or {}
+    if not meta.get("built_at") or "chunks" not in meta:
+        meta = dict(meta, built_at=meta.get("built_at") or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    chunks=meta.get("chunks", len(data.get("chunks", []))))
+        data = dict({"meta": meta}, **{k: v for k, v in data.items() if k != "meta"})
+        p.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return write_binary_index(p, meta, chunks, embeddings)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Policy index tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="convert policy_index.json to the binary format")
+    conv.add_argument("json_path", nargs="?", default=None)
+    args = ap.parse_args()
+    if args.cmd == "convert":
+        npy, meta_path = convert_json_index(args.json_path)
+        print(f"wrote {npy} and {meta_path}")
@@ -0,0 +1,165 @@
+"""Build the policy embedding index from policy documents.
+
+Documents are chunked with the same parsers as assessment uploads
+(``parsing.ingest_files``). Every chunk is keyed by a content hash of
+(embedding model, text); hashes that already have an embedding in the current
+index are reused, and only new or edited chunks are sent to
+``embeddings.create``, in large batches. Chunks are tagged against the maturity
+model (``tagger``) so retrieval can narrow each category's search to its chunks.
+
+CLI (writes ``assets/policy_index.json`` plus the binary sidecars)::
+
+    python -m src.app.services.policy_indexer build handbook.pdf retention.docx [--merge]
+"""
+from __future__ import annotations
+import hashlib, json, os, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..services.maturity import load_compiled_model
+from ..services.parsing import ingest_files
+from ..services.policy_adjudicator import EMBED_MODEL, client
+from ..services.policy_index import (
+    MIRROR_DIR, POLICY_INDEX_PREFIX, index_files, load_policy_index, publish_policy_index,
+    resolve_index_path, write_binary_index,
+)
+
+# OpenAI accepts up to 2048 inputs and ~300k tokens per embeddings request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "1024"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(f"{EMBED_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _known_embeddings(index_path: str | Path) -> tuple[Dict[str, List[float]], List[Dict[str, Any]]]:
+    """hash -> embedding for everything in the current index (plus its chunks, for merging)."""
+    try:
+        idx = load_policy_index(str(index_path), reload=True)
+    except FileNotFoundError:
+        return {}, []
+    if (idx.meta.get("model") or EMBED_MODEL) != EMBED_MODEL:
+        return {}, []  # different embedding space: nothing is reusable
+    known: Dict[str, List[float]] = {}
+    chunks = []
+    for i, c in enumerate(idx.chunks):
+        h = c.get("hash") or _content_hash(c.get("text") or "")  # legacy indexes carry no hash
+        known[h] = [float(x) for x in idx.matrix[i]]
+        chunks.append(dict(c, hash=h))
+    return known, chunks
+
+
+def _embed_batches(texts: List[str], tokens: List[int]) -> List[List[float]]:
+    """Embed ``texts`` in as few requests as the per-request input/token limits allow."""
+    out: List[List[float]] = []
+    batch: List[str] = []
+    batch_tokens = 0
+
+    def flush():
+        try:
+            resp = client.embeddings.create(model=EMBED_MODEL, input=batch)
+        except Exception as e:
+            raise RuntimeError(f"Policy embedding generation failed: {e}")
+        out.extend(d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+        print(f"Embedded batch of {len(batch)} policy chunks")
+
+    for text, tok in zip(texts, tokens):
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or batch_tokens + tok > EMBED_BATCH_TOKENS):
+            flush()
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tok
+    if batch:
+        flush()
+    return out
+
+
+def build_policy_index(files: List[Dict], index_path: Optional[str] = None, merge: bool = False,
+                       publish: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Chunk and embed ``files`` ([{"filename", "path" or "data"}]) into the policy index and return its meta.
+
+    ``merge`` keeps previously indexed chunks from files not in this build.
+    ``publish`` (default: ``POLICY_INDEX_PREFIX`` is set) uploads the result to S3.
+    """
+    publish = bool(POLICY_INDEX_PREFIX) if publish is None else publish
+    target = resolve_index_path(index_path)
+    if publish:
+        MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+        target = MIRROR_DIR / target.name
+    else:
+        # fail before any embedding work: the packaged assets/ directory is read-only in the Lambda
+        parent = next((d for d in [target.parent, *target.parent.parents] if d.exists()), target.parent)
+        if not os.access(parent, os.W_OK):
+            raise ValueError(f"Cannot write the policy index to {target} (read-only); "
+                             "set POLICY_INDEX_PREFIX to build and publish it to S3")
+
+    entries = []
+    for ch in ingest_files(files):
+        src = ch.get("source") or {}
+        entries.append({
+            "id": ch["id"],
+            "file": src.get("file"),
+            "locator": src.get("locator"),
+            "text": ch["text"],
+            "tokens": ch.get("tokens", 1),
+            "hash": _content_hash(ch["text"]),
+        })
+    if not entries:
+        raise ValueError("No policy text could be extracted from the uploaded files")
+
+    known, previous = _known_embeddings(target)
+    if merge:
+        rebuilt = {e["file"] for e in entries}
+        entries = [c for c in previous if c.get("file") not in rebuilt and c.get("hash") in known] + entries
+
+    missing: Dict[str, Dict[str, Any]] = {}
+    for e in entries:
+        if e["hash"] not in known and e["hash"] not in missing:
+            missing[e["hash"]] = e
+    vectors = _embed_batches([e["text"] for e in missing.values()], [e["tokens"] for e in missing.values()])
+    known.update(zip(missing.keys(), vectors))
+    embeddings = [known[e["hash"]] for e in entries]
+    tagger = load_compiled_model().tagger
+    for e in entries:  # merged entries too, in case the model changed
+        e["tags"] = tagger.tags_for(e["text"])
+
+    meta = {
+        "engine": "openai",
+        "model": EMBED_MODEL,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": sorted({e["file"] for e in entries}),
+        "chunks": len(entries),
+        "embedded": len(missing),
+        "reused": len(entries) - len(missing),
+        "tag_key": tagger.key,
+    }
+    target.parent.mkdir(parents=True, exist_ok=True)
+    for p in index_files(target)[1:]:  # never leave the previous build's sidecars beside the new JSON
+        p.unlink(missing_ok=True)
+    doc = {"meta": meta, "chunks": [dict(e, embedding=v) for e, v in zip(entries, embeddings)]}
+    target.write_text(json.dumps(doc, ensure_ascii=False), encoding="utf-8")
+    write_binary_index(target, meta, entries, embeddings)
+    if publish:
+        meta["published"] = publish_policy_index(target)
+    load_policy_index(str(target), reload=True)
+    print(f"Policy index: {meta['chunks']} chunks, {meta['embedded']} embedded, {meta['reused']} reused")
+    return meta
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Build the policy embedding index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="chunk + embed policy documents")
+    build.add_argument("files", nargs="+")
+    build.add_argument("--index", default=None, help="index JSON path (default assets/policy_index.json)")
+    build.add_argument("--merge", action="store_true", help="keep chunks from files not being rebuilt")
+    build.add_argument("--publish", action="store_true", help="upload to POLICY_INDEX_PREFIX")
+    args = ap.parse_args()
+    if args.cmd == "build":
+        files = [{"filename": Path(f).name, "path": str(Path(f).resolve())} for f in args.files]
+        print(json.dumps(build_policy_index(files, index_path=args.index, merge=args.merge,
+                                            publish=args.publish or None), indent=2))
@@ -109,7 +109,8 @@ Return only the JSON response."""
     ]
 
 
-def generate_recommendations(synthesis, current_state, max_recommendations: int = 5) -> Path:
+def generate_recommendations(synthesis, current_state, max_recommendations: int = 5,
+                             tenant: Optional[str] = None) -> Path:
     """
     Generate actionable recommendations based on current state and synthesis data.
     Uses LLM to generate recommendations.
@@ -120,7 +121,7 @@ def generate_recommendations(synthesis, current_state, max_recommendations: int
 
     # Load maturity model for context
     try:
-        model, raw_model = load_maturity_model()
+        model, raw_model = load_maturity_model(tenant=tenant)
         maturity_defs = raw_model
     except Exception:
         maturity_defs = {"categories": []}
@@ -129,6 +130,7 @@ def generate_recommendations(synthesis, current_state, max_recommendations: int
     try:
         messages = _build_analysis_prompt(current_state, synthesis, maturity_defs)
 
+        # not cached (services.llm_cache): at temperature 0.3 the output is meant to vary between runs
         resp = client.chat.completions.create(
             model=MODEL,
             messages=messages,
@@ -0,0 +1,127 @@
+"""Local (no API) relevance ranking of chunks for the extraction budget.
+
+Every chunk is scored on three signals, each normalized to the best chunk of the job:
+
+- keywords: maturity-model criteria whose keywords the chunk contains (its criterion
+  tags, set at ingest by ``tagger``);
+- descriptors: IDF-weighted overlap with the vocabulary of the level descriptors;
+- density: share of distinct content words, saturating with length, so titles,
+  tables of contents and repeated lists rank below substantive prose.
+
+``select`` spends the budget (chunks and/or tokens) on the highest-scoring
+chunks across all files and returns them in corpus order.
+"""
+from __future__ import annotations
+import math, os, re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from ..schemas.maturity import MaturityModel
+from .tagger import criterion_tags, tagger_for
+
+EXTRACT_MAX_CHUNKS = int(os.getenv("EXTRACT_MAX_CHUNKS", "50"))
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "0"))  # 0 = limit by chunk count only
+# signal weights: keywords, descriptors, density
+RELEVANCE_WEIGHTS = tuple(float(w) for w in os.getenv("RELEVANCE_WEIGHTS", "0.45,0.35,0.2").split(","))
+
+_WORD = re.compile(r"[a-z][a-z\-']{2,}")
+_STOP = set("""
+the and for with that this from are was were have has had not but all any can our your their its
+into onto over under than then them they there these those which while who whom what when where
+will would should could been being about across after before also each more most other some such
+only very just level levels use used using per via
+""".split())
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+class RelevanceRanker:
+    """Scores chunks against one maturity model; ``observe`` every (tagged) candidate, then ``select``."""
+
+    def __init__(self, model: MaturityModel):
+        vocab: Set[str] = set()
+        for cat in model.categories:
+            vocab.update(_words(cat.name))
+            for cr in cat.criteria:
+                vocab.update(_words(cr.label))
+                for desc in cr.levels.values():
+                    vocab.update(_words(desc))
+        self.vocab = vocab - _STOP
+        self._df: Counter = Counter()
+        self._rows: List[Dict] = []
+
+    def observe(self, chunk: Dict) -> None:
+        """Record the features of a candidate chunk (the text itself is not kept)."""
+        text = (chunk.get("text") or "").lower()
+        words = _words(text)
+        content = [w for w in words if w not in _STOP]
+        terms = self.vocab.intersection(content)
+        self._df.update(terms)
+        self._rows.append({
+            "id": chunk.get("id"),
+            "file": (chunk.get("source") or {}).get("file"),
+            "tokens": int(chunk.get("tokens") or max(1, len(text) // 4)),
+            "keywords": len(criterion_tags(chunk.get("tags") or [])),
+            "terms": terms,
+            "density": (len(set(content)) / len(content)) * min(1.0, len(content) / 80) if content else 0.0,
+        })
+
+    def ranked(self) -> List[Dict]:
+        """Observed chunks with their signals and score, best first (ties keep corpus order)."""
+        n = max(1, len(self._rows))
+        idf = {t: math.log(1 + n / df) for t, df in self._df.items()}
+        desc = [sum(idf[t] for t in r["terms"]) for r in self._rows]
+        top_kw = max((r["keywords"] for r in self._rows), default=0) or 1
+        top_desc = max(desc, default=0.0) or 1.0
+        top_density = max((r["density"] for r in self._rows), default=0.0) or 1.0
+        w_kw, w_desc, w_density = RELEVANCE_WEIGHTS
+        out = []
+        for pos, (r, d) in enumerate(zip(self._rows, desc)):
+            signals = {
+                "keywords": round(r["keywords"] / top_kw, 4),
+                "descriptors": round(d / top_desc, 4),
+                "density": round(r["density"] / top_density, 4),
+            }
+            score = w_kw * signals["keywords"] + w_desc * signals["descriptors"] + w_density * signals["density"]
+            out.append({"id": r["id"], "file": r["file"], "tokens": r["tokens"], "position": pos,
+                        "score": round(score, 4), "signals": signals})
+        out.sort(key=lambda x: (-x["score"], x["position"]))
+        return out
+
+    def select(self, max_chunks: Optional[int] = None, token_budget: Optional[int] = None) -> Dict:
+        """
+        Spend the budget on the best chunks. Returns ``{"selected": [ids in corpus order],
+        "budget", "candidates", "ranking": [...]}`` (the ranking is what the job artifacts log).
+        """
+        max_chunks = EXTRACT_MAX_CHUNKS if max_chunks is None else max_chunks
+        token_budget = EXTRACT_TOKEN_BUDGET if token_budget is None else token_budget
+        ranking = self.ranked()
+        chosen, used = [], 0
+        for r in ranking:
+            if max_chunks and len(chosen) >= max_chunks:
+                break
+            if token_budget and used + r["tokens"] > token_budget:
+                continue  # a smaller chunk further down may still fit
+            chosen.append(r)
+            used += r["tokens"]
+        picked = {r["position"] for r in chosen}
+        for r in ranking:
+            r["selected"] = r["position"] in picked
+        return {
+            "selected": [r["id"] for r in sorted(chosen, key=lambda r: r["position"])],
+            "budget": {"max_chunks": max_chunks, "token_budget": token_budget, "tokens_used": used},
+            "candidates": len(ranking),
+            "ranking": ranking,
+        }
+
+
+def select_chunks(chunks: Iterable[Dict], model: MaturityModel, max_chunks: Optional[int] = None,
+                  token_budget: Optional[int] = None) -> Dict:
+    """One-shot ``RelevanceRanker`` over an in-memory list of chunks (tagged here)."""
+    ranker = RelevanceRanker(model)
+    tagger = tagger_for(model)
+    for ch in chunks:
+        ranker.observe(tagger.tag(ch))
+    return ranker.select(max_chunks=max_chunks, token_budget=token_budget)
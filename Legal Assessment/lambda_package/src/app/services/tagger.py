@@ -0,0 +1,99 @@
+"""Ingest-time tagging of chunks against the maturity model.
+
+A ``Tagger`` holds one multi-pattern automaton over every criterion keyword of the
+model. ``tag`` scans a chunk's text once (case-insensitive substring matches within
+the first ``TEXT_LIMIT`` characters, as the baseline's keyword filters always used)
+and records in ``chunk["tags"]`` the
+categories (``"<category id>"``) and criteria (``"<category id>/<criterion id>"``)
+whose keywords it contains. Baseline scoring, extraction selection, the chunk
+artifact's category shards and policy retrieval read the tags instead of rescanning
+the text for every category and criterion.
+
+The automaton is ``pyahocorasick`` when installed; otherwise each distinct keyword
+is tested once per chunk, which finds the same matches (a regular-expression
+alternation is several times slower than either in CPython).
+"""
+from __future__ import annotations
+import hashlib, json, threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set
+
+try:  # optional: a C Aho-Corasick automaton; without it the substring tests below are used
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from ..schemas.maturity import MaturityModel
+
+TEXT_LIMIT = 4000  # characters of a chunk the baseline reads; keywords further on do not tag it
+
+
+def criterion_tag(category_id: str, criterion_id: str) -> str:
+    return f"{category_id}/{criterion_id}"
+
+
+def category_tags(tags: Iterable[str]) -> List[str]:
+    return [t for t in tags if "/" not in t]
+
+
+def criterion_tags(tags: Iterable[str]) -> List[str]:
+    return [t for t in tags if "/" in t]
+
+
+class Tagger:
+    """Keyword automaton for one maturity model; ``key`` changes whenever the tags it assigns could."""
+
+    def __init__(self, model: MaturityModel):
+        owners: Dict[str, Set[str]] = {}  # lowered keyword -> tags it implies
+        for cat in model.categories:
+            for cr in cat.criteria:
+                for k in cr.keywords:
+                    if k and k.strip():
+                        owners.setdefault(k.lower(), set()).update((cat.id, criterion_tag(cat.id, cr.id)))
+        self.owners = {k: sorted(v) for k, v in sorted(owners.items())}
+        self.key = hashlib.sha256(json.dumps([TEXT_LIMIT, self.owners]).encode("utf-8")).hexdigest()
+        self._automaton = None
+        if ahocorasick is not None and self.owners:
+            self._automaton = ahocorasick.Automaton()
+            for k in self.owners:
+                self._automaton.add_word(k, k)
+            self._automaton.make_automaton()
+
+    def keywords(self, text: str) -> Set[str]:
+        """Distinct keywords occurring in ``text``."""
+        low = (text or "").lower()
+        if self._automaton is not None:
+            return {k for _, k in self._automaton.iter(low)}
+        return {k for k in self.owners if k in low}
+
+    def tags_for(self, text: str) -> List[str]:
+        """Category and criterion tags for the first ``TEXT_LIMIT`` characters of ``text``."""
+        tags: Set[str] = set()
+        for k in self.keywords((text or "")[:TEXT_LIMIT]):
+            tags.update(self.owners[k])
+        return sorted(tags)
+
+    def tag(self, chunk: Dict) -> Dict:
+        """Set ``chunk["tags"]`` (in place) and return the chunk."""
+        chunk["tags"] = self.tags_for(chunk.get("text") or "")
+        return chunk
+
+    def tag_all(self, chunks: Iterable[Dict]) -> List[Dict]:
+        return [self.tag(ch) for ch in chunks]
+
+
+_TAGGER_ENTRIES = 16  # taggers kept per process, least recently used evicted first
+_TAGGERS: "OrderedDict[int, tuple]" = OrderedDict()  # id(model) -> (model, Tagger)
+_lock = threading.Lock()
+
+
+def tagger_for(model: MaturityModel) -> Tagger:
+    """The ``Tagger`` for ``model``, built once per loaded model object (while it stays cached)."""
+    with _lock:
+        hit = _TAGGERS.get(id(model))
+        if hit is None or hit[0] is not model:
+            hit = _TAGGERS[id(model)] = (model, Tagger(model))
+        _TAGGERS.move_to_end(id(model))
+        while len(_TAGGERS) > _TAGGER_ENTRIES:
+            _TAGGERS.popitem(last=False)
+        return hit[1]
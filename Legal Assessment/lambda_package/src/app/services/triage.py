@@ -0,0 +1,74 @@
+"""Local first tier of the extraction cascade.
+
+Tables of contents, signature pages and agendas come back from extraction as
+all-empty arrays but cost a full round trip each. ``classify`` scores a chunk
+in [0, 1] from cue words for the five extraction kinds (pain points, tools,
+processes, metrics, opportunities), discounted by the share of its lines that
+look like TOC entries, signature blocks or agenda items:
+
+- below ``TRIAGE_SKIP_BELOW``: skipped, recorded as an empty extraction;
+- at or above ``TRIAGE_EXTRACT_ABOVE``: sent straight to full extraction;
+- in between: decided by the cheap yes/no gate in ``llm`` (second tier).
+
+``EXTRACT_TRIAGE=0`` sends every chunk to full extraction.
+"""
+from __future__ import annotations
+import os, re
+from typing import Dict, List
+
+EXTRACT_TRIAGE = os.getenv("EXTRACT_TRIAGE", "1") == "1"
+TRIAGE_SKIP_BELOW = float(os.getenv("TRIAGE_SKIP_BELOW", "0.15"))
+TRIAGE_EXTRACT_ABOVE = float(os.getenv("TRIAGE_EXTRACT_ABOVE", "0.6"))
+
+_CUES = {
+    "pain_points": r"manual(?:ly)?|slow|delays?|backlogs?|bottlenecks?|inefficien\w*|difficult\w*|challeng\w*|"
+                   r"issues?|problems?|lacks?|lacking|no visibility|inconsisten\w*|errors?|frustrat\w*|"
+                   r"time[- ]consuming|burden\w*|overload\w*|duplicat\w*|spreadsheets?|emails?|risks?",
+    "current_tools": r"software|systems?|platforms?|tools?|portals?|databases?|excel|sharepoint|salesforce|"
+                     r"docusign|ironclad|outlook|teams|slack|jira|servicenow|clm|e-?billing|workday|"
+                     r"matter management|icertis|netdocuments|imanage|relativity|adobe sign",
+    "processes": r"process\w*|workflows?|steps?|reviews?|approv\w*|intake|requests?|rout\w*|escalat\w*|"
+                 r"sign-?off|negotiat\w*|draft\w*|triag\w*|hand-?offs?|assign\w*|submit\w*",
+    "metrics": r"\d+(?:\.\d+)?\s?(?:%|percent|days?|hours?|weeks?|months?|contracts|matters|requests|fte)\b|"
+               r"\$\s?\d|average|turnaround|volumes?|cycle time|kpis?|per (?:day|week|month|quarter|year)",
+    "opportunities": r"automat\w*|improv\w*|streamlin\w*|standardi[sz]\w*|centrali[sz]\w*|implement\w*|"
+                     r"opportunit\w*|could|should|recommend\w*|self-service|templates?",
+}
+_CUE_RES = {k: re.compile(rf"\b(?:{v})", re.I) for k, v in _CUES.items()}
+
+# lines that carry no extractable content
+_STRUCTURAL = re.compile(
+    r"^(?:.{0,100}?(?:\.{3,}|\s{2,}|\t)\s*\d{1,4}"                      # TOC entry: leader + page number
+    r"|(?:signature|signed|by|name|title|date|witness|print name)\s*[:_].*"  # signature block
+    r"|(?:\d{1,2}[:.]\d{2}\s*(?:am|pm)?\s*[-–]).*"                  # agenda time slot
+    r"|(?:agenda|table of contents|contents|in witness whereof)\b.*)$",
+    re.I)
+
+
+def cues(text: str) -> Dict[str, int]:
+    """Cue matches per extraction kind."""
+    return {k: len(rx.findall(text or "")) for k, rx in _CUE_RES.items()}
+
+
+def classify(chunk: Dict) -> float:
+    """Likelihood-like score in [0, 1] that ``chunk`` yields any extraction items."""
+    text = chunk.get("text") or ""
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if not lines:
+        return 0.0
+    hits = cues(text)
+    kinds = sum(1 for n in hits.values() if n)
+    score = min(1.0, 0.2 * kinds + 0.05 * min(sum(hits.values()), 6))
+    structural = sum(1 for l in lines if _STRUCTURAL.match(l)) / len(lines)
+    return round(score * (1.0 - structural), 4)
+
+
+def route(chunks: List[Dict], skip_below: float | None = None, extract_above: float | None = None) -> List[str]:
+    """Per chunk: "skip", "extract" or "gate" (ask the cheap model)."""
+    skip_below = TRIAGE_SKIP_BELOW if skip_below is None else skip_below
+    extract_above = TRIAGE_EXTRACT_ABOVE if extract_above is None else extract_above
+    out = []
+    for ch in chunks:
+        s = classify(ch)
+        out.append("skip" if s < skip_below else "extract" if s >= extract_above else "gate")
+    return out
@@ -0,0 +1,116 @@
+"""Compact wire format for extraction replies.
+
+The verbose format repeats keys such as ``"impact_hint"`` for every item, and output
+tokens dominate extraction latency. The compact format is enforced with a strict JSON
+schema: one short key per kind, each item a positional tuple carrying every
+``ExtractionResult`` field (list fields as arrays of strings, the rest as strings), and
+hints as one-letter codes (``l``/``m``/``h``)::
+
+    p  pain points     [text, category, impact, effort, evidence]
+    t  current tools   [name, purpose, adoption_level, [issues]]
+    s  process steps   [process_name, step, [owners], [systems], slas, [risks]]
+    m  metrics         [name, value, timeframe, owner]
+    o  opportunities   [area, description, impact, effort, [dependencies]]
+
+Packed replies wrap one such object per chunk: ``{"r": [{"c": "<chunk id>", "p": [...], ...}]}``.
+Structured outputs cannot constrain tuple positions, so the enums are enforced by
+``expand``, which maps every reply back to the verbose ``ExtractionResult`` keys
+(unknown hints fall back to ``med``, unknown adoption levels and empty optional fields
+become null, list fields become lists).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List
+
+# kind -> (short key, tuple fields)
+LAYOUT = {
+    "pain_points": ("p", ("text", "category", "impact_hint", "effort_hint", "evidence")),
+    "current_tools": ("t", ("name", "purpose", "adoption_level", "issues")),
+    "processes": ("s", ("process_name", "step", "owners", "systems", "slas", "risks")),
+    "metrics": ("m", ("name", "value", "timeframe", "owner")),
+    "opportunities": ("o", ("area", "description", "impact_hint", "effort_hint", "dependencies")),
+}
+_HINTS = {"l": "low", "m": "med", "h": "high"}
+_CODES = {v: k for k, v in _HINTS.items()}
+_ADOPTION = {"pilot", "partial", "full"}
+_REQUIRED = {"text", "name", "process_name", "step", "area", "description"}
+_LISTS = {"issues", "owners", "systems", "risks", "dependencies"}
+
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+_TUPLES = {"type": "array", "items": {"type": "array", "items": {"anyOf": [{"type": "string"}, _STRINGS]}}}
+_RESULT = {
+    "type": "object",
+    "properties": {short: _TUPLES for short, _ in LAYOUT.values()},
+    "required": [short for short, _ in LAYOUT.values()],
+    "additionalProperties": False,
+}
+_PACKED = {
+    "type": "object",
+    "properties": {"r": {"type": "array", "items": {
+        "type": "object",
+        "properties": dict(c={"type": "string"}, **_RESULT["properties"]),
+        "required": ["c"] + _RESULT["required"],
+        "additionalProperties": False,
+    }}},
+    "required": ["r"],
+    "additionalProperties": False,
+}
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "extraction_compact", "strict": True, "schema": _RESULT}}
+PACKED_RESPONSE_FORMAT = {"type": "json_schema",
+                          "json_schema": {"name": "extraction_compact_packed", "strict": True, "schema": _PACKED}}
+
+INSTRUCTIONS = (
+    "Reply in the compact format: keys p (pain points: [text, category, impact, effort, evidence]), "
+    "t (tools: [name, purpose, adoption_level, [issues]]), "
+    "s (process steps: [process_name, step, [owners], [systems], slas, [risks]]), "
+    "m (metrics: [name, value, timeframe, owner]), "
+    "o (opportunities: [area, description, impact, effort, [dependencies]]). Impact and effort are l, m or h; "
+    "adoption_level is pilot, partial or full; bracketed fields are arrays of strings. "
+    'Use "" for unknown values, [] for empty arrays and [] when a kind is absent.'
+)
+
+
+def _field(name: str, value: Any) -> Any:
+    if name in _LISTS:
+        values = value if isinstance(value, list) else [value]
+        return [v for v in (_field("", v) for v in values) if v]
+    if isinstance(value, list):
+        value = "; ".join(str(v) for v in value if v)
+    s = value.strip() if isinstance(value, str) else ("" if value is None else str(value))
+    if name.endswith("_hint"):
+        return _HINTS.get(s[:1].lower(), "med")
+    if name == "adoption_level":
+        return s.lower() if s.lower() in _ADOPTION else None
+    return s or None
+
+
+def expand(data: Any) -> Dict[str, List[Dict]]:
+    """Verbose per-kind item dicts from one compact object (items missing a required field are dropped)."""
+    data = data if isinstance(data, dict) else {}
+    out: Dict[str, List[Dict]] = {}
+    for kind, (short, fields) in LAYOUT.items():
+        items = []
+        for row in data.get(short) or []:
+            if not isinstance(row, list):
+                continue
+            row = list(row) + [None] * (len(fields) - len(row))
+            item = {f: _field(f, v) for f, v in zip(fields, row)}
+            if all(item.get(f) for f in fields if f in _REQUIRED):
+                items.append({f: v for f, v in item.items() if v is not None})
+        out[kind] = items
+    return out
+
+
+def expand_packed(data: Any) -> Dict[str, Dict[str, List[Dict]]]:
+    """Chunk id -> verbose result, from a compact packed reply."""
+    results = data.get("r") if isinstance(data, dict) else None
+    return {r.get("c"): expand(r) for r in (results or []) if isinstance(r, dict)}
+
+
+def encode(result: Dict[str, Any]) -> Dict[str, List[List[str]]]:
+    """Compact object for a verbose result (the inverse of ``expand``; used by the stand-in and benchmark)."""
+    out = {}
+    for kind, (short, fields) in LAYOUT.items():
+        out[short] = [[_CODES.get(it.get(f), "m") if f.endswith("_hint")
+                       else list(it.get(f) or []) if f in _LISTS else (it.get(f) or "") for f in fields]
+                      for it in result.get(kind) or []]
+    return out
@@ -4,7 +4,7 @@ import os
 # Add lib folder to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
 
-from src.app import app, process, process2, process3
+from src.app import app, process, process2, process3, process_policy_index
 import serverless_wsgi as serverless_wsgi
 
 def handler(event, context):
@@ -16,11 +16,13 @@ def handler(event, context):
         
         # Process the long-running task
         if task_type == 'file_processing':
-            process(data)
+            process(data, context)
         elif task_type == 'score_baseline':
             process2(data)
         elif task_type == 'policy':
             process3(data)
+        elif task_type == 'policy_index':
+            process_policy_index(data)
         # Add more task types as needed
         
         return {'status': 200, 'body': 'Worker completed'}
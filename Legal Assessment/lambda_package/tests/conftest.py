@@ -0,0 +1,17 @@
+"""Offline test setup: import the app without OpenAI, MySQL or S3 (as the benchmarks do).
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "offline-tests")
+os.environ.setdefault("LOCAL_SQLITE", "1")
+os.environ.setdefault("ADMIN_USER", "tests@example.com")
+os.environ.setdefault("ADMIN_PASS", "offline-tests")
+os.environ["ARTIFACT_STORE"] = "memory"
+os.environ["LLM_CACHE_BACKEND"] = "none"
+os.environ["PARSE_CACHE_BACKEND"] = "none"
+os.environ.pop("POLICY_TAG_FILTER", None)
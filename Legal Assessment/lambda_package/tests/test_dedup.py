@@ -0,0 +1,69 @@
+import random
+
+from src.app.services import dedup
+
+
+def _counting_jaccard(monkeypatch):
+    calls = []
+    jaccard = dedup._jaccard
+
+    def counted(a, b):
+        calls.append(1)
+        return jaccard(a, b)
+    monkeypatch.setattr(dedup, "_jaccard", counted)
+    return calls
+
+
+def test_short_distinct_chunks_are_not_all_candidates(monkeypatch):
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(5000)]
+    chunks = [{"text": " ".join(rng.sample(words, 4))} for _ in range(2000)]
+    calls = _counting_jaccard(monkeypatch)
+
+    clusters = dedup.cluster_near_duplicates(chunks, threshold=0.9)
+
+    assert clusters == [[i] for i in range(len(chunks))]
+    # without densification every pair shared the all-empty bands: ~2M exact checks
+    assert len(calls) < len(chunks)
+
+
+def test_signatures_have_no_empty_bins():
+    sig = dedup._signature(dedup._shingles("Yes", dedup.DEDUP_SHINGLE))
+    assert dedup._EMPTY not in sig
+
+
+def test_near_duplicates_still_cluster():
+    rng = random.Random(1)
+    words = [f"w{i}" for i in range(5000)]
+    short = [" ".join(rng.sample(words, 4)) for _ in range(50)]
+    long = [rng.choices(words, k=300) for _ in range(20)]
+    edited = [" ".join(w[:5] + ["changed"] + w[6:]) for w in long]
+    chunks = [{"text": t} for t in short + short + [" ".join(w) for w in long] + edited]
+
+    clusters = dedup.cluster_near_duplicates(chunks, threshold=0.9)
+
+    assert [c for c in clusters if len(c) > 1] == (
+        [[i, i + 50] for i in range(50)] + [[100 + i, 120 + i] for i in range(20)])
+
+
+def test_incremental_clusters_match_batch():
+    rng = random.Random(2)
+    words = [f"w{i}" for i in range(500)]
+    base = [rng.choices(words, k=60) for _ in range(30)]
+    chunks = [{"text": " ".join(rng.choice(base))} for _ in range(120)]
+
+    dupes = dedup.NearDuplicates(threshold=0.9)
+    reps = [dupes.add(ch) for ch in chunks]
+
+    assert dupes.clusters == dedup.cluster_near_duplicates(chunks, threshold=0.9)
+    assert all(i in dupes.clusters[[c[0] for c in dupes.clusters].index(r)] for i, r in enumerate(reps))
+
+
+def test_duplicates_do_not_spend_the_selection():
+    chunks = [{"id": f"c{i}", "text": t} for i, t in enumerate(["alpha beta gamma delta"] * 3 + ["epsilon zeta eta"])]
+    clusters = dedup.cluster_near_duplicates(chunks)
+    ids = [ch["id"] for ch in chunks]
+
+    # the ranker only ever sees c0 and c3; picking both extracts two clusters covering all four chunks
+    assert dedup.select_clusters(clusters, ids, ["c0", "c3"]) == [["c0", "c1", "c2"], ["c3"]]
+    assert dedup.select_clusters(clusters, ids, ["c3"]) == [["c3"]]
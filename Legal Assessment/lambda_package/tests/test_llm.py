@@ -0,0 +1,47 @@
+from src.app.services import llm
+from src.app.services.llm_standin import StandInAsyncClient
+
+CHUNKS = [{"id": f"memo.docx::doc::{i}", "text": f"Contract intake step {i}", "tokens": 6,
+           "source": {"file": "memo.docx", "locator": f"sec{i}"}} for i in range(1, 5)]
+
+
+def test_batches_share_one_rate_window(monkeypatch):
+    pacer = llm._RatePacer(rpm=1000)
+    monkeypatch.setattr(llm, "_PACER", pacer)
+
+    for batch in (CHUNKS[:2], CHUNKS[2:]):  # separate calls, as checkpointed batches run
+        llm.extract_each(batch, aclient=StandInAsyncClient(latency=0), triage=False)
+
+    assert len(pacer._window) == len(CHUNKS)
+
+
+def test_pacer_waits_across_event_loops(monkeypatch):
+    pacer = llm._RatePacer(rpm=2)
+    now = [1000.0]
+    monkeypatch.setattr(llm.time, "monotonic", lambda: now[0])
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(llm.asyncio, "sleep", sleep)
+
+    for _ in range(3):
+        llm.asyncio.run(pacer.acquire(10))
+
+    assert slept == [60.0]
+
+
+def test_batches_reuse_one_async_client(monkeypatch):
+    made = []
+
+    def factory(**kwargs):
+        made.append(StandInAsyncClient(latency=0))
+        return made[-1]
+    monkeypatch.setattr(llm, "AsyncOpenAI", factory)
+    monkeypatch.setattr(llm, "_aclient", None)
+
+    for batch in (CHUNKS[:2], CHUNKS[2:]):
+        llm.extract_each(batch, concurrency=4, triage=False)
+
+    assert len(made) == 1 and made[0].calls == len(CHUNKS)
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from src.app.services.llm_cache import LLMCache, _SQLiteBackend
+
+MESSAGES = [{"role": "user", "content": "Summarize the intake process."}]
+
+
+class _Client:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **request):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"reply {self.calls}"))])
+
+
+def _cache(tmp_path):
+    return LLMCache(_SQLiteBackend(str(tmp_path / "cache.sqlite"), 100))
+
+
+def test_deterministic_requests_are_cached(tmp_path):
+    cache, client = _cache(tmp_path), _Client()
+
+    first = cache.chat(client, "s", model="m", messages=MESSAGES, temperature=0)
+    second = cache.chat(client, "s", model="m", messages=MESSAGES, temperature=0)
+
+    assert (first, second, client.calls) == ("reply 1", "reply 1", 1)
+
+
+def test_non_zero_temperature_bypasses_the_cache(tmp_path):
+    cache, client = _cache(tmp_path), _Client()
+
+    replies = [cache.chat(client, "s", model="m", messages=MESSAGES, temperature=0.3) for _ in range(2)]
+
+    assert replies == ["reply 1", "reply 2"]
+    assert cache.lookup("s", model="m", messages=MESSAGES, temperature=0.3) == (None, None)
+
+
+def test_every_request_argument_is_part_of_the_key(tmp_path):
+    cache, client = _cache(tmp_path), _Client()
+
+    short = cache.chat(client, "s", model="m", messages=MESSAGES, temperature=0, max_tokens=1)
+    longer = cache.chat(client, "s", model="m", messages=MESSAGES, temperature=0, max_tokens=400)
+
+    assert (short, longer, client.calls) == ("reply 1", "reply 2", 2)
@@ -0,0 +1,39 @@
+import pytest
+
+from src.app.services.artifacts import open_store
+from src.app.services.manifest import JobManifest, rerun_event, sha256_bytes
+
+FILES = [{"filename": "a.txt", "key": "acme/a.txt"}]
+
+
+def _complete_first_stage(store, manifest, body=b"intake notes"):
+    store.put("acme/a.txt", body)
+    with manifest.stage("file_processing") as run:
+        run.inputs["files"] = [dict(FILES[0], sha256=sha256_bytes(body))]
+        store.put("acme/current_state.json", b"{}")
+        run.artifact("chunks", "acme/current_state.json", sha256_bytes(b"{}"))
+
+
+def test_a_second_upload_does_not_take_over_the_running_job():
+    store = open_store("memory://")
+    first = JobManifest.create(store, "acme", FILES)
+    second = JobManifest.create(store, "acme", FILES)
+
+    with JobManifest.load(store, "acme", first.job).stage("file_processing"):
+        pass
+
+    assert JobManifest.load(store, "acme").job == second.job
+    assert JobManifest.load(store, "acme", first.job).data["stages"]["file_processing"]["status"] == "complete"
+    assert JobManifest.load(store, "acme", second.job).data["stages"]["file_processing"]["status"] == "pending"
+
+
+def test_rerun_checks_recorded_input_hashes():
+    store = open_store("memory://")
+    manifest = JobManifest.create(store, "acme", FILES)
+    _complete_first_stage(store, manifest)
+
+    assert rerun_event(manifest, "file_processing")["data"]["files"] == FILES
+
+    store.put("acme/a.txt", b"replaced by a later upload")
+    with pytest.raises(ValueError, match="acme/a.txt has changed"):
+        rerun_event(manifest, "file_processing")
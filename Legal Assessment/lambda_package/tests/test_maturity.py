@@ -0,0 +1,23 @@
+import yaml
+
+from src.app.services import maturity
+
+
+def _body(n):
+    return yaml.safe_dump({"categories": [{"id": f"cat{n}", "name": f"Category {n}", "criteria": [
+        {"id": "c", "label": "Criterion", "levels": {1: "a", 2: "b", 3: "c", 4: "d"}, "keywords": [f"kw{n}"]}]}]}
+    ).encode("utf-8")
+
+
+def test_compiled_models_are_bounded_and_recently_used_ones_stay(monkeypatch):
+    monkeypatch.setattr(maturity, "_CACHE_ENTRIES", 3)
+    monkeypatch.setattr(maturity, "_COMPILED", type(maturity._COMPILED)())
+    monkeypatch.setattr(maturity, "_BY_MODEL", type(maturity._BY_MODEL)())
+
+    first = maturity._compiled(_body(0))
+    for n in range(1, 6):
+        maturity._compiled(_body(n))
+        assert maturity._compiled(_body(0)) is first  # used by every job: never evicted
+
+    assert len(maturity._COMPILED) == 3 and len(maturity._BY_MODEL) == 3
+    assert maturity.compile_model(first.model) is first
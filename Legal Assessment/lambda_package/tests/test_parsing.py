@@ -0,0 +1,89 @@
+from io import BytesIO
+
+import fitz
+from docx import Document
+
+from src.app.services import parsing
+
+
+def _pages(lines_per_page):
+    return {i: "\n".join(lines) for i, lines in enumerate(lines_per_page)}
+
+
+def test_only_page_numbers_are_masked():
+    assert parsing._line_key("Page 3 of 40") == parsing._line_key("page 12 of 40") == "page # of #"
+    assert parsing._line_key("7 of 9") == parsing._line_key("8 of 9")
+    assert parsing._line_key("117") != parsing._line_key("21")
+    assert parsing._line_key("Revenue grew 12%") != parsing._line_key("Revenue grew 15%")
+    assert parsing._line_key("FY2023 targets") != parsing._line_key("FY2024 targets")
+
+
+def test_repeated_footer_dropped_but_short_numeric_content_kept():
+    texts = _pages([
+        ["Acme Corp | Confidential", f"Control C-{i} reviewed quarterly", f"Page {i} of 6"]
+        for i in range(1, 7)
+    ])
+    boilerplate = parsing._repeated_lines(texts, 0.5)
+
+    cleaned = [parsing._clean_text(t, boilerplate, None, i) for i, t in texts.items()]
+
+    assert cleaned == [f"Control C-{i} reviewed quarterly" for i in range(1, 7)]
+
+
+def _docx(body, footer=""):
+    doc = Document()
+    if footer:
+        doc.sections[0].footer.paragraphs[0].text = footer
+    for p in body:
+        doc.add_paragraph(p)
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _docx_text(body, footer=""):
+    return "\n\n".join(c["text"] for c in parsing._parse_docx(_docx(body, footer), "t.docx"))
+
+
+def test_docx_keeps_repeated_body_paragraphs():
+    body = ["Intro", "Yes", "Detail one", "Yes", "Detail two", "Yes"]
+    assert _docx_text(body).split("\n\n") == body
+
+
+def test_docx_repeated_footer_and_page_numbers_kept_once():
+    body = []
+    for i in range(1, 5):
+        body += [f"Section {i} text", "Acme Corp Confidential", f"Page {i}"]
+
+    paragraphs = _docx_text(body, footer="Acme Corp Confidential").split("\n\n")
+
+    assert paragraphs == ["Section 1 text", "Acme Corp Confidential", "Page 1",
+                          "Section 2 text", "Section 3 text", "Section 4 text"]
+
+
+def _pdf(lines_per_page):
+    doc = fitz.open()
+    for lines in lines_per_page:
+        page = doc.new_page()
+        for n, line in enumerate(lines):
+            page.insert_text((72, 72 + 20 * n), line)
+    return doc.tobytes()
+
+
+def test_bare_page_number_footer_dropped_but_number_only_metrics_kept():
+    pages = [[f"Matters closed in region {i}", str(117 + i), f"Open disputes in region {i}", "21", str(i + 1)]
+             for i in range(6)]
+    stats = parsing._new_stats("m.pdf")
+
+    chunks = list(parsing._parse_pdf(_pdf(pages), "m.pdf", stats))
+
+    assert [c["text"] for c in chunks] == [
+        f"Matters closed in region {i}\n{117 + i}\nOpen disputes in region {i}\n21" for i in range(6)]
+    assert stats["boilerplate_lines"] == 1
+
+
+def test_bare_numbers_off_the_page_edge_or_index_are_content():
+    texts = _pages([[f"Team {i} headcount", "12", f"Team {i} notes", str(40 + i * 2)] for i in range(6)])
+    boilerplate = parsing._repeated_lines(texts, 0.5)
+
+    assert boilerplate == set()
@@ -0,0 +1,21 @@
+from src.app.services import policy_adjudicator
+from src.app.services.policy_index import PolicyIndex
+
+CHUNKS = [{"text": f"policy {i}", "tags": ["clm"] if i % 2 else []} for i in range(12)]
+
+
+def _index(tag_key="k"):
+    return PolicyIndex({"tag_key": tag_key}, CHUNKS, [[1.0]] * len(CHUNKS), "json")
+
+
+def test_tag_filter_is_off_by_default():
+    assert policy_adjudicator.POLICY_TAG_FILTER is False
+    assert policy_adjudicator._candidate_rows(_index(), {"id": "clm"}, "k", 5) is None
+
+
+def test_tag_filter_when_enabled(monkeypatch):
+    monkeypatch.setattr(policy_adjudicator, "POLICY_TAG_FILTER", True)
+
+    assert policy_adjudicator._candidate_rows(_index(), {"id": "clm"}, "k", 5) == [1, 3, 5, 7, 9, 11]
+    assert policy_adjudicator._candidate_rows(_index(), {"id": "clm"}, "k", 7) is None  # too few tagged
+    assert policy_adjudicator._candidate_rows(_index("other"), {"id": "clm"}, "k", 5) is None  # other model
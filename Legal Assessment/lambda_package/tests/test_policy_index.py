@@ -0,0 +1,30 @@
+import json
+
+from src.app.services import policy_index
+
+CHUNKS = [{"text": f"Policy clause {i}", "file": "p.pdf", "embedding": [float(i + 1), 1.0]} for i in range(3)]
+
+
+def _write_json(path, meta):
+    path.write_text(json.dumps({"meta": meta, "chunks": CHUNKS}), encoding="utf-8")
+
+
+def test_unstamped_sidecars_are_not_taken_for_the_current_build(tmp_path):
+    p = tmp_path / "policy_index.json"
+    policy_index.write_binary_index(p, {}, [{"text": "stale"}] * 3, [[1.0, 0.0]] * 3)  # left over
+    _write_json(p, {})  # legacy index: no built_at
+
+    idx = policy_index.load_policy_index(str(p), reload=True)
+
+    assert idx.format == "json" and idx.chunks[0]["text"] == "Policy clause 0"
+
+
+def test_converted_legacy_index_loads_from_the_sidecars(tmp_path):
+    p = tmp_path / "policy_index.json"
+    _write_json(p, {"model": "text-embedding-3-small"})
+
+    policy_index.convert_json_index(str(p))
+    idx = policy_index.load_policy_index(str(p), reload=True)
+
+    assert idx.format != "json" and [c["text"] for c in idx.chunks] == [c["text"] for c in CHUNKS]
+    assert idx.meta["built_at"] == json.loads(p.read_text(encoding="utf-8"))["meta"]["built_at"]
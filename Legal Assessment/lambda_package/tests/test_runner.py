@@ -0,0 +1,26 @@
+import threading
+
+from src.app import runner
+
+
+def test_batch_ingests_on_main_thread_before_jobs_start(monkeypatch):
+    events = []
+
+    def ingest(company, store, model=None, source=None):
+        events.append(("ingest", company, threading.current_thread() is threading.main_thread()))
+        if company == "empty":
+            raise FileNotFoundError(f"No input files for {company}")
+        return [{"id": f"{company}::1"}]
+
+    def run(company, store, model=None, chunks=None, **kwargs):
+        events.append(("run", company, [ch["id"] for ch in chunks]))
+        return {"extract": 0.0}
+    monkeypatch.setattr(runner, "ingest_company", ingest)
+    monkeypatch.setattr(runner, "run_company", run)
+
+    results = runner.run_batch({"acme": None, "empty": None, "globex": None}, store=None, workers=2)
+
+    assert events[:3] == [("ingest", "acme", True), ("ingest", "empty", True), ("ingest", "globex", True)]
+    assert sorted(events[3:]) == [("run", "acme", ["acme::1"]), ("run", "globex", ["globex::1"])]
+    assert list(results) == ["acme", "empty", "globex"]
+    assert "error" in results["empty"] and set(results["acme"]["seconds"]) == {"ingest", "extract"}
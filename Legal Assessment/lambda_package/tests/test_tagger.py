@@ -0,0 +1,39 @@
+from src.app.schemas.maturity import Category, Criterion, MaturityModel
+from src.app.services.tagger import TEXT_LIMIT, Tagger
+
+MODEL = MaturityModel(categories=[Category(id="clm", name="Contract management", criteria=[
+    Criterion(id="repo", label="Repository", keywords=["repository"],
+              levels={1: "no repository", 2: "shared drive", 3: "central repository", 4: "searchable repository"}),
+    Criterion(id="sig", label="Signature", keywords=["esignature"],
+              levels={1: "wet ink", 2: "ad hoc esignature", 3: "standard esignature", 4: "integrated esignature"}),
+])])
+
+
+def test_keywords_past_the_text_limit_do_not_tag():
+    text = "Contracts live in a central Repository. " + "x" * TEXT_LIMIT + " We adopted esignature."
+    chunk = Tagger(MODEL).tag({"text": text})
+
+    assert len(text) > TEXT_LIMIT
+    assert chunk["tags"] == ["clm", "clm/repo"]
+
+
+def test_keyword_straddling_the_limit_does_not_tag():
+    text = "x" * (TEXT_LIMIT - 4) + "esignature"
+
+    assert Tagger(MODEL).tags_for(text) == []
+    assert Tagger(MODEL).tags_for(text[-TEXT_LIMIT:]) == ["clm", "clm/sig"]
+
+
+def test_taggers_are_bounded(monkeypatch):
+    from src.app.services import tagger
+
+    monkeypatch.setattr(tagger, "_TAGGER_ENTRIES", 2)
+    monkeypatch.setattr(tagger, "_TAGGERS", type(tagger._TAGGERS)())
+    models = [MODEL.copy(deep=True) for _ in range(4)]
+
+    first = tagger.tagger_for(models[0])
+    for m in models[1:]:
+        tagger.tagger_for(m)
+        assert tagger.tagger_for(models[0]) is first
+
+    assert len(tagger._TAGGERS) == 2
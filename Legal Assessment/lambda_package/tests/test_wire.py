@@ -0,0 +1,39 @@
+import pytest
+
+from src.app.services import wire
+from src.app.services.llm import extract_each, merge_extractions
+from src.app.services.llm_standin import StandInAsyncClient
+
+FULL = {
+    "pain_points": [{"text": "Manual contract intake via email", "category": "intake", "impact_hint": "high",
+                     "effort_hint": "low", "evidence": "Requests arrive in a shared inbox"}],
+    "current_tools": [{"name": "SharePoint", "purpose": "document storage", "adoption_level": "partial",
+                       "issues": ["no versioning", "poor search"]}],
+    "processes": [{"process_name": "Contract review", "step": "Legal reviews redlines",
+                   "owners": ["Legal Ops"], "systems": ["Word", "Outlook"], "slas": "5 business days",
+                   "risks": ["missed renewals"]}],
+    "metrics": [{"name": "Cycle time", "value": "12 days", "timeframe": "FY24", "owner": "GC office"}],
+    "opportunities": [{"area": "Intake", "description": "Introduce a self-service intake form",
+                       "impact_hint": "high", "effort_hint": "med", "dependencies": ["CLM rollout"]}],
+}
+
+CHUNKS = [{"id": f"deck.pptx::s{i}::1", "text": f"Slide {i} about contract intake", "tokens": 8,
+           "source": {"file": "deck.pptx", "locator": f"s{i}"}} for i in range(1, 4)]
+
+
+@pytest.mark.parametrize("pack_tokens", [0, 1000])
+def test_compact_and_json_merge_identically(pack_tokens):
+    merged = {}
+    for fmt in ("json", "compact"):
+        outputs = extract_each(CHUNKS, aclient=StandInAsyncClient(latency=0, payload=FULL),
+                               pack_tokens=pack_tokens, triage=False, wire=fmt)
+        merged[fmt] = merge_extractions(outputs)
+
+    assert merged["compact"] == merged["json"]
+    assert merged["compact"]["processes"][0]["owners"] == ["Legal Ops"]
+
+
+def test_expand_normalizes_enums_and_lists():
+    out = wire.expand({"p": [], "t": [["CLM", "", "everywhere", "slow"]], "s": [], "m": [], "o": []})
+
+    assert out["current_tools"] == [{"name": "CLM", "issues": ["slow"]}]